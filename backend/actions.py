@@ -1,17 +1,59 @@
 """Actions Layer - Execute search operations"""
 from models import SearchDecision, EnrichedResult, SearchResponse
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import numpy as np
 from datetime import datetime, timedelta
+from columns import MetadataColumns, normalize_timestamp
+from ranking import Reranker
+from highlights import HighlightEngine, query_terms
+from bm25 import BM25Index, reciprocal_rank_fusion
+from page_index import PageIndex
+from sharded_index import ShardedIndex
+from metrics import FILTERED, stage
+from logs import get_logger
+from projection import DEFAULT_SNIPPET_LENGTH
 import faiss
 
+log = get_logger('actions')
+
+# Strategies whose final order comes from the multi-signal reranker
+RERANK_STRATEGIES = ['hybrid', 'comparative', 'temporal']
+
 class ActionsAgent:
     """Executes search actions on FAISS index"""
     
-    def __init__(self, index: faiss.Index, metadata_store: dict, model):
+    def __init__(
+        self,
+        index: faiss.Index,
+        metadata_store: dict,
+        model,
+        columns: MetadataColumns = None,
+        memory=None,
+        rerank_pool: int = 1000,
+        highlighter: HighlightEngine = None,
+        lexical: BM25Index = None,
+        multi_query: str = None,
+        expansion_weight: float = 0.9,
+        page_index: PageIndex = None
+    ):
         self.index = index
         self.metadata_store = metadata_store
-        self.model = model  # SentenceTransformer model
+        self.model = model  # EmbeddingBackend (SentenceTransformer-compatible encode)
+        # Columnar mirror of metadata_store for vectorized filtering
+        self.columns = columns or MetadataColumns.from_metadata(metadata_store, self._id_bound())
+        self.reranker = Reranker(self.columns, memory)
+        # Candidates fetched for reranking strategies, so reranking can promote
+        # results that pure similarity ranks below k
+        self.rerank_pool = rerank_pool
+        # Token offsets are normally filled at /add; missing chunks are tokenized on demand
+        self.highlighter = highlighter or HighlightEngine()
+        # Keyword index for the hybrid strategy; semantic-only when absent
+        self.lexical = lexical
+        # Multi-query retrieval over perception's expanded terms: None, 'max' or 'weighted'
+        self.multi_query = multi_query
+        self.expansion_weight = expansion_weight
+        # Page-level vectors: comparative (URL-level) searches pick pages first
+        self.page_index = page_index
     
     def execute_search(
         self,
@@ -23,147 +65,275 @@ class ActionsAgent:
         # 1. Embed query
         query_text = decision.search_params.get('query_text', '')
         
-        print(f"   🔍 Query: '{query_text}'")
+        log.debug("🔍 Query: %r", query_text)
         
-        query_embedding = self.model.encode(
-            [query_text],
-            convert_to_numpy=True,
-            normalize_embeddings=True
-        )
+        # Original query first, then any expansions - one batched encode
+        query_texts = self._query_texts(query_text, decision)
+        with stage('encode', queries=len(query_texts)):
+            query_embeddings = self.model.encode(
+                query_texts,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+        query_embedding = query_embeddings[:1]
         
         # 2. Search FAISS
         k = decision.search_params.get('k', 50)
-        distances, indices = self.index.search(
-            query_embedding,
-            min(k * 2, self.index.ntotal)  # Get extra for filtering
-        )
+        rerank = decision.strategy in RERANK_STRATEGIES
+        pool = max(k * 2, self.rerank_pool) if rerank else k * 2  # Get extra for filtering
+        with stage('faiss_search'):
+            if decision.strategy == 'comparative' and self.page_index is not None:
+                # k distinct pages, then only their best chunks
+                distances, indices = self.page_index.search_chunks(
+                    self.index, query_embedding, k,
+                    category=decision.search_params.get('category_filter')
+                )
+            else:
+                distances, indices = self._search_index(
+                    query_embeddings,
+                    min(pool, self.index.ntotal),
+                    decision.search_params.get('category_filter'),
+                    decision.search_params.get('time_window_days')
+                )
+            
+            if indices.shape[0] > 1:
+                log.debug("🔀 Multi-query: %d queries, %s fusion", len(query_texts), self.multi_query)
+                distances, indices = self._fuse_queries(query_embeddings, distances, indices, pool)
+            
+            # 2b. Hybrid: fuse keyword hits into the candidate list
+            lexical_hits, fused = None, None
+            if decision.strategy == 'hybrid' and self.lexical is not None:
+                distances, indices, lexical_hits, fused = self._fuse_lexical(
+                    query_text, query_embedding, distances, indices, pool
+                )
         
         # 3. Collect and filter results
-        raw_results = []
-        filtered_count = {'category': 0, 'temporal': 0, 'similarity': 0}
-        
         # Log filter settings
         min_sim_requested = decision.filters.get('min_similarity', 0.0)
-        print(f"   🎯 Similarity threshold: {min_sim_requested:.2f}")
-        
-        for i, idx in enumerate(indices[0]):
-            if idx != -1 and int(idx) in self.metadata_store:
-                meta = self.metadata_store[int(idx)]
-                
-                # Apply category filter
-                category_filter = decision.search_params.get('category_filter')
-                if category_filter and meta.get('category') != category_filter:
-                    filtered_count['category'] += 1
-                    continue
-                
-                # Apply temporal filter
-                time_window = decision.search_params.get('time_window_days')
-                if time_window:
-                    timestamp = meta.get('timestamp', 0)
-                    age_days = (datetime.now().timestamp() - timestamp) / 86400
-                    if age_days > time_window:
-                        filtered_count['temporal'] += 1
-                        continue
-                
-                # Pure semantic similarity
-                semantic_sim = float(distances[0][i])
-                
-                # Apply similarity threshold - use very low threshold for better recall
-                requested_sim = decision.filters.get('min_similarity', 0.0)
-                # Cap at 0.35 maximum to ensure we get results
-                min_sim = min(requested_sim, 0.35) if requested_sim > 0 else 0.25
-                
-                if semantic_sim < min_sim:
-                    filtered_count['similarity'] += 1
-                    continue
-                
-                raw_results.append({
-                    'metadata': meta,
-                    'similarity': semantic_sim,
-                    'index': int(idx)
-                })
-                
-                if len(raw_results) >= k:
-                    break
+        log.debug("🎯 Similarity threshold: %.2f", min_sim_requested)
+        
+        # Reranking strategies keep every survivor and let the reranker pick k
+        with stage('filter') as node:
+            raw_results, filtered_count = self._filter_candidates(
+                distances, indices, decision, pool if rerank else k,
+                exempt=lexical_hits, fused=fused
+            )
+            node.set(
+                candidates=len(indices[0]), passed=len(raw_results),
+                **{f'dropped_{reason}': int(count) for reason, count in filtered_count.items()}
+            )
+        for reason, count in filtered_count.items():
+            FILTERED.inc(count, reason=reason)
         
         # Log filtering stats
-        total_candidates = len(indices[0])
         if sum(filtered_count.values()) > 0:
-            print(f"   Filtered: {filtered_count['category']} by category, "
-                  f"{filtered_count['temporal']} by time, "
-                  f"{filtered_count['similarity']} by similarity")
-            print(f"   Total candidates: {total_candidates}, Passed: {len(raw_results)}")
+            log.debug(
+                "Filtered: %d by category, %d by time, %d by similarity; %d candidates, %d passed",
+                filtered_count['category'], filtered_count['temporal'], filtered_count['similarity'],
+                len(indices[0]), len(raw_results)
+            )
         
         # 4. Rerank if needed
-        if decision.strategy in ['hybrid', 'comparative', 'temporal']:
-            raw_results = self._rerank_results(raw_results, decision)
+        if rerank:
+            with stage('rerank'):
+                raw_results = self._rerank_results(raw_results, decision, k)
+        
+        # Feeds the least-recently-returned eviction policy
+        self.columns.touch([r['index'] for r in raw_results])
         
-        # 5. Enrich results
-        enriched = self._enrich_results(raw_results, decision, query_text)
+        # 5. Group by URL, keeping the best chunk per page
+        with stage('group'):
+            grouped = self._group_by_url(raw_results)
         
-        # 6. Group by URL for final results
-        grouped = self._group_by_url(enriched)
+        # 6. Enrich only what is returned (plus what suggestions look at)
+        with stage('enrich'):
+            enriched = self._enrich_results(grouped[:max(k, 10)], decision, query_text)
         
         processing_time = datetime.now().timestamp() - start_time
         
         return SearchResponse(
-            results=grouped[:decision.search_params.get('k', 50)],
+            results=enriched[:k],
             query_understanding=f"Strategy: {decision.strategy}, Confidence: {decision.confidence:.2f}",
             search_strategy=decision.reasoning,
             total_found=len(grouped),
             processing_time=processing_time,
-            suggestions=self._generate_suggestions(query_text, grouped)
+            suggestions=self._generate_suggestions(query_text, enriched)
         )
     
+    def _id_bound(self) -> int:
+        """One past the highest vector id the index may return to this request"""
+        return getattr(self.index, 'id_bound', self.index.ntotal)
+    
+    def _search_index(
+        self,
+        queries: np.ndarray,
+        k: int,
+        category: str = None,
+        time_window_days: float = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Search all vectors, or only the matching category/time segments when the index is sharded"""
+        if isinstance(self.index, ShardedIndex):
+            since = datetime.now().timestamp() - time_window_days * 86400 if time_window_days else None
+            return self.index.search(queries, k, category=category or None, since=since)
+        return self.index.search(queries, k)
+    
+    def _query_texts(self, query_text: str, decision: SearchDecision) -> List[str]:
+        """Original query plus distinct expanded terms when multi-query is on"""
+        texts = [query_text]
+        if not self.multi_query:
+            return texts
+        
+        seen = {query_text.strip().lower()}
+        for term in decision.search_params.get('expanded_terms', [])[:5]:
+            key = term.strip().lower()
+            if key and key not in seen:
+                seen.add(key)
+                texts.append(term)
+        return texts
+    
+    def _fuse_queries(
+        self,
+        query_embeddings: np.ndarray,
+        distances: np.ndarray,
+        indices: np.ndarray,
+        pool: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fuse per-query hit lists into one candidate list.
+        Scores every candidate against every query (one matrix product) and
+        combines with the original query at weight 1 and expansions at
+        expansion_weight: 'max' keeps the best weighted score, 'weighted'
+        averages them.
+        """
+        ids = np.unique(indices[indices >= 0])
+        if len(ids) == 0:
+            return distances[:1], indices[:1]
+        
+        weights = np.full(len(query_embeddings), self.expansion_weight, dtype=np.float32)
+        weights[0] = 1.0
+        similarities = self.index.reconstruct_batch(ids) @ query_embeddings.T
+        
+        if self.multi_query == 'weighted':
+            fused = similarities @ weights / weights.sum()
+        else:
+            fused = (similarities * weights).max(axis=1)
+        
+        order = np.argsort(-fused, kind='stable')[:pool]
+        return fused[order][None, :], ids[order][None, :]
+    
+    def _fuse_lexical(
+        self,
+        query_text: str,
+        query_embedding: np.ndarray,
+        distances: np.ndarray,
+        indices: np.ndarray,
+        pool: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Merge BM25 and vector candidates with reciprocal-rank fusion"""
+        _, lexical_ids = self.lexical.search(query_text, pool)
+        if len(lexical_ids) == 0:
+            return distances, indices, None, None
+        
+        fused_scores, ids = reciprocal_rank_fusion([indices[0], lexical_ids])
+        fused_scores, ids = fused_scores[:pool], ids[:pool]
+        
+        # Exact cosine for every fused candidate - keyword-only hits have none yet
+        vectors = self.index.reconstruct_batch(ids)
+        similarities = vectors @ query_embedding[0]
+        lexical_hits = np.isin(ids, lexical_ids)
+        
+        return similarities[None, :], ids[None, :], lexical_hits, fused_scores / fused_scores[0]
+    
+    def _filter_candidates(
+        self,
+        distances: np.ndarray,
+        indices: np.ndarray,
+        decision: SearchDecision,
+        k: int,
+        exempt: np.ndarray = None,
+        fused: np.ndarray = None
+    ) -> Tuple[List[Dict], Dict[str, int]]:
+        """
+        Apply category, time and similarity filters to all candidates with one mask.
+        `exempt` marks keyword hits that skip the similarity threshold;
+        `fused` carries their RRF score into the results.
+        """
+        ids = indices[0]
+        sims = distances[0]
+        columns = self.columns
+        columns.sync(self.metadata_store, self._id_bound())
+        
+        safe_ids = np.where(ids >= 0, ids, 0)
+        present = (ids >= 0) & columns.present[safe_ids]
+        if isinstance(self.index, ShardedIndex):
+            # Keyword hits can name chunks added or removed after the pinned generation
+            present &= self.index.contains(ids)
+        
+        # Category filter
+        category_filter = decision.search_params.get('category_filter')
+        if category_filter:
+            code = columns.category_codes.get(category_filter, -2)
+            category_fail = present & (columns.category[safe_ids] != code)
+        else:
+            category_fail = np.zeros(len(ids), dtype=bool)
+        remaining = present & ~category_fail
+        
+        # Temporal filter
+        time_window = decision.search_params.get('time_window_days')
+        if time_window:
+            age_days = (datetime.now().timestamp() - columns.timestamp[safe_ids]) / 86400
+            temporal_fail = remaining & (age_days > time_window)
+        else:
+            temporal_fail = np.zeros(len(ids), dtype=bool)
+        remaining &= ~temporal_fail
+        
+        # Apply similarity threshold - use very low threshold for better recall
+        requested_sim = decision.filters.get('min_similarity', 0.0)
+        # Cap at 0.35 maximum to ensure we get results
+        min_sim = min(requested_sim, 0.35) if requested_sim > 0 else 0.25
+        similarity_fail = remaining & (sims < min_sim)
+        if exempt is not None:
+            similarity_fail &= ~exempt
+        passed = remaining & ~similarity_fail
+        
+        # Keep the first k survivors; counts cover only the candidates examined to reach them
+        positions = np.flatnonzero(passed)
+        examined = len(ids)
+        if len(positions) >= k:
+            positions = positions[:k]
+            examined = int(positions[-1]) + 1 if k > 0 else 0
+        
+        filtered_count = {
+            'category': int(category_fail[:examined].sum()),
+            'temporal': int(temporal_fail[:examined].sum()),
+            'similarity': int(similarity_fail[:examined].sum())
+        }
+        
+        raw_results = []
+        for p in positions:
+            idx = int(ids[p])
+            meta = self.metadata_store.get(idx)
+            if meta is None:
+                continue
+            result = {
+                'metadata': meta,
+                'similarity': float(sims[p]),
+                'index': idx
+            }
+            if fused is not None:
+                result['fused_score'] = float(fused[p])
+            raw_results.append(result)
+        
+        return raw_results, filtered_count
+    
     def _rerank_results(
         self,
         results: List[Dict],
-        decision: SearchDecision
+        decision: SearchDecision,
+        top_k: int = None
     ) -> List[Dict]:
         """Rerank results based on multiple factors"""
-        weights = decision.ranking_weights
-        
-        for result in results:
-            meta = result['metadata']
-            
-            # Semantic similarity score (already normalized)
-            semantic_score = result['similarity']
-            
-            # Temporal relevance (decay over time)
-            timestamp = meta.get('timestamp', 0)
-            if timestamp > 0:
-                age_days = (datetime.now().timestamp() - timestamp) / 86400
-                # Cap age_days to prevent overflow (max ~100 days)
-                age_days = min(max(age_days, 0), 100)
-                temporal_score = np.exp(-age_days / 7)  # Decay with 7-day half-life
-            else:
-                # No timestamp, use neutral score
-                temporal_score = 0.5
-            
-            # Category match score
-            category_hints = decision.search_params.get('category_hints', [])
-            category_score = 1.0 if meta.get('category') in category_hints else 0.5
-            
-            # Frequency score (how often this URL appears in results)
-            # For now, just use 0.5 as baseline
-            frequency_score = 0.5
-            
-            # Combined score
-            combined_score = (
-                weights.get('semantic_similarity', 1.0) * semantic_score +
-                weights.get('temporal_relevance', 0.0) * temporal_score +
-                weights.get('category_match', 0.0) * category_score +
-                weights.get('frequency', 0.0) * frequency_score
-            )
-            
-            result['relevance_score'] = combined_score
-            result['temporal_relevance'] = temporal_score
-            result['context_match'] = category_score
-        
-        # Sort by relevance score
-        results.sort(key=lambda x: x.get('relevance_score', x['similarity']), reverse=True)
-        
-        return results
+        return self.reranker.rerank(results, decision, top_k)
     
     def _enrich_results(
         self,
@@ -171,30 +341,45 @@ class ActionsAgent:
         decision: SearchDecision,
         query: str
     ) -> List[EnrichedResult]:
-        """Convert raw results to enriched results"""
+        """
+        Convert raw results to enriched results. A `fields` projection in the
+        search params skips explanations and highlights nobody asked for; the
+        values are built here, so pydantic validation is skipped too.
+        """
         enriched = []
+        fields = decision.search_params.get('fields')
+        snippet_length = decision.search_params.get('snippet_length')
+        if snippet_length is None:
+            snippet_length = DEFAULT_SNIPPET_LENGTH
+        want_explanation = fields is None or 'explanation' in fields
+        want_highlights = fields is None or not fields.isdisjoint(('highlight_spans', 'highlight_suggestions'))
+        # Compile the highlight matcher once for the whole result list
+        terms = query_terms(query, decision.search_params.get('expanded_terms', [])) if want_highlights else None
         
         for result in results:
             meta = result['metadata']
             
             # Generate explanation
-            explanation = self._generate_explanation(result, decision, query)
+            explanation = self._generate_explanation(result, decision, query) if want_explanation else ''
             
-            # Extract highlight suggestions (key terms from chunk)
+            # Exact spans of query terms (with context) in the chunk text
             chunk_text = meta.get('chunk', '')
-            highlight_suggestions = self._extract_highlights(chunk_text, query)
+            highlight_spans = (
+                self.highlighter.extract(result['index'], chunk_text, terms, snippet_length) if want_highlights else []
+            )
             
-            enriched.append(EnrichedResult(
+            enriched.append(EnrichedResult.model_construct(
                 url=meta.get('url', ''),
                 title=meta.get('title', 'Untitled'),
-                snippet=chunk_text[:200],
+                snippet=chunk_text[:snippet_length],
                 category=meta.get('category', 'other'),
                 similarity=result['similarity'],
                 relevance_score=result.get('relevance_score', result['similarity']),
                 temporal_relevance=result.get('temporal_relevance', 0.5),
                 context_match=result.get('context_match', 0.5),
                 explanation=explanation,
-                highlight_suggestions=highlight_suggestions
+                highlight_suggestions=[span['text'] for span in highlight_spans],
+                highlight_spans=highlight_spans
             ))
         
         return enriched
@@ -210,7 +395,7 @@ class ActionsAgent:
         similarity = result['similarity']
         
         if decision.strategy == 'temporal':
-            timestamp = meta.get('timestamp', 0)
+            timestamp = normalize_timestamp(meta.get('timestamp', 0))
             age_days = int((datetime.now().timestamp() - timestamp) / 86400)
             if age_days == 0:
                 return f"Visited today, {int(similarity * 100)}% match"
@@ -225,35 +410,21 @@ class ActionsAgent:
         else:
             return f"Relevance: {int(similarity * 100)}%"
     
-    def _extract_highlights(self, text: str, query: str) -> List[str]:
-        """Extract key phrases to highlight"""
-        # Simple word extraction (could be enhanced with NER)
-        query_words = set(query.lower().split())
-        text_words = text.lower().split()
-        
-        highlights = []
-        for i, word in enumerate(text_words):
-            if word in query_words and len(word) > 3:
-                # Get context around word
-                start = max(0, i - 3)
-                end = min(len(text_words), i + 4)
-                phrase = ' '.join(text_words[start:end])
-                highlights.append(phrase)
-        
-        return highlights[:5]  # Top 5 highlights
-    
-    def _group_by_url(self, results: List[EnrichedResult]) -> List[EnrichedResult]:
-        """Group results by URL, keeping best match per URL"""
+    def _group_by_url(self, results: List[Dict]) -> List[Dict]:
+        """Group raw results by URL, keeping best match per URL"""
         url_map = {}
         
+        def score(result: Dict) -> float:
+            return result.get('relevance_score', result['similarity'])
+        
         for result in results:
-            url = result.url
-            if url not in url_map or result.relevance_score > url_map[url].relevance_score:
+            url = result['metadata'].get('url', '')
+            if url not in url_map or score(result) > score(url_map[url]):
                 url_map[url] = result
         
         # Return sorted by relevance
         grouped = list(url_map.values())
-        grouped.sort(key=lambda x: x.relevance_score, reverse=True)
+        grouped.sort(key=score, reverse=True)
         
         return grouped
     
@@ -1,8 +1,12 @@
 """Answer Verification - Check if retrieved content actually answers the query"""
-import google.generativeai as genai
+from llm import json_model
+from metrics import FALLBACKS
+from logs import get_logger
 import os
 import json
 
+log = get_logger('verification')
+
 class AnswerVerifier:
     """Verifies if search results actually answer the user's question"""
     
@@ -13,13 +17,7 @@ class AnswerVerifier:
             self.enabled = False
             return
         
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(
-            'gemini-2.0-flash-exp',
-            generation_config={
-                "response_mime_type": "application/json"
-            }
-        )
+        self.model = json_model(self.api_key, agent='verification')
         self.enabled = True
     
     def verify_results(self, query: str, results: list, top_n: int = 5) -> dict:
@@ -109,7 +107,8 @@ Now analyze the results above."""
             }
             
         except Exception as e:
-            print(f"⚠️ Answer verification error: {e}")
+            log.warning("⚠️ Answer verification error: %s", e)
+            FALLBACKS.inc(component='verification')
             # On error, return all results (fail open)
             return {
                 'has_answer': True,
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the cognitive pipeline against fake_gemini.py
+Starts a fake Gemini server (or uses --llm-url), loads the server on a synthetic
+corpus with USE_COGNITIVE_AI on, drives concurrent cognitive /search and
+/compare traffic, and reports end-to-end and per-stage latency as JSON.
+
+Run: python bench_cognitive.py --size 10000 --concurrency 1 8 32 --latency-ms 400 --rate-429 0.05
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench_server import (
+    VOCAB, HttpTransport, TestClientTransport, drive, git_commit, load_server, make_corpus, prefill, serve_http
+)
+import fake_gemini
+
+# Orchestrator attribute, method -> reported stage
+STAGES = [
+    ('perception', 'understand_query', 'perception'),
+    ('memory', 'get_browsing_context', 'memory'),
+    ('memory', 'get_search_history', 'memory'),
+    ('decision', 'decide_strategy', 'decision'),
+    ('actions', 'execute_search', 'actions'),
+    ('verifier', 'verify_results', 'verification'),
+    ('memory', 'record_search', 'record')
+]
+
+
+def instrument(orchestrator) -> dict:
+    """Wrap each agent call in a timer; returns {stage: [seconds, ...]} filled as requests run"""
+    timings = {stage: [] for _, _, stage in STAGES}
+    for attr, method, stage in STAGES:
+        agent = getattr(orchestrator, attr)
+        original = getattr(agent, method)
+
+        def timed(*args, _original=original, _stage=stage, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                timings[_stage].append(time.perf_counter() - start)
+
+        setattr(agent, method, timed)
+    return timings
+
+
+def summarize(seconds: list) -> dict:
+    if not seconds:
+        return {'count': 0}
+    ms = np.array(seconds) * 1000
+    return {
+        'count': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3)
+    }
+
+
+def cognitive_queries(endpoint: str, n: int, seed: int) -> list:
+    """A mix of recall, question, comparison and exploratory queries"""
+    rnd = random.Random(seed)
+    templates = {
+        'search': [
+            '{a} {b} I saw yesterday',
+            'what is the best {a} for {b}?',
+            'how to {a} {b}',
+            '{a} {b} {c}',
+            '{a}'
+        ],
+        'compare': ['{a} vs {b}', 'compare {a} {b} prices', 'best {a} under budget']
+    }[endpoint]
+    bodies = []
+    for _ in range(n):
+        category = 'ecommerce' if endpoint == 'compare' else rnd.choice(list(VOCAB))
+        a, b, c = rnd.sample(VOCAB[category], 3)
+        bodies.append({'query': rnd.choice(templates).format(a=a, b=b, c=c), 'use_cognitive': True})
+    return bodies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=10000, help='corpus size in chunks')
+    parser.add_argument('--endpoints', nargs='+', choices=['search', 'compare'], default=['search', 'compare'])
+    parser.add_argument('--transport', choices=['client', 'http'], default='client')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--requests', type=int, default=100, help='requests per endpoint per run')
+    parser.add_argument('--llm-url', help='use an already running fake_gemini.py instead of starting one')
+    parser.add_argument('--latency-ms', type=float, default=400)
+    parser.add_argument('--jitter-ms', type=float, default=150)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2')
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--output', default='bench_cognitive.json')
+    args = parser.parse_args()
+
+    llm_stats = None
+    if args.llm_url:
+        llm_url = args.llm_url
+    else:
+        llm_app = fake_gemini.create_app(args.latency_ms, args.jitter_ms, args.rate_429, seed=0)
+        llm_url, _ = serve_http(llm_app)
+        llm_stats = llm_app.config['FAKE_GEMINI_STATS']
+        print(f"🤖 Fake Gemini at {llm_url} ({args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, "
+              f"{args.rate_429:.0%} 429s)")
+    os.environ.update({
+        'GEMINI_API_ENDPOINT': llm_url,
+        'GEMINI_API_KEY': os.getenv('GEMINI_API_KEY', 'fake-key'),
+        'USE_COGNITIVE_AI': 'true'
+    })
+
+    home = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix=f'bench-cognitive-{args.size}-')
+    print(f"🧪 Building {args.size} chunk corpus in {workdir}...")
+    embeddings, metadata = make_corpus(args.size, args.dimension)
+    prefill(workdir, embeddings, metadata, args.model)
+    del embeddings, metadata
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    server = load_server(workdir)
+    if server.orchestrator is None:
+        sys.exit("❌ Cognitive AI did not start - is google-generativeai installed?")
+    timings = instrument(server.orchestrator)
+
+    if args.transport == 'http':
+        base_url, http = serve_http(server.app)
+        transport = HttpTransport(base_url)
+    else:
+        http = None
+        transport = TestClientTransport(server.app)
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'size': args.size,
+            'transport': args.transport,
+            'llm': {'url': llm_url, 'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms,
+                    'rate_429': args.rate_429}
+        },
+        'runs': []
+    }
+    for concurrency in args.concurrency:
+        for endpoint in args.endpoints:
+            for samples in timings.values():
+                samples.clear()
+            throttled_before = llm_stats['throttled'] if llm_stats else 0
+            bodies = cognitive_queries(endpoint, args.requests, seed=concurrency)
+            stats = drive(transport, endpoint, bodies, concurrency)
+            run = {
+                'endpoint': endpoint,
+                'concurrency': concurrency,
+                'end_to_end': stats,
+                'stages': {stage: summarize(samples) for stage, samples in timings.items()}
+            }
+            if llm_stats:
+                run['llm_throttled'] = llm_stats['throttled'] - throttled_before
+            results['runs'].append(run)
+
+            print(f"\n   /{endpoint} c={concurrency}: {stats['throughput_rps']:.2f} req/s  "
+                  f"p50 {stats['p50_ms']:.0f}  p95 {stats['p95_ms']:.0f}  p99 {stats['p99_ms']:.0f} ms"
+                  + (f"  ({stats['errors']} errors)" if stats['errors'] else '')
+                  + (f"  [{run['llm_throttled']} LLM 429s]" if run.get('llm_throttled') else ''))
+            for stage, summary in run['stages'].items():
+                if summary['count']:
+                    print(f"      {stage:<13} n={summary['count']:<5} p50 {summary['p50_ms']:8.1f}  "
+                          f"p95 {summary['p95_ms']:8.1f}  p99 {summary['p99_ms']:8.1f} ms")
+
+    if http:
+        http.shutdown()
+    os.chdir(home)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
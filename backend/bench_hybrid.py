@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Latency of hybrid (BM25 + vector, RRF-fused) search vs pure semantic search
+Run: python bench_hybrid.py --chunks 20000 --queries 50
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+
+import faiss
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from actions import ActionsAgent
+from bm25 import BM25Index
+from models import SearchDecision
+
+BRANDS = ['ASUS', 'Dell', 'HP', 'Lenovo', 'Acer', 'MSI', 'Apple', 'Samsung']
+PRODUCTS = ['gaming laptop', 'ultrabook', 'monitor', 'graphics card', 'keyboard', 'headphones']
+GPUS = ['RTX 4060', 'RTX 4070', 'RTX 3050', 'RX 7600', 'Arc A770']
+FILLER = ('with fast shipping and free returns, rated highly by customers, '
+          'compare prices and read reviews before you buy').split()
+
+
+def make_corpus(n: int, seed: int = 0):
+    """Synthetic product-page chunks with model numbers and prices"""
+    rnd = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        words = rnd.sample(FILLER, 8)
+        texts.append(
+            f"{rnd.choice(BRANDS)} {rnd.choice(PRODUCTS)} with {rnd.choice(GPUS)}, "
+            f"{rnd.choice([8, 16, 32])}GB RAM, ${rnd.randint(300, 2500)} " + ' '.join(words)
+        )
+    return texts
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) * 1000
+
+
+def run(agent: ActionsAgent, queries, strategy: str, k: int):
+    """Time execute_search for every query under one strategy"""
+    latencies = []
+    for query in queries:
+        decision = SearchDecision(
+            strategy=strategy,
+            search_params={'query_text': query, 'k': k},
+            filters={'min_similarity': 0.0},
+            ranking_weights={'semantic_similarity': 1.0},
+            reasoning='benchmark',
+            confidence=1.0
+        )
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.execute_search(decision, time.time())
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chunks', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2')
+    args = parser.parse_args()
+
+    print(f"🧪 Building synthetic corpus of {args.chunks} chunks...")
+    model = SentenceTransformer(args.model)
+    texts = make_corpus(args.chunks)
+    embeddings = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True, batch_size=256)
+
+    index = faiss.IndexFlatIP(embeddings.shape[1])
+    index.add(embeddings.astype('float32'))
+    now = time.time()
+    metadata_store = {
+        i: {'url': f'https://shop.example/p/{i // 4}', 'title': texts[i][:30], 'chunk': texts[i],
+            'category': 'ecommerce', 'timestamp': now - (i % 30) * 86400}
+        for i in range(len(texts))
+    }
+
+    start = time.perf_counter()
+    bm25 = BM25Index.from_metadata(metadata_store)
+    print(f"   BM25 build: {time.perf_counter() - start:.2f}s, {len(bm25.vocab)} terms")
+
+    agent = ActionsAgent(index, metadata_store, model, lexical=bm25)
+    rnd = random.Random(1)
+    queries = [f"{rnd.choice(BRANDS)} {rnd.choice(GPUS)} {rnd.choice(PRODUCTS)}" for _ in range(args.queries)]
+
+    # Warm up model and caches
+    run(agent, queries[:3], 'semantic', args.k)
+
+    print(f"\n🔍 Running {args.queries} queries per strategy (k={args.k})")
+    results = {}
+    # 'hybrid' reranks its candidates and 'semantic' does not; running 'hybrid'
+    # without the keyword index holds the rerank constant, so the overhead
+    # below is BM25 plus fusion only
+    for label, strategy, lexical in [('semantic', 'semantic', bm25), ('no-bm25', 'hybrid', None),
+                                     ('hybrid', 'hybrid', bm25)]:
+        agent.lexical = lexical
+        latencies = run(agent, queries, strategy, args.k)
+        results[label] = latencies
+        print(f"   {label:<9} p50 {percentile(latencies, 50):7.2f}ms  "
+              f"p95 {percentile(latencies, 95):7.2f}ms  mean {np.mean(latencies) * 1000:7.2f}ms")
+
+    lexical = []
+    for query in queries:
+        start = time.perf_counter()
+        bm25.search(query, args.k * 20)
+        lexical.append(time.perf_counter() - start)
+    print(f"   bm25 only p50 {percentile(lexical, 50):7.2f}ms")
+
+    overhead = (np.median(results['hybrid']) - np.median(results['no-bm25'])) * 1000
+    print(f"\n✅ Hybrid overhead (p50, same rerank): {overhead:+.2f}ms per query")
+
+
+if __name__ == '__main__':
+    main()
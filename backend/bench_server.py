@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmark for /add, /search, /compare and /embed
+Builds a synthetic browsing corpus per size, loads the server on it, drives
+each endpoint through the Flask test client and/or real HTTP, and writes JSON.
+
+Run: python bench_server.py --sizes 10000 100000 --concurrency 1 8 --output bench.json
+     python bench_server.py --baseline bench.json   # exit 1 on a p95/throughput regression
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from storage import save_all, save_model_config
+from sharded_index import ShardedIndex
+from bm25 import BM25Index
+from page_index import PageIndex
+
+# Share of chunks per category, roughly what the extension captures
+CATEGORY_MIX = {'ecommerce': 0.3, 'news': 0.25, 'documentation': 0.2, 'social': 0.15, 'general': 0.1}
+VOCAB = {
+    'ecommerce': 'laptop gaming rtx 4060 price deal cart shipping review rating monitor keyboard ssd ram'.split(),
+    'news': 'election market report breaking update policy economy climate sports interview analysis'.split(),
+    'documentation': 'python api function install configure example parameter return error module class tutorial'.split(),
+    'social': 'post thread comment like share follow community discussion photo video trending'.split(),
+    'general': 'recipe travel weather music movie guide tips home garden health fitness'.split()
+}
+ENDPOINTS = ['add', 'search', 'compare', 'embed']
+
+
+def make_corpus(n_chunks: int, dimension: int, seed: int = 0):
+    """
+    (embeddings, metadata) for n_chunks: Zipf-distributed sites, 2-12 chunks
+    per page, recency-skewed timestamps (ms, like the extension) over ~6 months,
+    and per-category centroids so category searches see clustered vectors.
+    """
+    rng = np.random.default_rng(seed)
+    rnd = random.Random(seed)
+    categories = list(CATEGORY_MIX)
+    centroids = rng.standard_normal((len(categories), dimension)).astype(np.float32)
+    now_ms = time.time() * 1000
+
+    metadata, cat_codes = [], []
+    page = 0
+    while len(metadata) < n_chunks:
+        code = rng.choice(len(categories), p=list(CATEGORY_MIX.values()))
+        category = categories[code]
+        site = int(rng.zipf(1.3)) % 5000
+        age_days = min(rng.exponential(14), 180)
+        timestamp = now_ms - age_days * 86400000
+        words = VOCAB[category]
+        for i in range(min(rnd.randint(2, 12), n_chunks - len(metadata))):
+            metadata.append({
+                'url': f'https://site{site}.example/{category}/{page}',
+                'title': f'{category.title()} page {page}',
+                'chunk': ' '.join(rnd.choice(words) for _ in range(40)) + '.',
+                'chunkIndex': i,
+                'category': category,
+                'timestamp': timestamp
+            })
+            cat_codes.append(code)
+        page += 1
+
+    embeddings = centroids[cat_codes] * 0.5 + rng.standard_normal((n_chunks, dimension)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings, metadata
+
+
+def prefill(workdir: str, embeddings: np.ndarray, metadata: list, model_name: str):
+    """Write index files directly, as ingest.py would, so the server starts on a full corpus"""
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        index = ShardedIndex(embeddings.shape[1])
+        ids = np.arange(len(metadata))
+        index.reserve_ids(len(metadata))
+        index.add_with_ids(
+            embeddings, ids,
+            [m['category'] for m in metadata],
+            [m['timestamp'] / 1000.0 for m in metadata]
+        )
+        metadata_store = dict(enumerate(metadata))
+        pages = PageIndex(embeddings.shape[1])
+        pages.add(ids, embeddings, metadata)
+        save_all(index, metadata_store, BM25Index.from_metadata(metadata_store), pages)
+        save_model_config(model_name, os.getenv('EMBEDDING_BACKEND', 'torch'), embeddings.shape[1])
+    finally:
+        os.chdir(cwd)
+
+
+def load_server(workdir: str):
+    """Import server.py fresh against workdir's files"""
+    os.chdir(workdir)
+    sys.modules.pop('server', None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return importlib.import_module('server')
+
+
+class TestClientTransport:
+    name = 'client'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def post(self, path: str, payload: dict) -> int:
+        return self.client.post(path, json=payload).status_code
+
+
+class HttpTransport:
+    name = 'http'
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+
+    def post(self, path: str, payload: dict) -> int:
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def serve_http(app):
+    """Run the app on a threaded werkzeug server in the background; returns (url, server)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    http = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{http.server_port}', http
+
+
+def payloads(endpoint: str, n: int, dimension: int, seed: int):
+    """Request bodies shaped like the extension's traffic"""
+    rng = np.random.default_rng(seed)
+    rnd = random.Random(seed)
+    categories = list(CATEGORY_MIX)
+    out = []
+    for i in range(n):
+        category = categories[rng.choice(len(categories), p=list(CATEGORY_MIX.values()))]
+        words = VOCAB[category]
+        if endpoint == 'add':
+            chunks = rnd.randint(2, 12)
+            vectors = rng.standard_normal((chunks, dimension)).astype(np.float32)
+            out.append({
+                'embeddings': vectors.tolist(),
+                'metadata': [{
+                    'url': f'https://bench.example/{seed}/{i}', 'title': f'Bench {i}',
+                    'chunk': ' '.join(rnd.choice(words) for _ in range(40)) + '.', 'chunkIndex': c,
+                    'category': category, 'timestamp': time.time() * 1000
+                } for c in range(chunks)]
+            })
+        elif endpoint == 'embed':
+            out.append({'texts': [' '.join(rnd.choice(words) for _ in range(40)) + '.' for _ in range(rnd.randint(2, 12))]})
+        else:
+            query = ' '.join(rnd.sample(words, 3))
+            body = {'query': query, 'use_cognitive': False}
+            if endpoint == 'search':
+                body['k'] = 50
+                if rnd.random() < 0.3:
+                    body['category'] = category
+            out.append(body)
+    return out
+
+
+def drive(transport, endpoint: str, bodies: list, concurrency: int) -> dict:
+    """Send every body with `concurrency` workers; latency stats in ms"""
+    latencies = np.zeros(len(bodies))
+    errors = 0
+
+    def one(i):
+        start = time.perf_counter()
+        status = transport.post('/' + endpoint, bodies[i])
+        latencies[i] = time.perf_counter() - start
+        return status
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            statuses = list(pool.map(one, range(len(bodies))))
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for s in statuses if s >= 400)
+
+    ms = latencies * 1000
+    return {
+        'requests': len(bodies),
+        'errors': errors,
+        'throughput_rps': round(len(bodies) / elapsed, 2),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3)
+    }
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """Human-readable regressions: p95 up or throughput down by more than tolerance"""
+    regressions = []
+    old_runs = {(r['size'], r['transport'], r['concurrency'], r['endpoint']): r for r in baseline['runs']}
+    for run in results['runs']:
+        key = (run['size'], run['transport'], run['concurrency'], run['endpoint'])
+        old = old_runs.get(key)
+        if not old:
+            continue
+        if run['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {old['p95_ms']:.1f}ms -> {run['p95_ms']:.1f}ms")
+        if run['throughput_rps'] < old['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {old['throughput_rps']:.1f} -> {run['throughput_rps']:.1f} req/s")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000], help='corpus sizes in chunks')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument('--transports', nargs='+', choices=['client', 'http'], default=['client', 'http'])
+    parser.add_argument('--url', help='benchmark an already running server over HTTP instead')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint per run')
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2')
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='previous results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'requests': args.requests
+        },
+        'runs': []
+    }
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    home = os.getcwd()
+
+    targets = [(None, args.url)] if args.url else [(size, None) for size in args.sizes]
+    for size, url in targets:
+        transports = []
+        http = workdir = None
+        if url:
+            transports.append(HttpTransport(url))
+        else:
+            workdir = tempfile.mkdtemp(prefix=f'bench-{size}-')
+            print(f"🧪 Building {size} chunk corpus in {workdir}...")
+            start = time.perf_counter()
+            embeddings, metadata = make_corpus(size, args.dimension)
+            prefill(workdir, embeddings, metadata, args.model)
+            del embeddings, metadata
+            print(f"   prefilled in {time.perf_counter() - start:.1f}s, starting server...")
+            sys.path.insert(0, backend_dir)
+            server = load_server(workdir)
+            if 'client' in args.transports:
+                transports.append(TestClientTransport(server.app))
+            if 'http' in args.transports:
+                base_url, http = serve_http(server.app)
+                transports.append(HttpTransport(base_url))
+
+        for transport in transports:
+            for concurrency in args.concurrency:
+                for endpoint in args.endpoints:
+                    bodies = payloads(endpoint, args.requests, args.dimension, seed=concurrency)
+                    stats = drive(transport, endpoint, bodies, concurrency)
+                    run = {'size': size, 'transport': transport.name, 'concurrency': concurrency,
+                           'endpoint': endpoint, **stats}
+                    results['runs'].append(run)
+                    print(f"   [{size or url} {transport.name:<6} c={concurrency:<3}] /{endpoint:<8} "
+                          f"{stats['throughput_rps']:8.1f} req/s  p50 {stats['p50_ms']:7.2f}  "
+                          f"p95 {stats['p95_ms']:7.2f}  p99 {stats['p99_ms']:7.2f} ms"
+                          + (f"  ({stats['errors']} errors)" if stats['errors'] else ''))
+        if http:
+            http.shutdown()
+        os.chdir(home)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Keyword layer - incrementally maintained BM25 inverted index over chunk text"""
+from typing import Dict, List, Tuple
+from array import array
+import re
+import threading
+import numpy as np
+
+TOKEN_RE = re.compile(r'\w+')
+# Dead postings are dropped once they outnumber a quarter of the live docs (and this many)
+COMPACT_MIN = 1000
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; keeps numbers so model names like 'RTX 4060' match"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index with compact postings: per term, an array('I') of doc ids
+    and a parallel array('H') of term frequencies. Docs are vector ids, so
+    hits line up with FAISS results and metadata_store.
+
+    Removed docs are flagged in `alive`, which queries use to skip their
+    postings and to count document frequency over live docs only; the
+    postings themselves are compacted once enough docs have died.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.postings_ids: List[array] = []
+        self.postings_tf: List[array] = []
+        self.doc_len = array('I')
+        self.n_docs = 0
+        self.total_len = 0
+        self.alive = bytearray()
+        self.n_dead = 0
+        # array() cannot grow while NumPy views export its buffer
+        self._lock = threading.Lock()
+
+    def add(self, doc_id: int, text: str):
+        """Index one chunk under its vector id"""
+        with self._lock:
+            self._add(doc_id, text)
+
+    def _add(self, doc_id: int, text: str):
+        tokens = tokenize(text)
+        counts: Dict[str, int] = {}
+        for tok in tokens:
+            counts[tok] = counts.get(tok, 0) + 1
+
+        for tok, tf in counts.items():
+            term_id = self.vocab.get(tok)
+            if term_id is None:
+                term_id = self.vocab[tok] = len(self.postings_ids)
+                self.postings_ids.append(array('I'))
+                self.postings_tf.append(array('H'))
+            self.postings_ids[term_id].append(doc_id)
+            self.postings_tf[term_id].append(min(tf, 65535))
+
+        if doc_id >= len(self.doc_len):
+            self.doc_len.extend([0] * (doc_id + 1 - len(self.doc_len)))
+        if doc_id >= len(self.alive):
+            self.alive.extend(bytes(doc_id + 1 - len(self.alive)))
+        self.doc_len[doc_id] = len(tokens)
+        self.alive[doc_id] = 1
+        self.n_docs += 1
+        self.total_len += len(tokens)
+
+    def add_batch(self, start_id: int, metadata_list: List[dict]):
+        """Index a contiguous batch of newly added chunks"""
+        for i, meta in enumerate(metadata_list):
+            self.add(start_id + i, meta.get('chunk', ''))
+
+    def remove(self, doc_ids):
+        """Mark deleted vectors dead; queries skip them until compaction drops their postings"""
+        with self._lock:
+            for doc_id in doc_ids:
+                doc_id = int(doc_id)
+                if doc_id < len(self.alive) and self.alive[doc_id]:
+                    self.alive[doc_id] = 0
+                    self.n_docs -= 1
+                    self.n_dead += 1
+                    self.total_len -= self.doc_len[doc_id]
+            if self.n_dead > max(COMPACT_MIN, self.n_docs // 4):
+                self._compact()
+
+    def _compact(self):
+        """Drop dead docs from every posting list"""
+        alive = np.frombuffer(self.alive, dtype=bool)
+        for term_id, postings in enumerate(self.postings_ids):
+            ids = np.frombuffer(postings, dtype=np.uint32)
+            keep = alive[ids]
+            if not keep.all():
+                tf = np.frombuffer(self.postings_tf[term_id], dtype=np.uint16)
+                self.postings_ids[term_id] = array('I', ids[keep].tobytes())
+                self.postings_tf[term_id] = array('H', tf[keep].tobytes())
+        self.n_dead = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_metadata(cls, metadata_store: dict) -> 'BM25Index':
+        """Build an index for an existing metadata store"""
+        bm25 = cls()
+        for idx in sorted(metadata_store):
+            bm25.add(idx, metadata_store[idx].get('chunk', ''))
+        return bm25
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, doc ids) for a keyword query, best first"""
+        terms = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not terms or self.n_docs <= 0 or k <= 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+
+        with self._lock:
+            doc_len = np.frombuffer(self.doc_len, dtype=np.uint32)
+            alive = np.frombuffer(self.alive, dtype=bool)
+            avgdl = self.total_len / self.n_docs
+            touched, term_scores = [], []
+
+            for term_id in terms:
+                # Read the postings through buffer views, live docs only, widened for indexing
+                ids = np.frombuffer(self.postings_ids[term_id], dtype=np.uint32)
+                tf = np.frombuffer(self.postings_tf[term_id], dtype=np.uint16)
+                if self.n_dead:
+                    live = alive[ids]
+                    ids, tf = ids[live], tf[live]
+                ids = ids.astype(np.int64)
+                tf = tf.astype(np.float32)
+                df = len(ids)
+                if df == 0:
+                    continue
+                idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_len[ids] / avgdl)
+                touched.append(ids)
+                term_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+            del doc_len, alive
+
+        if not touched:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        # Sum per-term scores over the matching docs only
+        candidates, inverse = np.unique(np.concatenate(touched), return_inverse=True)
+        cand_scores = np.bincount(inverse, weights=np.concatenate(term_scores)).astype(np.float32)
+
+        if len(candidates) > k:
+            top = np.argpartition(-cand_scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-cand_scores[top], kind='stable')]
+        return cand_scores[top], candidates[top]
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuse ranked id lists: score(d) = sum over lists of 1 / (k + rank).
+    Returns (fused scores, ids) best first.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking.tolist()):
+            if doc_id < 0:
+                continue
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+
+    ids = np.fromiter(fused.keys(), dtype=np.int64, count=len(fused))
+    scores = np.fromiter(fused.values(), dtype=np.float64, count=len(fused))
+    order = np.argsort(-scores, kind='stable')
+    return scores[order], ids[order]
@@ -0,0 +1,132 @@
+"""Columnar side store - per-vector metadata fields as NumPy arrays"""
+from typing import Dict, List
+from datetime import datetime
+import numpy as np
+
+# categorizeWebsite() in background.js (and ingest.py) emits these; 'other' takes anything else
+CATEGORIES = ['ecommerce', 'news', 'documentation', 'social', 'video', 'general', 'other']
+
+
+def normalize_timestamp(ts) -> float:
+    """Seconds since epoch; the extension sends Date.now() in milliseconds"""
+    try:
+        ts = float(ts or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return ts / 1000.0 if ts > 1e11 else ts
+
+
+def metadata_nbytes(meta: dict) -> int:
+    """Rough in-memory size of one metadata entry: its strings plus dict overhead"""
+    return 232 + sum(len(v) for v in meta.values() if isinstance(v, str))
+
+
+class MetadataColumns:
+    """
+    Mirrors the fields of metadata_store that search filters and rerankers
+    read, indexed by vector id, so a whole candidate list can be gathered
+    with one fancy-indexing operation instead of a dict lookup per row.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.category_codes: Dict[str, int] = {cat: i for i, cat in enumerate(CATEGORIES)}
+        self.url_codes: Dict[str, int] = {}
+        self.urls: List[str] = []
+        self.present = np.zeros(capacity, dtype=bool)
+        self.category = np.full(capacity, -1, dtype=np.int16)
+        self.timestamp = np.zeros(capacity, dtype=np.float64)
+        self.url = np.full(capacity, -1, dtype=np.int32)
+        # When each vector was last returned in search results (0 = never)
+        self.last_returned = np.zeros(capacity, dtype=np.float64)
+        # Approximate metadata footprint per vector, for byte-based capacity limits
+        self.nbytes = np.zeros(capacity, dtype=np.int32)
+        self.total_bytes = 0
+
+    @classmethod
+    def from_metadata(cls, metadata_store: dict, ntotal: int = None) -> 'MetadataColumns':
+        """Build columns for an existing metadata store"""
+        if ntotal is None:
+            ntotal = max(metadata_store, default=-1) + 1
+        columns = cls(capacity=max(ntotal, 1024))
+        columns.sync(metadata_store, ntotal)
+        return columns
+
+    def category_code(self, category: str) -> int:
+        """Integer code for a category, allocating one if unseen"""
+        code = self.category_codes.get(category)
+        if code is None:
+            code = self.category_codes[category] = len(self.category_codes)
+        return code
+
+    def url_code(self, url: str) -> int:
+        """Integer code for a URL, allocating one if unseen"""
+        code = self.url_codes.get(url)
+        if code is None:
+            code = self.url_codes[url] = len(self.urls)
+            self.urls.append(url)
+        return code
+
+    def set(self, idx: int, meta: dict):
+        """Write one vector's fields"""
+        self._reserve(idx + 1)
+        self.present[idx] = True
+        self.category[idx] = self.category_code(meta.get('category', 'other'))
+        self.timestamp[idx] = normalize_timestamp(meta.get('timestamp', 0))
+        self.url[idx] = self.url_code(meta.get('url', ''))
+        self.last_returned[idx] = 0.0
+        self.total_bytes -= int(self.nbytes[idx])
+        self.nbytes[idx] = metadata_nbytes(meta)
+        self.total_bytes += int(self.nbytes[idx])
+        self.size = max(self.size, idx + 1)
+
+    def append(self, start_id: int, metadata_list: List[dict]):
+        """Write fields for a contiguous batch of new vectors"""
+        for i, meta in enumerate(metadata_list):
+            self.set(start_id + i, meta)
+
+    def remove(self, ids):
+        """Mark deleted vectors as absent so filters skip them"""
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[ids < len(self.present)]
+        ids = ids[self.present[ids]]
+        self.present[ids] = False
+        self.total_bytes -= int(self.nbytes[ids].sum())
+        self.nbytes[ids] = 0
+
+    def touch(self, ids, now: float = None):
+        """Record that vectors were just returned in search results"""
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < len(self.present))]
+        self.last_returned[ids] = now or datetime.now().timestamp()
+
+    def category_counts(self, ids: np.ndarray) -> Dict[str, int]:
+        """Vectors per category among `ids`"""
+        names = {code: name for name, code in dict(self.category_codes).items()}
+        codes, counts = np.unique(self.category[ids], return_counts=True)
+        return {names.get(int(code), 'unknown'): int(n) for code, n in zip(codes, counts)}
+
+    def distinct_urls(self, ids: np.ndarray) -> int:
+        return len(np.unique(self.url[ids]))
+
+    def sync(self, metadata_store: dict, ntotal: int):
+        """Catch up with ids added to metadata_store behind our back"""
+        for idx in range(self.size, ntotal):
+            meta = metadata_store.get(idx)
+            if meta is not None:
+                self.set(idx, meta)
+        self.size = max(self.size, ntotal)
+        self._reserve(self.size)
+
+    def _reserve(self, n: int):
+        """Grow arrays geometrically to hold at least n rows"""
+        capacity = len(self.present)
+        if n <= capacity:
+            return
+        new_capacity = max(n, capacity * 2)
+        for name, fill in (('present', False), ('category', -1), ('timestamp', 0.0), ('url', -1),
+                           ('last_returned', 0.0), ('nbytes', 0)):
+            old = getattr(self, name)
+            grown = np.full(new_capacity, fill, dtype=old.dtype)
+            grown[:capacity] = old
+            setattr(self, name, grown)
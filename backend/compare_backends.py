@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compare embedding backends against the PyTorch reference model:
+single-query latency, batch throughput and embedding cosine drift
+Run: python compare_backends.py --backends torch onnx int8 --texts 2000
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from embeddings import BACKENDS, load_backend
+from bench_hybrid import make_corpus
+
+
+def measure(backend, queries, texts, batch_size: int):
+    """(per-query latencies in seconds, texts/sec, embeddings of texts)"""
+    backend.encode(queries[:5], normalize_embeddings=True)  # warm-up
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        backend.encode([query], normalize_embeddings=True)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    embeddings = backend.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    throughput = len(texts) / (time.perf_counter() - start)
+    return np.array(latencies), throughput, embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--texts', type=int, default=2000, help='chunks for throughput and drift')
+    parser.add_argument('--queries', type=int, default=100, help='single queries for latency')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--k', type=int, default=10, help='neighbours compared for top-k agreement')
+    args = parser.parse_args()
+
+    texts = make_corpus(args.texts)
+    rnd = random.Random(2)
+    queries = [' '.join(rnd.choice(t.split()[:6]) for _ in range(3)) for t in rnd.sample(texts, args.queries)]
+
+    print(f"🧪 {args.model}: {args.queries} queries, {args.texts} chunks, batch {args.batch_size}\n")
+    print("   Loading reference (torch)...")
+    reference = load_backend('torch', args.model, threads=args.threads)
+    ref_latency, ref_throughput, ref_embeddings = measure(reference, queries, texts, args.batch_size)
+    ref_neighbours = np.argsort(-(ref_embeddings[:args.queries] @ ref_embeddings.T), axis=1)[:, 1:args.k + 1]
+
+    rows = []
+    for name in args.backends:
+        if name == 'torch':
+            latency, throughput, embeddings = ref_latency, ref_throughput, ref_embeddings
+        else:
+            print(f"   Loading {name}...")
+            try:
+                backend = load_backend(name, args.model, threads=args.threads)
+            except Exception as e:
+                print(f"   ⚠️ {name} unavailable: {e}")
+                continue
+            latency, throughput, embeddings = measure(backend, queries, texts, args.batch_size)
+
+        cosine = np.sum(embeddings * ref_embeddings, axis=1)
+        neighbours = np.argsort(-(embeddings[:args.queries] @ embeddings.T), axis=1)[:, 1:args.k + 1]
+        overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(neighbours, ref_neighbours)])
+        rows.append((name, latency, throughput, cosine, overlap))
+
+    print(f"\n{'backend':<8} {'p50 ms':>8} {'p95 ms':>8} {'texts/s':>9} {'cos mean':>9} {'cos min':>8} {f'top{args.k}':>7}")
+    for name, latency, throughput, cosine, overlap in rows:
+        print(f"{name:<8} {np.percentile(latency, 50) * 1000:8.2f} {np.percentile(latency, 95) * 1000:8.2f} "
+              f"{throughput:9.1f} {cosine.mean():9.5f} {cosine.min():8.5f} {overlap:7.1%}")
+
+
+if __name__ == '__main__':
+    main()
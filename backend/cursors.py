@@ -0,0 +1,70 @@
+"""Short-lived server-side result lists behind pagination cursors"""
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+import secrets
+import threading
+import time
+
+
+class CursorCache:
+    """
+    The first page of a paginated search stores its whole ordered result list
+    here; later pages are slices of it, so they skip embedding, FAISS and the
+    LLM agents entirely.
+
+    A cursor is '<entry id>.<offset>'. Entries remember the index generation
+    they were computed at and stop resolving once the index changes, after
+    `ttl` seconds, or when pushed out by the `max_entries` most recent lists.
+    """
+
+    def __init__(self, ttl: float = 120.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, generation: Hashable, items: list, page_size: int, base: dict) -> str:
+        """Store a result list; `base` holds the response keys repeated on every page. Returns the entry id"""
+        entry_id = secrets.token_urlsafe(9)
+        with self._lock:
+            self._entries[entry_id] = (generation, time.monotonic() + self.ttl, items, page_size, base)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry_id
+
+    def get(self, cursor: str, generation: Hashable) -> Optional[Tuple[str, list, int, int, dict]]:
+        """(entry id, items, offset, page_size, base) for a live cursor, else None"""
+        entry_id, _, offset = str(cursor).rpartition('.')
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is not None and (entry[0] != generation or entry[1] < time.monotonic()):
+                del self._entries[entry_id]
+                entry = None
+            if entry is None or not offset.isdigit():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+        _, _, items, page_size, base = entry
+        return entry_id, items, int(offset), page_size, base
+
+    @staticmethod
+    def page(entry_id: str, items: list, offset: int, page_size: int) -> Tuple[list, Optional[str]]:
+        """Slice one page and the cursor of the next, None after the last"""
+        end = offset + page_size
+        return items[offset:end], f'{entry_id}.{end}' if end < len(items) else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def parse_page_size(value) -> Optional[int]:
+    """None means unpaginated: the whole list in one response, as before"""
+    if value is None:
+        return None
+    size = int(value)
+    if size < 1:
+        raise ValueError("page_size must be >= 1")
+    return size
@@ -1,5 +1,7 @@
 """Decision Layer - Determines search strategy with Gemini"""
-import google.generativeai as genai
+from llm import json_model
+from metrics import FALLBACKS
+from logs import get_logger
 from models import (
     EnhancedQuery, BrowsingContext, SearchHistory,
     SearchDecision, ActionPlan
@@ -7,6 +9,8 @@ from models import (
 import json
 import os
 
+log = get_logger('decision')
+
 class DecisionAgent:
     """Decides optimal search strategy based on context"""
     
@@ -15,13 +19,7 @@ class DecisionAgent:
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not found in environment")
         
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(
-            'gemini-2.0-flash-exp',
-            generation_config={
-                "response_mime_type": "application/json"
-            }
-        )
+        self.model = json_model(self.api_key, agent='decision')
     
     def decide_strategy(
         self,
@@ -124,13 +122,14 @@ Now decide for the query above."""
             )
         except Exception as e:
             error_msg = str(e)
-            print(f"⚠️ Decision error: {error_msg[:100]}...")
+            log.warning("⚠️ Decision error: %.100s", error_msg)
+            FALLBACKS.inc(component='decision')
             
             # Check for quota/auth errors
             if "429" in error_msg or "quota" in error_msg.lower():
-                print("💡 Tip: Get a free API key at https://makersuite.google.com/app/apikey")
+                log.info("💡 Tip: Get a free API key at https://makersuite.google.com/app/apikey")
             elif "401" in error_msg or "API key" in error_msg:
-                print("💡 Tip: Set GEMINI_API_KEY environment variable")
+                log.info("💡 Tip: Set GEMINI_API_KEY environment variable")
             
             # Fallback to basic semantic search with LOW threshold
             return SearchDecision(
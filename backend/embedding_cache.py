@@ -0,0 +1,164 @@
+"""Content-addressed on-disk cache of chunk embeddings"""
+from typing import List, Tuple
+import hashlib
+import os
+import re
+import threading
+import numpy as np
+
+WHITESPACE_RE = re.compile(r'\s+')
+EMPTY = -1
+
+
+def normalize_text(text: str) -> str:
+    return WHITESPACE_RE.sub(' ', text).strip()
+
+
+class EmbeddingCache:
+    """
+    Append-only float32 records in <name>.vec (read through np.memmap) and
+    their 64-bit content keys in <name>.keys, in the same order. In memory
+    the keys live in an open-addressing hash table of int32 row numbers, so
+    a million entries cost ~20 MB rather than a dict's ~100 MB.
+
+    Keys hash (model, normalized text); one cache directory can serve
+    several models, each in its own pair of files.
+    """
+
+    def __init__(self, cache_dir: str, model_id: str, dimension: int):
+        os.makedirs(cache_dir, exist_ok=True)
+        name = re.sub(r'[^\w.-]+', '_', model_id) + f'-{dimension}'
+        self.model_id = model_id
+        self.dimension = dimension
+        self.vec_path = os.path.join(cache_dir, name + '.vec')
+        self.keys_path = os.path.join(cache_dir, name + '.keys')
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        record = self.dimension * 4
+        vec_rows = os.path.getsize(self.vec_path) // record if os.path.exists(self.vec_path) else 0
+        key_rows = os.path.getsize(self.keys_path) // 8 if os.path.exists(self.keys_path) else 0
+        # A crash between the two appends leaves one file longer; drop the torn tail
+        n = min(vec_rows, key_rows)
+        for path, size in ((self.vec_path, n * record), (self.keys_path, n * 8)):
+            with open(path, 'ab') as f:
+                f.truncate(size)
+
+        self.size = n
+        self.keys = np.zeros(max(1024, 2 * n), dtype=np.uint64)
+        if n:
+            self.keys[:n] = np.fromfile(self.keys_path, dtype=np.uint64)
+        self._slots = np.full(max(1024, 1 << int(2 * n).bit_length()), EMPTY, dtype=np.int32)
+        for row, key in enumerate(self.keys[:n].tolist()):
+            self._insert(key, row)
+        self._vectors = None
+        self._vec_file = open(self.vec_path, 'ab')
+        self._keys_file = open(self.keys_path, 'ab')
+
+    def key(self, text: str) -> int:
+        digest = hashlib.blake2b(
+            normalize_text(text).encode('utf-8'),
+            digest_size=8,
+            person=b'emb-cache',
+            key=self.model_id.encode('utf-8')[:64]
+        ).digest()
+        return int.from_bytes(digest, 'little')
+
+    def _find(self, key: int) -> int:
+        mask = len(self._slots) - 1
+        slot = key & mask
+        while True:
+            row = int(self._slots[slot])
+            if row == EMPTY or int(self.keys[row]) == key:
+                return row
+            slot = (slot + 1) & mask
+
+    def _insert(self, key: int, row: int):
+        mask = len(self._slots) - 1
+        slot = key & mask
+        while self._slots[slot] != EMPTY:
+            slot = (slot + 1) & mask
+        self._slots[slot] = row
+
+    def _grow(self):
+        """Double the table once it is half full, keeping probe chains short"""
+        self._slots = np.full(len(self._slots) * 2, EMPTY, dtype=np.int32)
+        for row, key in enumerate(self.keys[:self.size].tolist()):
+            self._insert(key, row)
+
+    def _mapped(self) -> np.ndarray:
+        """Vector records, remapped when the file has grown"""
+        if self._vectors is None or len(self._vectors) < self.size:
+            self._vec_file.flush()
+            self._vectors = np.memmap(self.vec_path, dtype=np.float32, mode='r', shape=(self.size, self.dimension))
+        return self._vectors
+
+    def lookup(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(embeddings with cached rows filled, indices of texts that missed)"""
+        out = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        with self._lock:
+            rows = np.array([self._find(self.key(t)) if self.size else EMPTY for t in texts], dtype=np.int64)
+            hit = rows != EMPTY
+            if hit.any():
+                out[hit] = self._mapped()[rows[hit]]
+            # Under the lock: concurrent /embed and /add calls would lose updates otherwise
+            missing = np.flatnonzero(~hit)
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return out, missing
+
+    def put(self, texts: List[str], embeddings: np.ndarray):
+        """Append embeddings for texts not already cached"""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock:
+            new_keys, new_rows, seen = [], [], set()
+            for text, vector in zip(texts, embeddings):
+                key = self.key(text)
+                if (self.size and self._find(key) != EMPTY) or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(vector)
+            if not new_keys:
+                return
+
+            # Vectors first: a crash before the keys land just loses the tail
+            self._vec_file.write(np.stack(new_rows).tobytes())
+            self._vec_file.flush()
+            keys = np.array(new_keys, dtype=np.uint64)
+            self._keys_file.write(keys.tobytes())
+            self._keys_file.flush()
+
+            if self.size + len(keys) > len(self.keys):
+                grown = np.zeros(max(len(self.keys) * 2, self.size + len(keys)), dtype=np.uint64)
+                grown[:self.size] = self.keys[:self.size]
+                self.keys = grown
+            self.keys[self.size:self.size + len(keys)] = keys
+            for key in new_keys:
+                self._insert(key, self.size)
+                self.size += 1
+                if self.size * 2 > len(self._slots):
+                    self._grow()
+
+    def encode(self, texts: List[str], model, batch_size: int = 32) -> np.ndarray:
+        """Normalized embeddings for texts, running the model only on cache misses"""
+        embeddings, missing = self.lookup(texts)
+        if len(missing):
+            misses = [texts[i] for i in missing]
+            embeddings[missing] = model.encode(
+                misses, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True
+            )
+            self.put(misses, embeddings[missing])
+        return embeddings
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes': self.size * (self.dimension * 4 + 8)
+            }
@@ -0,0 +1,225 @@
+"""Embedding backends - PyTorch, ONNX Runtime and int8-quantized ONNX behind one encode()"""
+from abc import ABC, abstractmethod
+from typing import List, Optional, Union
+import json
+import os
+import numpy as np
+
+BACKENDS = ['torch', 'onnx', 'int8']
+
+
+class EmbeddingBackend(ABC):
+    """
+    Minimal SentenceTransformer-compatible interface: encode() takes the same
+    arguments the server, ActionsAgent and tools already pass, so a backend
+    can be swapped in wherever a SentenceTransformer was used.
+    """
+    name = 'base'
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @abstractmethod
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """(n, dimension) float32 embeddings"""
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.encode(['dimension probe']).shape[1]
+
+
+class TorchBackend(EmbeddingBackend):
+    """Reference backend: the full SentenceTransformer model on PyTorch"""
+    name = 'torch'
+
+    def __init__(self, model_name: str, threads: Optional[int] = None):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name)
+        self.tokenizer = self.model.tokenizer
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        return self.model.encode(
+            sentences,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=normalize_embeddings,
+            show_progress_bar=False
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+def _export_onnx(model_name: str, path: str):
+    """One-time export of the transformer to ONNX (needs torch + transformers)"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = tokenizer(['export the encoder graph'], return_tensors='pt')
+    names = [n for n in ('input_ids', 'attention_mask', 'token_type_ids') if n in dummy]
+
+    class Encoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(names, inputs))).last_hidden_state
+
+    axes = {0: 'batch', 1: 'sequence'}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(),
+            tuple(dummy[n] for n in names),
+            path,
+            input_names=names,
+            output_names=['last_hidden_state'],
+            dynamic_axes={n: axes for n in names + ['last_hidden_state']},
+            opset_version=14
+        )
+
+
+def _max_seq_length(model_name: str, tokenizer) -> int:
+    """
+    Truncation length SentenceTransformer uses for a model: max_seq_length from
+    its sentence_bert_config.json, else the smaller of the tokenizer's and the
+    position embeddings' limits
+    """
+    try:
+        if os.path.isdir(model_name):
+            path = os.path.join(model_name, 'sentence_bert_config.json')
+        else:
+            from huggingface_hub import hf_hub_download
+            path = hf_hub_download(model_name, 'sentence_bert_config.json')
+        with open(path) as f:
+            length = json.load(f).get('max_seq_length')
+        if length:
+            return int(length)
+    except Exception:
+        pass  # Not a sentence-transformers repo
+
+    from transformers import AutoConfig
+    length = tokenizer.model_max_length
+    positions = getattr(AutoConfig.from_pretrained(model_name), 'max_position_embeddings', None)
+    return min(length, positions) if positions else length
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Same tokenizer and mean pooling as the SentenceTransformer, with the
+    transformer run by ONNX Runtime. The graph is exported once and cached
+    under cache_dir; later starts don't import PyTorch at all.
+    """
+    name = 'onnx'
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str = 'onnx_models',
+        threads: Optional[int] = None,
+        max_seq_length: Optional[int] = None
+    ):
+        super().__init__(model_name)
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_dir = os.path.join(cache_dir, model_name.replace('/', '__'))
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # Truncate where the torch backend does, or the two drift apart on long chunks
+        self.max_seq_length = max_seq_length or _max_seq_length(model_name, self.tokenizer)
+
+        path = self._model_path()
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        hidden = self.session.get_outputs()[0].shape[-1]
+        self.dimension = hidden if isinstance(hidden, int) else self.encode(['dimension probe']).shape[1]
+
+    def _model_path(self) -> str:
+        path = os.path.join(self.model_dir, 'model.onnx')
+        if not os.path.exists(path):
+            print(f"📦 Exporting {self.model_name} to ONNX (one-time)...")
+            _export_onnx(self.model_name, path)
+        return path
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        if not sentences:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        # Length-sorted batches minimize padding, as SentenceTransformer does
+        order = np.argsort([-len(s) for s in sentences], kind='stable')
+        out = [None] * len(sentences)
+        for start in range(0, len(sentences), batch_size):
+            batch_ids = order[start:start + batch_size]
+            tokens = self.tokenizer(
+                [sentences[i] for i in batch_ids],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors='np'
+            )
+            feed = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+            if 'token_type_ids' in self.input_names and 'token_type_ids' not in feed:
+                feed['token_type_ids'] = np.zeros_like(feed['input_ids'])
+            hidden = self.session.run(None, feed)[0]
+
+            # Mean pooling over real tokens
+            mask = tokens['attention_mask'][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            for row, i in enumerate(batch_ids):
+                out[i] = pooled[row]
+
+        embeddings = np.stack(out).astype(np.float32)
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+
+class QuantizedOnnxBackend(OnnxBackend):
+    """ONNX backend with int8 weights from dynamic quantization of the exported graph"""
+    name = 'int8'
+
+    def _model_path(self) -> str:
+        path = os.path.join(self.model_dir, 'model-int8.onnx')
+        if not os.path.exists(path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            source = super()._model_path()
+            print(f"📦 Quantizing {self.model_name} to int8 (one-time)...")
+            quantize_dynamic(source, path, weight_type=QuantType.QInt8)
+        return path
+
+
+def load_backend(name: str, model_name: str, **kwargs) -> EmbeddingBackend:
+    """Create an embedding backend by name: 'torch', 'onnx' or 'int8'"""
+    backends = {
+        'torch': TorchBackend,
+        'onnx': OnnxBackend,
+        'int8': QuantizedOnnxBackend
+    }
+    if name not in backends:
+        raise ValueError(f"Unknown embedding backend '{name}', expected one of {BACKENDS}")
+    if name == 'torch':
+        kwargs.pop('cache_dir', None)
+        kwargs.pop('max_seq_length', None)
+    return backends[name](model_name, **kwargs)
@@ -0,0 +1,180 @@
+"""Capacity limit for the vector index with pluggable eviction policies"""
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+import threading
+import numpy as np
+
+from columns import MetadataColumns
+from ranking import Reranker
+from logs import get_logger
+
+log = get_logger('eviction')
+
+
+class EvictionPolicy(ABC):
+    """Picks which live vectors to evict first"""
+    name = 'base'
+
+    def __init__(self, memory=None):
+        self.memory = memory
+
+    @abstractmethod
+    def keys(self, ids: np.ndarray, columns: MetadataColumns) -> np.ndarray:
+        """Eviction priority per id; lowest goes first"""
+
+    def select(self, columns: MetadataColumns, n: int) -> np.ndarray:
+        """The n most evictable live vector ids"""
+        ids = np.flatnonzero(columns.present[:columns.size])
+        if n <= 0 or len(ids) == 0:
+            return ids[:0]
+        keys = self.keys(ids, columns)
+        if n < len(ids):
+            ids = ids[np.argpartition(keys, n - 1)[:n]]
+        return ids
+
+
+class OldestFirst(EvictionPolicy):
+    """Evict the chunks captured longest ago"""
+    name = 'oldest'
+
+    def keys(self, ids, columns):
+        return columns.timestamp[ids]
+
+
+class LeastRecentlyReturned(EvictionPolicy):
+    """Evict chunks that have gone longest without appearing in results"""
+    name = 'lru'
+
+    def keys(self, ids, columns):
+        # Never-returned chunks count from when they were captured
+        return np.maximum(columns.last_returned[ids], columns.timestamp[ids])
+
+
+class LowestValueSites(EvictionPolicy):
+    """Evict chunks from the sites the user visits and clicks least, oldest first"""
+    name = 'low_value'
+
+    def __init__(self, memory=None):
+        super().__init__(memory)
+        self._reranker = None
+
+    def keys(self, ids, columns):
+        if self._reranker is None or self._reranker.columns is not columns:
+            self._reranker = Reranker(columns, self.memory)
+        value = self._reranker.url_frequency()[columns.url[ids]]
+        # Lowest value first; oldest first within a value level
+        order = np.lexsort((columns.timestamp[ids], value))
+        keys = np.empty(len(ids), dtype=np.int64)
+        keys[order] = np.arange(len(ids))
+        return keys
+
+
+POLICIES = {
+    'oldest': OldestFirst,
+    'lru': LeastRecentlyReturned,
+    'low_value': LowestValueSites
+}
+
+
+class IndexEvictor:
+    """
+    Keeps the index under max_vectors and/or max_bytes. A background thread
+    wakes up after every /add (or each interval) and evicts in batches,
+    taking the write lock once per batch so searches and adds interleave.
+    """
+
+    def __init__(
+        self,
+        index,
+        columns: MetadataColumns,
+        drop_fn: Callable,
+        policy: EvictionPolicy,
+        max_vectors: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        lock: threading.Lock = None,
+        batch_size: int = 256,
+        interval: float = 5.0
+    ):
+        self.index = index
+        self.columns = columns
+        self.drop_fn = drop_fn
+        self.policy = policy
+        self.max_vectors = max_vectors
+        self.max_bytes = max_bytes
+        self.lock = lock or threading.Lock()
+        self.batch_size = batch_size
+        self.interval = interval
+        self.evictions = 0
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_vectors or self.max_bytes)
+
+    def usage_bytes(self) -> int:
+        """Vector storage (float32 + id) plus metadata estimate"""
+        return self.index.ntotal * (self.index.d * 4 + 8) + self.columns.total_bytes
+
+    def excess(self) -> int:
+        """How many vectors must go to get back under capacity"""
+        n = self.index.ntotal
+        if n == 0:
+            return 0
+        excess = 0
+        if self.max_vectors:
+            excess = n - self.max_vectors
+        if self.max_bytes:
+            over = self.usage_bytes() - self.max_bytes
+            if over > 0:
+                per_vector = self.usage_bytes() / n
+                excess = max(excess, int(np.ceil(over / per_vector)))
+        return max(excess, 0)
+
+    def evict_batch(self) -> int:
+        """Evict up to one batch; returns how many vectors were removed"""
+        with self.lock:
+            n = min(self.excess(), self.batch_size)
+            ids = self.policy.select(self.columns, n)
+            if len(ids) == 0:
+                return 0
+            vectors = self.index.reconstruct_batch(ids)
+            self.index.remove_ids(ids)
+            self.drop_fn(ids, vectors)
+            self.evictions += len(ids)
+            return len(ids)
+
+    def notify(self):
+        """Wake the background thread, e.g. after new vectors were added"""
+        self._wake.set()
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='index-evictor', daemon=True)
+            self._thread.start()
+
+    def stats(self) -> dict:
+        return {
+            'policy': self.policy.name,
+            'max_vectors': self.max_vectors,
+            'max_bytes': self.max_bytes,
+            'vectors': self.index.ntotal,
+            'bytes': self.usage_bytes(),
+            'evictions': self.evictions
+        }
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                evicted = 0
+                while self.excess() > 0:
+                    removed = self.evict_batch()
+                    if removed == 0:
+                        break
+                    evicted += removed
+                if evicted:
+                    log.info("🧹 Evicted %d vectors (%s), %d remain", evicted, self.policy.name, self.index.ntotal)
+            except Exception as e:
+                log.exception("⚠️ Eviction failed: %s", e)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini REST API, for load-testing the cognitive pipeline
+Answers generateContent with canned but plausible JSON for the perception,
+decision and answer-verification prompts, after a configurable delay.
+
+Run: python fake_gemini.py --port 8765 --latency-ms 400 --jitter-ms 150 --rate-429 0.05
+     GEMINI_API_ENDPOINT=http://127.0.0.1:8765 GEMINI_API_KEY=fake USE_COGNITIVE_AI=true python server.py
+"""
+
+import argparse
+import copy
+import json
+import random
+import re
+import threading
+import time
+
+from flask import Flask, jsonify, request
+
+STOPWORDS = {'the', 'a', 'an', 'i', 'is', 'was', 'of', 'for', 'to', 'in', 'on', 'that', 'what', 'who',
+             'when', 'where', 'why', 'how', 'which', 'about', 'me', 'my', 'saw', 'did', 'do', 'and'}
+CATEGORY_WORDS = {
+    'ecommerce': {'buy', 'price', 'deal', 'cart', 'laptop', 'phone', 'shoes', 'cheap', 'review', 'product'},
+    'news': {'news', 'election', 'market', 'report', 'breaking', 'economy', 'policy', 'sports'},
+    'docs': {'python', 'api', 'install', 'function', 'error', 'tutorial', 'docs', 'example', 'configure'},
+    'social': {'post', 'thread', 'reddit', 'twitter', 'comment', 'video', 'community'}
+}
+STRATEGY_FOR_INTENT = {'compare': 'comparative', 'recall': 'temporal', 'search': 'hybrid', 'explore': 'semantic'}
+
+
+def _quoted(prompt: str, label: str) -> str:
+    match = re.search(label + r':\s*"(.*)"', prompt)
+    return match.group(1) if match else ''
+
+
+def perception(prompt: str, rnd: random.Random) -> dict:
+    query = _quoted(prompt, 'Query')
+    words = re.findall(r'\w+', query.lower())
+    terms = [w for w in words if w not in STOPWORDS]
+    if {'vs', 'versus', 'compare', 'better', 'best'} & set(words):
+        intent = 'compare'
+    elif {'saw', 'seen', 'yesterday', 'earlier', 'visited', 'remember'} & set(words):
+        intent = 'recall'
+    elif len(terms) <= 1:
+        intent = 'explore'
+    else:
+        intent = 'search'
+    temporal = ('recent' if {'yesterday', 'today', 'earlier'} & set(words) else
+                'last_week' if 'week' in words else
+                'last_month' if 'month' in words else None)
+    hints = [c for c, vocab in CATEGORY_WORDS.items() if vocab & set(words)] or ['other']
+    return {
+        'expanded_terms': ([query] + terms)[:5],
+        'intent': intent,
+        'temporal_context': temporal,
+        'category_hints': hints,
+        'confidence': round(rnd.uniform(0.7, 0.95), 2),
+        'reasoning': f"User wants to {intent} {' '.join(terms[:3]) or 'something'}, likely {hints[0]} content"
+    }
+
+
+def decision(prompt: str, rnd: random.Random) -> dict:
+    query = _quoted(prompt, 'Original')
+    intent = (re.search(r'Intent:\s*(\w+)', prompt) or [None, 'search'])[1]
+    hints = re.findall(r"'(\w+)'", (re.search(r'Category hints:\s*(\[.*\])', prompt) or [None, ''])[1])
+    strategy = STRATEGY_FOR_INTENT.get(intent, 'semantic')
+    category = hints[0] if hints and hints[0] != 'other' and intent == 'compare' else None
+    return {
+        'strategy': strategy,
+        'search_params': {
+            'query_text': query,
+            'k': rnd.choice([30, 50, 50, 80]),
+            'category_filter': category,
+            'time_window_days': 7 if intent == 'recall' else None
+        },
+        'filters': {
+            'min_similarity': round(rnd.uniform(0.65, 0.75), 2),
+            'categories': [h for h in hints if h != 'other'],
+            'exclude_urls': []
+        },
+        'ranking_weights': {
+            'semantic_similarity': 0.6 if strategy != 'temporal' else 0.4,
+            'temporal_relevance': 0.4 if strategy == 'temporal' else 0.1,
+            'category_match': 0.2,
+            'frequency': 0.1 if strategy == 'comparative' else 0.0
+        },
+        'reasoning': f"{intent.title()} intent, so a {strategy} search fits best",
+        'confidence': round(rnd.uniform(0.7, 0.9), 2)
+    }
+
+
+def verification(prompt: str, rnd: random.Random) -> dict:
+    n = len(re.findall(r'\[Result \d+\]', prompt))
+    has_answer = n > 0 and rnd.random() < 0.8
+    return {
+        'has_answer': has_answer,
+        'confidence': round(rnd.uniform(0.6, 0.95), 2),
+        'reasoning': 'Top results discuss the question directly' if has_answer else 'Results are related but do not answer it',
+        'answerable_result_indices': list(range(max(1, n // 2 + 1))) if has_answer else []
+    }
+
+
+def entities(prompt: str, rnd: random.Random) -> dict:
+    return {'products': [], 'brands': [], 'locations': [], 'dates': [], 'prices': []}
+
+
+# Prompt marker -> (stage, responder); first match wins
+STAGES = [
+    ('Decide the optimal search strategy', 'decision', decision),
+    ('answer verification system', 'verification', verification),
+    ('Extract entities', 'entities', entities),
+    ('Analyze this search query', 'perception', perception)
+]
+
+
+def create_app(latency_ms: float = 400, jitter_ms: float = 150, rate_429: float = 0.0, seed: int = None) -> Flask:
+    """Flask app serving POST /v1beta/models/<model>:generateContent; GET /stats reports traffic"""
+    app = Flask(__name__)
+    rnd = random.Random(seed)
+    lock = threading.Lock()
+    stats = {'requests': 0, 'throttled': 0, 'stages': {}}
+
+    @app.route('/v1beta/models/<path:target>', methods=['POST'])
+    def generate_content(target):
+        if not target.endswith(':generateContent'):
+            return jsonify({'error': {'code': 404, 'message': f'Unsupported method {target}', 'status': 'NOT_FOUND'}}), 404
+        body = request.get_json(force=True, silent=True) or {}
+        prompt = '\n'.join(
+            part.get('text', '')
+            for content in body.get('contents', [])
+            for part in content.get('parts', [])
+        )
+        stage, respond = next(((s, fn) for marker, s, fn in STAGES if marker in prompt), ('unknown', None))
+
+        with lock:
+            stats['requests'] += 1
+            counts = stats['stages'].setdefault(stage, {'requests': 0, 'throttled': 0})
+            counts['requests'] += 1
+            throttled = rnd.random() < rate_429
+            delay = max(0.0, rnd.gauss(latency_ms, jitter_ms)) / 1000
+            if throttled:
+                stats['throttled'] += 1
+                counts['throttled'] += 1
+            data = respond(prompt, rnd) if respond else {}
+
+        if throttled:
+            # Quota errors come back quickly, like the real API
+            time.sleep(delay / 10)
+            return jsonify({'error': {
+                'code': 429,
+                'message': 'Resource has been exhausted (e.g. check quota).',
+                'status': 'RESOURCE_EXHAUSTED'
+            }}), 429
+
+        time.sleep(delay)
+        text = json.dumps(data)
+        return jsonify({
+            'candidates': [{
+                'content': {'parts': [{'text': text}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0
+            }],
+            'usageMetadata': {
+                'promptTokenCount': len(prompt) // 4,
+                'candidatesTokenCount': len(text) // 4,
+                'totalTokenCount': (len(prompt) + len(text)) // 4
+            },
+            'modelVersion': target.split(':')[0]
+        })
+
+    @app.route('/stats', methods=['GET'])
+    def get_stats():
+        with lock:
+            return jsonify(copy.deepcopy(stats))
+
+    app.config['FAKE_GEMINI_STATS'] = stats
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=400, help='mean response delay')
+    parser.add_argument('--jitter-ms', type=float, default=150, help='standard deviation of the delay')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='fraction of calls answered with 429')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.rate_429, args.seed)
+    print(f"🤖 Fake Gemini on http://{args.host}:{args.port} "
+          f"({args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, {args.rate_429:.0%} 429s)")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Highlight engine - exact character spans for query terms in chunk text"""
+from typing import Dict, List, Any, Iterable, Optional
+from functools import lru_cache
+import re
+import threading
+import numpy as np
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=256)
+def compile_matcher(terms: tuple) -> re.Pattern:
+    """One case-insensitive alternation for all terms, longest first"""
+    ordered = sorted(set(terms), key=len, reverse=True)
+    return re.compile(r'\b(?:' + '|'.join(re.escape(t) for t in ordered) + r')\b', re.IGNORECASE)
+
+
+def query_terms(query: str, expanded_terms: Iterable[str] = ()) -> tuple:
+    """Significant words of the query plus expansion phrases"""
+    terms = [w for w in TOKEN_RE.findall(query.lower()) if len(w) > 3]
+    for phrase in expanded_terms:
+        phrase = ' '.join(TOKEN_RE.findall(phrase.lower()))
+        if len(phrase) > 3 and phrase != query.lower().strip():
+            terms.append(phrase)
+    return tuple(terms)
+
+
+class HighlightEngine:
+    """
+    Tokenizes chunks once at ingest and keeps their token character offsets,
+    so at query time a match found by the compiled matcher can be widened to
+    whole surrounding tokens with a binary search instead of re-splitting.
+
+    Offsets are a cache, not state: only the `max_chunks` most recently
+    indexed chunks are kept, and a chunk without offsets (evicted, or added
+    before a restart) is tokenized on its first highlight.
+    """
+
+    def __init__(self, context_tokens: int = 3, max_highlights: int = 5, max_chunks: int = 100000):
+        self.context_tokens = context_tokens
+        self.max_highlights = max_highlights
+        self.max_chunks = max_chunks
+        self.offsets: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def index_chunk(self, idx: int, text: str) -> np.ndarray:
+        """Store token start offsets and end offsets of the chunk as the two rows of one array"""
+        spans = [m.span() for m in TOKEN_RE.finditer(text)]
+        dtype = np.uint16 if len(text) < 65536 else np.int32
+        offsets = np.ascontiguousarray(np.array(spans, dtype=dtype).reshape(-1, 2).T)
+        with self._lock:
+            self.offsets[idx] = offsets
+            # Dicts keep insertion order, so the first keys are the oldest chunks
+            while len(self.offsets) > self.max_chunks:
+                del self.offsets[next(iter(self.offsets))]
+        return offsets
+
+    def index_batch(self, start_id: int, metadata_list: List[dict]):
+        """Tokenize a contiguous batch of newly added chunks"""
+        for i, meta in enumerate(metadata_list):
+            self.index_chunk(start_id + i, meta.get('chunk', ''))
+
+    def remove(self, ids: Iterable[int]):
+        """Forget offsets for deleted vectors"""
+        with self._lock:
+            for idx in ids:
+                self.offsets.pop(int(idx), None)
+
+    def extract(self, idx: int, text: str, terms: tuple, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Find query terms in `text` and return highlight spans:
+        start/end cover the match plus surrounding context tokens,
+        match_start/match_end cover the matched term itself. With `limit`
+        (the returned snippet length) only matches inside text[:limit] count
+        and spans are clipped to it.
+        """
+        if not terms or not text:
+            return []
+        limit = len(text) if limit is None else min(limit, len(text))
+
+        matches = []
+        for match in compile_matcher(terms).finditer(text):
+            if match.end() > limit or len(matches) >= self.max_highlights:
+                break
+            matches.append(match.span())
+        if not matches:
+            return []
+
+        offsets = self.offsets.get(idx)
+        if offsets is None:
+            offsets = self.index_chunk(idx, text)
+        starts, ends = offsets
+
+        # One binary search per offset row for all matches; same dtype as the
+        # offsets so searchsorted doesn't convert them
+        m_starts, m_ends = np.array(matches, dtype=offsets.dtype).T
+        first_tok = starts.searchsorted(m_starts, side='right').tolist()
+        last_tok = ends.searchsorted(m_ends, side='left').tolist()
+
+        spans = []
+        for (m_start, m_end), first, last in zip(matches, first_tok, last_tok):
+            lo = max(0, first - 1 - self.context_tokens)
+            hi = min(len(starts) - 1, last + self.context_tokens)
+            start, end = int(starts[lo]), min(int(ends[hi]), limit)
+            spans.append({
+                'start': start,
+                'end': end,
+                'match_start': m_start,
+                'match_end': m_end,
+                'text': text[start:end]
+            })
+        return spans
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Offline bulk ingest of page dumps into the search index
+Input: NDJSON/JSONL, one page per line with url, title, category, timestamp, text
+Run (with the server stopped, from backend/): python ingest.py pages.jsonl --workers 4
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from multiprocessing import Pool
+from typing import Iterator, List, Tuple
+
+import faiss
+import numpy as np
+
+from columns import normalize_timestamp
+from embeddings import BACKENDS, load_backend
+from embedding_cache import EmbeddingCache
+from storage import load_index, load_bm25, load_page_index, save_all, load_model_config, save_model_config
+
+DEFAULT_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+MAX_CONTENT = 50000
+CHUNK_SIZE = 500
+SENTENCE_RE = re.compile(r'[^.!?]+[.!?]+')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Same rules as categorizeWebsite() in background.js
+CATEGORY_PATTERNS = {
+    'ecommerce': ['amazon', 'ebay', 'shopify', 'shop', 'cart', 'product', 'buy', 'price', 'store'],
+    'social': ['facebook', 'twitter', 'instagram', 'linkedin', 'reddit', 'tiktok'],
+    'news': ['news', 'article', 'blog', 'post', 'medium'],
+    'documentation': ['docs', 'documentation', 'api', 'reference', 'guide', 'github'],
+    'video': ['youtube', 'vimeo', 'video', 'watch', 'netflix']
+}
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE) -> List[str]:
+    """Sentence-packed chunks, identical to chunkText() in content-v2.js"""
+    text = WHITESPACE_RE.sub(' ', text).strip()[:MAX_CONTENT]
+    sentences = SENTENCE_RE.findall(text) or [text]
+
+    chunks = []
+    current = ''
+    for sentence in sentences:
+        if len(current + sentence) > chunk_size and current:
+            chunks.append(current.strip())
+            current = sentence
+        else:
+            current += ' ' + sentence
+    if current:
+        chunks.append(current.strip())
+    return [c for c in chunks if c]
+
+
+def categorize(url: str, text: str) -> str:
+    url, text = url.lower(), text.lower()
+    for category, patterns in CATEGORY_PATTERNS.items():
+        if sum(1 for p in patterns if p in url or p in text) >= 2:
+            return category
+    return 'general'
+
+
+def read_pages(path: str, offset: int = 0) -> Iterator[Tuple[dict, int]]:
+    """Yield (page, byte offset just past it), starting at a checkpointed offset"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                page = json.loads(line)
+            except ValueError:
+                print(f"⚠️ Skipping malformed line at byte {offset - len(line)}")
+                continue
+            if page.get('url') and page.get('text'):
+                yield page, offset
+
+
+def page_metadata(page: dict, chunks: List[str]) -> List[dict]:
+    """Per-chunk metadata in the shape the extension posts to /add"""
+    timestamp = page.get('timestamp') or int(time.time() * 1000)
+    category = page.get('category') or categorize(page['url'], page['text'])
+    return [
+        {
+            'url': page['url'],
+            'chunk': chunk,
+            'chunkIndex': i,
+            'title': page.get('title', ''),
+            'category': category,
+            'favicon': page.get('favicon'),
+            'timestamp': timestamp
+        }
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def batches(pages: Iterator[Tuple[dict, int]], batch_size: int, skip_urls: set):
+    """Group page chunks into embedding batches of about batch_size, on page boundaries"""
+    texts, metas, n_pages, offset = [], [], 0, None
+    for page, offset in pages:
+        if page['url'] in skip_urls:
+            continue
+        chunks = chunk_text(page['text'])
+        if not chunks:
+            continue
+        texts.extend(chunks)
+        metas.extend(page_metadata(page, chunks))
+        skip_urls.add(page['url'])
+        n_pages += 1
+        if len(texts) >= batch_size:
+            yield texts, metas, n_pages, offset
+            texts, metas, n_pages = [], [], 0
+    if texts or offset is not None:
+        yield texts, metas, n_pages, offset
+
+
+# --- Worker process: one model per worker, loaded once ---
+
+_model = None
+_load_error = None
+
+
+def _init_worker(backend: str, model_name: str, threads: int):
+    global _model, _load_error
+    try:
+        _model = load_backend(backend, model_name, threads=threads)
+    except Exception as e:
+        # Raising here would make the pool respawn workers forever; fail the first task instead
+        _load_error = e
+
+
+def _embed(texts: List[str], encode_batch: int) -> np.ndarray:
+    if _load_error is not None:
+        raise RuntimeError(f"embedding worker failed to load the model: {_load_error}")
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    embeddings = _model.encode(texts, convert_to_numpy=True, normalize_embeddings=True, batch_size=encode_batch)
+    return embeddings.astype(np.float32)
+
+
+class Ingester:
+    """Adds embedded batches to the index and checkpoints progress"""
+
+    def __init__(
+        self,
+        input_path: str,
+        checkpoint_path: str,
+        dimension: int,
+        checkpoint_every: int,
+        segment_days: int = 7,
+        retention_days: int = None
+    ):
+        self.input_path = os.path.abspath(input_path)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.index, self.metadata_store = load_index(dimension, segment_days, retention_days)
+        self.bm25 = load_bm25(self.metadata_store)
+        self.page_index = load_page_index(self.index, self.metadata_store)
+        self.state = self._load_checkpoint()
+        self._since_checkpoint = 0
+
+    def _load_checkpoint(self) -> dict:
+        state = {'input': self.input_path, 'offset': 0, 'pages': 0, 'chunks': 0}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                saved = json.load(f)
+            if saved.get('input') == self.input_path:
+                state.update(saved)
+                print(f"↩️ Resuming at byte {state['offset']} ({state['pages']} pages, {state['chunks']} chunks done)")
+        return state
+
+    def known_urls(self) -> set:
+        """Pages already in the index are skipped, so a resumed run never duplicates"""
+        return {url for url, page in self.page_index.url_ids.items() if self.page_index.counts[page] > 0}
+
+    def add(self, embeddings: np.ndarray, metadata_list: List[dict], n_pages: int, offset: int):
+        if len(metadata_list):
+            faiss.normalize_L2(embeddings)
+            start_id = self.index.reserve_ids(len(embeddings))
+            ids = np.arange(start_id, start_id + len(embeddings))
+            self.index.add_with_ids(
+                embeddings, ids,
+                [meta['category'] for meta in metadata_list],
+                [normalize_timestamp(meta['timestamp']) or None for meta in metadata_list]
+            )
+            added_at = datetime.now().isoformat()
+            for i, meta in enumerate(metadata_list):
+                self.metadata_store[start_id + i] = {**meta, 'added_at': added_at}
+            self.bm25.add_batch(start_id, metadata_list)
+            self.page_index.add(ids, embeddings, metadata_list)
+
+        self.state['offset'] = offset
+        self.state['pages'] += n_pages
+        self.state['chunks'] += len(metadata_list)
+        self._since_checkpoint += len(metadata_list)
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Save the index first, then the offset - a crash in between only re-reads pages we skip anyway"""
+        save_all(self.index, self.metadata_store, self.bm25, self.page_index)
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.checkpoint_path)
+        self._since_checkpoint = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='NDJSON/JSONL page dump')
+    parser.add_argument('--model', help=f'embedding model (default: the one in model.json, else {DEFAULT_MODEL})')
+    parser.add_argument('--backend', choices=BACKENDS,
+                        help='embedding backend (default: $EMBEDDING_BACKEND, else the one in model.json, else torch)')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--batch-size', type=int, default=1024, help='chunks per worker task')
+    parser.add_argument('--encode-batch', type=int, default=128, help='model forward-pass batch size')
+    parser.add_argument('--checkpoint-every', type=int, default=20000, help='chunks between checkpoints')
+    parser.add_argument('--checkpoint', help='checkpoint file (default: <input>.checkpoint.json)')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    parser.add_argument('--cache-dir', default='embedding_cache', help="embedding cache shared with the server ('' disables)")
+    # Same partitioning as the server, which reads the same variables
+    parser.add_argument('--segment-days', type=int, default=int(os.getenv('SEGMENT_DAYS', '7')),
+                        help='days per index segment (default: $SEGMENT_DAYS, else 7)')
+    parser.add_argument('--retention-days', type=int, default=int(os.getenv('RETENTION_DAYS', '0')),
+                        help='segment retention, 0 keeps everything (default: $RETENTION_DAYS, else 0)')
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or args.input + '.checkpoint.json'
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    # Stored vectors only make sense for the model that produced them
+    stored = load_model_config()
+    if stored and args.model and args.model != stored['model']:
+        sys.exit(f"❌ The index was built with {stored['model']}; ingest with that model, "
+                 f"or switch the server with MIGRATE_TO_MODEL={args.model} first")
+    model_name = stored['model'] if stored else args.model or DEFAULT_MODEL
+    # Resolved like the server does, so both share embedding cache entries
+    backend = args.backend or os.getenv('EMBEDDING_BACKEND', '').lower() or (stored or {}).get('backend') or 'torch'
+
+    print(f"🚀 Starting {args.workers} embedding workers ({model_name}, {backend})...")
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    pool = Pool(args.workers, initializer=_init_worker, initargs=(backend, model_name, threads))
+    # Probe the dimension from a worker so the main process never loads the model
+    dimension = pool.apply(_embed, (['dimension probe'], 1)).shape[1]
+
+    ingester = Ingester(
+        args.input, checkpoint_path, dimension, args.checkpoint_every,
+        args.segment_days, args.retention_days or None
+    )
+    if ingester.index.ntotal and ingester.index.d != dimension:
+        pool.terminate()
+        sys.exit(f"❌ Stored vectors are {ingester.index.d}-d but {model_name} is {dimension}-d; "
+                 f"ingest with the model the index was built with")
+    if not stored:
+        save_model_config(model_name, backend, dimension)
+    cache = EmbeddingCache(args.cache_dir, f"{model_name}:{backend}", dimension) if args.cache_dir else None
+    work = batches(
+        read_pages(args.input, ingester.state['offset']),
+        args.batch_size,
+        ingester.known_urls()
+    )
+
+    start = time.perf_counter()
+    pages = chunks = cached = 0
+    last_report = start
+    pending = deque()
+
+    def submit(texts, metas, n_pages, offset):
+        """Send only cache misses to the workers"""
+        embeddings, missing = cache.lookup(texts) if cache else (None, np.arange(len(texts)))
+        job = pool.apply_async(_embed, ([texts[i] for i in missing], args.encode_batch)) if len(missing) else None
+        pending.append((job, texts, embeddings, missing, metas, n_pages, offset))
+
+    def finish():
+        nonlocal pages, chunks, cached
+        job, texts, embeddings, missing, metas, n_pages, offset = pending.popleft()
+        if job is not None:
+            fresh = job.get()
+            if cache:
+                embeddings[missing] = fresh
+                cache.put([texts[i] for i in missing], fresh)
+            else:
+                embeddings = fresh
+        ingester.add(embeddings, metas, n_pages, offset)
+        pages += n_pages
+        chunks += len(metas)
+        cached += len(metas) - len(missing)
+
+    try:
+        for texts, metas, n_pages, offset in work:
+            submit(texts, metas, n_pages, offset)
+            # Bounded in-flight work keeps memory flat on huge dumps; results are added in input order
+            while len(pending) > args.workers * 2 or (pending and (pending[0][0] is None or pending[0][0].ready())):
+                finish()
+
+            now = time.perf_counter()
+            if now - last_report >= 10:
+                elapsed = now - start
+                print(f"   {pages} pages, {chunks} chunks ({cached} cached) - "
+                      f"{pages / elapsed:.1f} pages/s, {chunks / elapsed:.1f} chunks/s")
+                last_report = now
+
+        while pending:
+            finish()
+    finally:
+        # Everything added so far is kept, even on Ctrl-C
+        ingester.checkpoint()
+        pool.terminate()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Ingested {pages} pages / {chunks} chunks in {elapsed:.1f}s "
+          f"({pages / max(elapsed, 1e-9):.1f} pages/s, {chunks / max(elapsed, 1e-9):.1f} chunks/s)")
+    print(f"   {cached} chunk embeddings came from the cache; index now holds {ingester.index.ntotal} vectors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Asynchronous /add pipeline: queued pages coalesced into large index commits"""
+from collections import OrderedDict, deque
+from typing import Callable, List, Optional, Tuple
+import atexit
+import threading
+import time
+import uuid
+import numpy as np
+
+from logs import get_logger
+
+log = get_logger('ingest')
+
+# (normalized embeddings, metadata list, name of the model that embedded it) for one /add request
+Page = Tuple[np.ndarray, List[dict], Optional[str]]
+
+
+def validate_page(embeddings: np.ndarray, metadata_list) -> Optional[str]:
+    """Reason a page would fail to commit, checked before it is queued; None if it is fine"""
+    if not isinstance(metadata_list, list) or not metadata_list:
+        return 'metadata must be a non-empty list'
+    if embeddings.ndim != 2 or len(embeddings) != len(metadata_list):
+        return 'Expected one embedding per metadata entry'
+    for meta in metadata_list:
+        if not isinstance(meta, dict):
+            return 'Each metadata entry must be an object'
+        for key in ('url', 'title', 'chunk', 'category'):
+            if meta.get(key) is not None and not isinstance(meta[key], str):
+                return f'metadata.{key} must be a string'
+    return None
+
+
+class QueueFull(Exception):
+    """Raised by submit() when accepting a page would exceed the queue bounds"""
+
+
+class IngestQueue:
+    """
+    /add validates a page and submits it here, getting a ticket back at once.
+    One background committer drains the queue, waiting up to `linger`
+    seconds for more pages, and hands up to `max_batch_chunks` chunks to
+    `commit_fn` in a single call - one FAISS add, one published generation.
+
+    The queue is bounded by pages and by chunks; submit() raises QueueFull
+    beyond either, which the server turns into a 429 so a burst of tab loads
+    cannot pile up unbounded work behind the write lock.
+    """
+
+    def __init__(
+        self,
+        commit_fn: Callable[[List[Page]], None],
+        max_pages: int = 256,
+        max_chunks: int = 20000,
+        max_batch_chunks: int = 2048,
+        linger: float = 0.05,
+        keep_tickets: int = 10000
+    ):
+        self.commit_fn = commit_fn
+        self.max_pages = max_pages
+        self.max_chunks = max_chunks
+        self.max_batch_chunks = max_batch_chunks
+        self.linger = linger
+        self.keep_tickets = keep_tickets
+
+        self.queued_chunks = 0
+        self.committed = 0
+        self.commits = 0
+        self.rejected = 0
+        self._queue = deque()
+        self._tickets = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def submit(self, embeddings: np.ndarray, metadata_list: List[dict], model: Optional[str] = None) -> str:
+        """Queue one page embedded by `model`; returns its ticket id"""
+        n = len(metadata_list)
+        with self._cond:
+            if self._closed:
+                raise QueueFull('Ingest queue is shutting down')
+            if len(self._queue) >= self.max_pages or (self._queue and self.queued_chunks + n > self.max_chunks):
+                self.rejected += 1
+                raise QueueFull(f'Ingest queue full ({len(self._queue)} pages, {self.queued_chunks} chunks)')
+            ticket = uuid.uuid4().hex[:16]
+            self._tickets[ticket] = {'state': 'queued', 'chunks': n, 'queued_at': time.time()}
+            while len(self._tickets) > self.keep_tickets:
+                self._tickets.popitem(last=False)
+            self._queue.append((ticket, embeddings, metadata_list, model))
+            self.queued_chunks += n
+            self._cond.notify_all()
+        return ticket
+
+    def status(self, ticket: str) -> Optional[dict]:
+        with self._cond:
+            info = self._tickets.get(ticket)
+            return {'ticket': ticket, **info} if info is not None else None
+
+    def wait(self, ticket: str, timeout: float = 30.0) -> Optional[dict]:
+        """Block until the ticket is committed or failed (or the timeout passes)"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                info = self._tickets.get(ticket)
+                remaining = deadline - time.monotonic()
+                if info is None or info['state'] in ('committed', 'failed') or remaining <= 0:
+                    return {'ticket': ticket, **info} if info is not None else None
+                self._cond.wait(remaining)
+
+    def stats(self) -> dict:
+        return {
+            'queued_pages': len(self._queue),
+            'queued_chunks': self.queued_chunks,
+            'committed_chunks': self.committed,
+            'commits': self.commits,
+            'rejected': self.rejected
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ingest-committer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def close(self, timeout: float = 30.0):
+        """Stop accepting pages and commit everything already queued"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _next_batch(self) -> list:
+        """Wait for work, linger briefly so concurrent pages share a commit, then drain up to the batch size"""
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return []
+            deadline = time.monotonic() + self.linger
+            while (not self._closed and self.queued_chunks < self.max_batch_chunks
+                   and len(self._queue) < self.max_pages):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, chunks = [], 0
+            while self._queue and (not batch or chunks + len(self._queue[0][2]) <= self.max_batch_chunks):
+                item = self._queue.popleft()
+                chunks += len(item[2])
+                batch.append(item)
+            self.queued_chunks -= chunks
+            for ticket, *_ in batch:
+                if ticket in self._tickets:
+                    self._tickets[ticket]['state'] = 'committing'
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            # Pages were validated on submit, so a failure here (e.g. a model switch in
+            # progress) concerns the whole batch; it is not retried page by page, since a
+            # partly applied commit could then add the same chunks twice
+            error = None
+            try:
+                self.commit_fn([(embeddings, metas, model) for _, embeddings, metas, model in batch])
+            except Exception as e:
+                log.exception("⚠️ Ingest commit failed: %s", e)
+                error = str(e)
+
+            now = time.time()
+            with self._cond:
+                for ticket, _, metas, _ in batch:
+                    if error is None:
+                        self.committed += len(metas)
+                    info = self._tickets.get(ticket)
+                    if info is not None:
+                        info.update(state='failed' if error else 'committed', committed_at=now)
+                        if error:
+                            info['error'] = error
+                self.commits += 1
+                self._cond.notify_all()
+            log.debug("📥 Committed %d pages (%d chunks)", len(batch), sum(len(item[2]) for item in batch))
@@ -0,0 +1,61 @@
+"""Gemini client setup shared by the cognitive agents"""
+import os
+import re
+import time
+import google.generativeai as genai
+
+from metrics import LLM_ERRORS, LLM_SECONDS, LLM_TOKENS
+from tracing import span
+
+GEMINI_MODEL = 'gemini-2.0-flash-exp'
+
+
+class TimedModel:
+    """GenerativeModel wrapper recording each call's latency, tokens and errors per agent"""
+
+    def __init__(self, model, agent: str):
+        self.model = model
+        self.agent = agent
+
+    def generate_content(self, *args, **kwargs):
+        with span('llm', agent=self.agent) as node:
+            start = time.perf_counter()
+            try:
+                response = self.model.generate_content(*args, **kwargs)
+            except Exception as e:
+                code = re.search(r'\b([45]\d\d)\b', str(e))
+                LLM_ERRORS.inc(agent=self.agent, code=code.group(1) if code else 'other')
+                node.set(error=code.group(1) if code else str(e)[:80])
+                raise
+            finally:
+                LLM_SECONDS.observe(time.perf_counter() - start, agent=self.agent)
+            usage = getattr(response, 'usage_metadata', None)
+            if usage is not None:
+                prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+                output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+                LLM_TOKENS.inc(prompt_tokens, agent=self.agent, kind='prompt')
+                LLM_TOKENS.inc(output_tokens, agent=self.agent, kind='output')
+                node.set(prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def json_model(api_key: str, model_name: str = GEMINI_MODEL, agent: str = 'other') -> TimedModel:
+    """
+    GenerativeModel that answers in JSON. GEMINI_API_ENDPOINT redirects every
+    call to another server speaking the same REST protocol, e.g. fake_gemini.py.
+    """
+    endpoint = os.getenv('GEMINI_API_ENDPOINT')
+    if endpoint:
+        genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': endpoint})
+    else:
+        genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(
+        model_name,
+        generation_config={
+            "response_mime_type": "application/json"
+        }
+    )
+    return TimedModel(model, agent)
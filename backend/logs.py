@@ -0,0 +1,90 @@
+"""Leveled logging through a background queue, tagged with a per-request correlation id"""
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import sys
+import uuid
+
+# Set per request by the server; '-' outside a request (startup, background threads)
+REQUEST_ID = contextvars.ContextVar('request_id', default='-')
+
+_listener: Optional[QueueListener] = None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = REQUEST_ID.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra={'fields': {...}} adds structured keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-5s [%(request_id)s] %(message)s', '%H:%M:%S')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{k}={v}' for k, v in fields.items())
+        return line
+
+
+def setup(level: str = None, fmt: str = None) -> logging.Logger:
+    """
+    Route the 'rag' logger through a queue drained by one background thread,
+    so request threads never block on stdout. LOG_LEVEL (default INFO) and
+    LOG_FORMAT ('text' or 'json') configure it; DEBUG brings back the
+    per-stage pipeline diagnostics.
+    """
+    global _listener
+    logger = logging.getLogger('rag')
+    if _listener is not None:
+        return logger
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    fmt = (fmt or os.getenv('LOG_FORMAT', 'text')).lower()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    records = queue.SimpleQueue()
+    handler = QueueHandler(records)
+    # Runs in the calling thread, so the id is the request's
+    handler.addFilter(RequestIdFilter())
+    _listener = QueueListener(records, stream)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f'rag.{name}')
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
@@ -1,53 +1,112 @@
 """Memory Layer - User preferences and browsing patterns"""
 from models import BrowsingContext, SearchHistory, UserFeedback
+from memory_log import EventLog
+from memory_aggregates import BrowsingAggregates, time_of_day
 from typing import Dict, List
-import json
 import os
-from datetime import datetime, timedelta
-from collections import Counter
+from datetime import datetime
 
 class MemoryAgent:
     """Manages user preferences and browsing history"""
     
-    def __init__(self, storage_path: str = 'user_memory.json'):
+    def __init__(self, storage_path: str = 'user_memory.json', retention_days: int = 90):
         self.storage_path = storage_path
+        self.aggregates = BrowsingAggregates(retention_days=retention_days)
+        # Bumped when visit or click counts change, so the reranker's URL frequency cache knows to refresh
+        self.url_revision = 0
+        # user_memory.json is the compacted snapshot; new events go to the log
+        self.event_log = EventLog(
+            log_path=os.path.splitext(storage_path)[0] + '.log',
+            snapshot_path=storage_path
+        )
         self.memory = self._load_memory()
+        self.event_log.start(self._snapshot)
     
     def _load_memory(self) -> dict:
-        """Load memory from disk"""
-        if os.path.exists(self.storage_path):
-            with open(self.storage_path, 'r') as f:
-                return json.load(f)
-        return {
+        """Load snapshot from disk and replay events logged since"""
+        snapshot, events = self.event_log.load()
+        self.memory = snapshot or {
             'search_history': [],
             'feedback': [],
             'category_preferences': {},
             'temporal_patterns': {},
             'frequent_sites': []
         }
+        
+        aggregates = self.memory.pop('aggregates', None)
+        if aggregates is not None:
+            self.aggregates.load(aggregates)
+        else:
+            # Snapshot predates rolling aggregates - seed them from history
+            for entry in self.memory.get('search_history', []):
+                self.aggregates.add_search(datetime.fromisoformat(entry['timestamp']), entry.get('category'))
+        
+        for event in events:
+            self._apply_event(event)
+        return self.memory
+    
+    def _snapshot(self) -> dict:
+        """Full state for compaction, including rolling aggregates; containers are copied so it can be encoded unlocked"""
+        state = {
+            key: list(value) if isinstance(value, list) else dict(value) if isinstance(value, dict) else value
+            for key, value in self.memory.items()
+        }
+        # Retention is applied before persisting, even if no recent event expired old buckets
+        self.aggregates.expire(datetime.now().timestamp())
+        state['aggregates'] = self.aggregates.to_dict()
+        return state
+    
+    def _record(self, event: dict):
+        """Apply event now, persist it in the background"""
+        self.event_log.append(event, self._apply_event)
+    
+    def _apply_event(self, event: dict):
+        """Fold one event into in-memory state"""
+        kind = event.get('type')
+        entry = {k: v for k, v in event.items() if k != 'type'}
+        
+        if kind == 'search':
+            history = self.memory.setdefault('search_history', [])
+            history.append(entry)
+            # Keep only last 1000 searches
+            if len(history) > 1000:
+                del history[:-1000]
+            self.aggregates.add_search(datetime.fromisoformat(entry['timestamp']), entry.get('category'))
+        
+        elif kind == 'feedback':
+            self.memory.setdefault('feedback', []).append(entry)
+            if entry.get('result_clicked'):
+                self.aggregates.add_click(datetime.fromisoformat(entry['timestamp']), entry['result_clicked'])
+                self.url_revision += 1
+        
+        elif kind == 'site':
+            sites = self.memory.setdefault('frequent_sites', [])
+            url = entry['url']
+            # Add or move to front
+            if url in sites:
+                sites.remove(url)
+            sites.insert(0, url)
+            # Keep only top 50
+            del sites[50:]
+            when = datetime.fromisoformat(entry['timestamp']) if 'timestamp' in entry else datetime.now()
+            self.aggregates.add_site_visit(when, url)
+            self.url_revision += 1
     
-    def _save_memory(self):
-        """Save memory to disk"""
-        with open(self.storage_path, 'w') as f:
-            json.dump(self.memory, f, indent=2, default=str)
+    def flush(self):
+        """Force queued events to disk"""
+        self.event_log.flush()
     
     def get_browsing_context(self) -> BrowsingContext:
         """Get current browsing context"""
         now = datetime.now()
+        ts = now.timestamp()
         
         # Analyze recent categories (last 7 days)
-        recent_searches = [
-            s for s in self.memory.get('search_history', [])
-            if (now - datetime.fromisoformat(s['timestamp'])).days <= 7
-        ]
-        
-        category_counts = Counter(
-            s.get('category') for s in recent_searches if s.get('category')
-        )
+        category_counts = self.aggregates.category_counts(7, ts)
         recent_categories = [cat for cat, _ in category_counts.most_common(5)]
         
-        # Get frequent sites
-        frequent_sites = self.memory.get('frequent_sites', [])[:10]
+        # Get frequent sites, ranked by visits over the last 30 days
+        frequent_sites = self.get_frequent_sites(10)
         
         return BrowsingContext(
             recent_categories=recent_categories,
@@ -67,26 +126,18 @@ class MemoryAgent:
     
     def record_search(self, query: str, category: str = None, results_count: int = 0):
         """Record a search query"""
-        if 'search_history' not in self.memory:
-            self.memory['search_history'] = []
-        
-        self.memory['search_history'].append({
+        self._record({
+            'type': 'search',
             'query': query,
             'category': category,
             'results_count': results_count,
             'timestamp': datetime.now().isoformat()
         })
-        
-        # Keep only last 1000 searches
-        self.memory['search_history'] = self.memory['search_history'][-1000:]
-        self._save_memory()
     
     def record_feedback(self, feedback: UserFeedback):
         """Record user feedback"""
-        if 'feedback' not in self.memory:
-            self.memory['feedback'] = []
-        
-        self.memory['feedback'].append({
+        self._record({
+            'type': 'feedback',
             'query': feedback.query,
             'result_clicked': feedback.result_clicked,
             'time_to_click': feedback.time_to_click,
@@ -99,8 +150,6 @@ class MemoryAgent:
             # Extract category from feedback (would need to be passed)
             # For now, just increment general preference
             pass
-        
-        self._save_memory()
     
     def get_category_preferences(self) -> Dict[str, float]:
         """Get user's category preferences (0-1 scores)"""
@@ -114,30 +163,30 @@ class MemoryAgent:
     
     def update_frequent_sites(self, url: str):
         """Update frequently visited sites"""
-        if 'frequent_sites' not in self.memory:
-            self.memory['frequent_sites'] = []
-        
-        # Add or move to front
-        if url in self.memory['frequent_sites']:
-            self.memory['frequent_sites'].remove(url)
-        self.memory['frequent_sites'].insert(0, url)
+        self._record({'type': 'site', 'url': url, 'timestamp': datetime.now().isoformat()})
+    
+    def get_frequent_sites(self, limit: int = 10, days: int = 30) -> List[str]:
+        """Most visited sites over the last `days` days, most recent first on ties"""
+        counts = self.aggregates.site_counts(days, datetime.now().timestamp())
+        recency = self.memory.get('frequent_sites', [])
+        if not counts:
+            return recency[:limit]
         
-        # Keep only top 50
-        self.memory['frequent_sites'] = self.memory['frequent_sites'][:50]
-        self._save_memory()
+        rank = {url: i for i, url in enumerate(recency)}
+        ranked = sorted(counts, key=lambda url: (-counts[url], rank.get(url, len(rank))))
+        return ranked[:limit]
+    
+    def get_url_frequencies(self, days: int = 30) -> Dict[str, int]:
+        """Visits plus result clicks per URL over the last `days` days"""
+        now = datetime.now().timestamp()
+        counts = self.aggregates.site_counts(days, now)
+        counts.update(self.aggregates.click_counts(days, now))
+        return counts
     
     def _get_time_of_day(self) -> str:
         """Get current time period"""
-        hour = datetime.now().hour
-        if 5 <= hour < 12:
-            return 'morning'
-        elif 12 <= hour < 17:
-            return 'afternoon'
-        elif 17 <= hour < 21:
-            return 'evening'
-        else:
-            return 'night'
+        return time_of_day(datetime.now().hour)
     
-    def get_temporal_patterns(self) -> dict:
+    def get_temporal_patterns(self, days: int = 30) -> dict:
         """Analyze when user typically searches for different categories"""
-        return self.memory.get('temporal_patterns', {})
+        return self.aggregates.temporal_patterns(days, datetime.now().timestamp())
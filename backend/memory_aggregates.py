@@ -0,0 +1,182 @@
+"""Incrementally maintained, time-bucketed counters for MemoryAgent"""
+from typing import Dict, Hashable, Optional
+from collections import Counter
+from datetime import datetime
+import heapq
+import threading
+
+HOUR = 3600
+DAY = 86400
+
+
+def time_of_day(hour: int) -> str:
+    """Map an hour (0-23) to a coarse time period"""
+    if 5 <= hour < 12:
+        return 'morning'
+    elif 12 <= hour < 17:
+        return 'afternoon'
+    elif 17 <= hour < 21:
+        return 'evening'
+    else:
+        return 'night'
+
+
+class BucketCounter:
+    """
+    Counter split into fixed-width time buckets.
+
+    Adding is O(1) for an existing bucket; a window query sums only the
+    buckets it overlaps, and expiring old data drops whole buckets, oldest
+    first from a heap of bucket keys - events can arrive out of time order
+    (replayed feedback carries its own timestamp). Not thread-safe on its own:
+    BrowsingAggregates serializes every access.
+    """
+
+    def __init__(self, bucket_seconds: int, retention_seconds: int):
+        self.bucket_seconds = bucket_seconds
+        self.retention_seconds = retention_seconds
+        self.buckets: Dict[int, Counter] = {}
+        self._keys = []
+
+    def add(self, ts: float, key: Hashable, n: int = 1):
+        """Count `key` in the bucket containing `ts`"""
+        bucket = int(ts // self.bucket_seconds)
+        counts = self.buckets.get(bucket)
+        if counts is None:
+            counts = self.buckets[bucket] = Counter()
+            heapq.heappush(self._keys, bucket)
+        counts[key] += n
+
+    def expire(self, now: float):
+        """Drop buckets that fall entirely outside the retention period"""
+        cutoff = int((now - self.retention_seconds) // self.bucket_seconds)
+        while self._keys and self._keys[0] < cutoff:
+            self.buckets.pop(heapq.heappop(self._keys), None)
+
+    def window(self, seconds: float, now: float) -> Counter:
+        """Sum of all buckets overlapping the last `seconds`"""
+        first = int((now - seconds) // self.bucket_seconds)
+        total = Counter()
+        for bucket, counts in self.buckets.items():
+            if bucket >= first:
+                total.update(counts)
+        return total
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form (tuple keys become lists)"""
+        return {
+            str(bucket): [[list(k) if isinstance(k, tuple) else k, n] for k, n in counts.items()]
+            for bucket, counts in self.buckets.items()
+        }
+
+    def load(self, data: dict):
+        """Restore buckets written by to_dict"""
+        for bucket in data:
+            self.buckets[int(bucket)] = Counter({
+                tuple(k) if isinstance(k, list) else k: n
+                for k, n in data[bucket]
+            })
+        self._keys = sorted(self.buckets)
+
+
+class BrowsingAggregates:
+    """
+    Rolling category, site and temporal statistics built from memory events.
+
+    Searches record events while other requests read windows, so every
+    access takes `_lock`. Old buckets are expired as events are added and
+    before every snapshot, which keeps the read path free of mutations.
+    """
+
+    def __init__(self, retention_days: int = 90):
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self.hourly_categories = BucketCounter(HOUR, 2 * DAY)
+        self.daily_categories = BucketCounter(DAY, retention_days * DAY)
+        self.daily_patterns = BucketCounter(DAY, retention_days * DAY)
+        self.daily_sites = BucketCounter(DAY, retention_days * DAY)
+        self.daily_clicks = BucketCounter(DAY, retention_days * DAY)
+
+    def add_search(self, when: datetime, category: Optional[str]):
+        """Count a search under its category and time period"""
+        if not category:
+            return
+        ts = when.timestamp()
+        with self._lock:
+            for counter in (self.hourly_categories, self.daily_categories):
+                counter.add(ts, category)
+                counter.expire(ts)
+            self.daily_patterns.add(ts, ('time_of_day', time_of_day(when.hour), category))
+            self.daily_patterns.add(ts, ('day_of_week', when.strftime('%A'), category))
+            self.daily_patterns.expire(ts)
+
+    def add_site_visit(self, when: datetime, url: str):
+        """Count a visit to `url`"""
+        self._add(self.daily_sites, when.timestamp(), url)
+
+    def add_click(self, when: datetime, url: str):
+        """Count a click on a search result pointing at `url`"""
+        self._add(self.daily_clicks, when.timestamp(), url)
+
+    def expire(self, now: float):
+        """Drop buckets older than their retention period"""
+        with self._lock:
+            for counter in self._counters():
+                counter.expire(now)
+
+    def category_counts(self, days: float, now: float) -> Counter:
+        """Searches per category over the last `days` days"""
+        counter = self.hourly_categories if days <= 2 else self.daily_categories
+        return self._window(counter, days, now)
+
+    def site_counts(self, days: float, now: float) -> Counter:
+        """Visits per URL over the last `days` days"""
+        return self._window(self.daily_sites, days, now)
+
+    def click_counts(self, days: float, now: float) -> Counter:
+        """Result clicks per URL over the last `days` days"""
+        return self._window(self.daily_clicks, days, now)
+
+    def temporal_patterns(self, days: float, now: float) -> dict:
+        """Category share per time-of-day period and weekday"""
+        patterns = {'time_of_day': {}, 'day_of_week': {}}
+        for (dimension, slot, category), n in self._window(self.daily_patterns, days, now).items():
+            patterns[dimension].setdefault(slot, {})[category] = n
+
+        for slots in patterns.values():
+            for slot, counts in slots.items():
+                total = sum(counts.values())
+                slots[slot] = {
+                    cat: round(n / total, 3)
+                    for cat, n in sorted(counts.items(), key=lambda x: x[1], reverse=True)
+                }
+        return patterns
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form for the memory snapshot"""
+        with self._lock:
+            return {
+                'hourly_categories': self.hourly_categories.to_dict(),
+                'daily_categories': self.daily_categories.to_dict(),
+                'daily_patterns': self.daily_patterns.to_dict(),
+                'daily_sites': self.daily_sites.to_dict(),
+                'daily_clicks': self.daily_clicks.to_dict()
+            }
+
+    def load(self, data: dict):
+        """Restore counters written by to_dict"""
+        with self._lock:
+            for name in ('hourly_categories', 'daily_categories', 'daily_patterns', 'daily_sites', 'daily_clicks'):
+                getattr(self, name).load(data.get(name, {}))
+
+    def _add(self, counter: BucketCounter, ts: float, key: Hashable):
+        with self._lock:
+            counter.add(ts, key)
+            counter.expire(ts)
+
+    def _window(self, counter: BucketCounter, days: float, now: float) -> Counter:
+        with self._lock:
+            return counter.window(days * DAY, now)
+
+    def _counters(self):
+        return (self.hourly_categories, self.daily_categories, self.daily_patterns, self.daily_sites, self.daily_clicks)
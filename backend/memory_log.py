@@ -0,0 +1,163 @@
+"""Append-only event log with batched background flushes for MemoryAgent"""
+from typing import Callable, List, Optional, Tuple
+import json
+import os
+import threading
+import atexit
+
+from logs import get_logger
+
+log = get_logger('memory')
+
+
+class EventLog:
+    """
+    Durable store for memory events.
+
+    Events are applied in memory immediately and queued; a background thread
+    appends them to `log_path` as JSON lines in batches. Every `compact_every`
+    logged events the full state is written to `snapshot_path` and the log is
+    truncated, so startup only has to replay a short tail.
+
+    Each event carries a sequence number and the snapshot records the last one
+    it covers, so events still in the log after a crash between writing the
+    snapshot and truncating the log are skipped instead of applied twice.
+    """
+
+    def __init__(
+        self,
+        log_path: str,
+        snapshot_path: str,
+        flush_interval: float = 2.0,
+        max_batch: int = 64,
+        compact_every: int = 500
+    ):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.compact_every = compact_every
+
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._pending: List[dict] = []
+        self._logged_since_compact = 0
+        self._seq = 0
+        self._snapshot_fn: Optional[Callable[[], dict]] = None
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = None
+
+    def load(self) -> Tuple[Optional[dict], List[dict]]:
+        """Read the last snapshot and the events logged after it"""
+        snapshot = None
+        covered = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+            covered = snapshot.pop('log_seq', 0)
+
+        events = []
+        if os.path.exists(self.log_path):
+            good = 0
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    if line.strip():
+                        try:
+                            events.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            break
+                    good += len(line)
+                torn = f.seek(0, os.SEEK_END) > good
+            if torn:
+                # Torn write from a crash - everything before it is intact. Cut it
+                # off, or new events appended after it would be lost on the next load
+                log.warning("⚠️ Dropping torn tail of %s after %d events", self.log_path, len(events))
+                with open(self.log_path, 'r+b') as f:
+                    f.truncate(good)
+
+        self._logged_since_compact = len(events)
+        self._seq = max([covered] + [e.get('seq', 0) for e in events])
+        # Anything at or below the snapshot's sequence number is already in it
+        events = [e for e in events if e.pop('seq', 0) > covered]
+        return snapshot, events
+
+    def start(self, snapshot_fn: Callable[[], dict]):
+        """
+        Start the background flusher. `snapshot_fn` returns the full state for
+        compaction; it runs under the append lock and must return a copy that
+        later events don't modify, since it is serialized after the lock is released.
+        """
+        self._snapshot_fn = snapshot_fn
+        self._thread = threading.Thread(target=self._run, name='memory-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, event: dict, apply_fn: Callable[[dict], None]):
+        """Apply an event to in-memory state and queue it for the next flush"""
+        with self._lock:
+            apply_fn(event)
+            self._seq += 1
+            self._pending.append(dict(event, seq=self._seq))
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.set()
+
+    def flush(self, compact: bool = False):
+        """Write queued events to disk, compacting when the log has grown enough"""
+        with self._io_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = []
+                compact = compact or (
+                    self._logged_since_compact + len(batch) >= self.compact_every
+                )
+                # Taken under the same lock as append, so the snapshot covers
+                # exactly the events drained above; encoding it happens outside
+                state = self._snapshot_fn() if compact and self._snapshot_fn else None
+                if state is not None:
+                    state['log_seq'] = self._seq
+
+            if state is not None:
+                self._write_snapshot(json.dumps(state, default=str))
+                return
+
+            if batch:
+                lines = ''.join(json.dumps(e, default=str) + '\n' for e in batch)
+                with open(self.log_path, 'a') as f:
+                    f.write(lines)
+                self._logged_since_compact += len(batch)
+
+    def close(self):
+        """Stop the flusher and persist everything still queued"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def _write_snapshot(self, snapshot: str):
+        """
+        Atomically replace the snapshot, then truncate the log. A crash in
+        between leaves logged events the snapshot's `log_seq` already covers,
+        which load() skips.
+        """
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self.snapshot_path)
+        open(self.log_path, 'w').close()
+        self._logged_since_compact = 0
+
+    def _run(self):
+        """Debounced flush loop"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("⚠️ Memory flush error: %s", e)
@@ -0,0 +1,197 @@
+"""Prometheus-style metrics: per-stage latency histograms, counters and gauges"""
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+import bisect
+import threading
+import time
+
+from tracing import span
+
+# Seconds; spans sub-millisecond FAISS searches to multi-second LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines, one per label set"""
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        return '\n'.join(lines + self.samples())
+
+
+class Counter(Metric):
+    """Monotonic count; name should end in _total"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if amount <= 0:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}' for k, v in items]
+
+
+class Gauge(Metric):
+    """Current value, either set directly or read from a callback at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], float] = None):
+        super().__init__(name, documentation)
+        self.fn = fn
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = value
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.fn() if self.fn else self._value
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f'{self.name} {_format_value(value)}']
+
+
+class CounterFunc(Gauge):
+    """Counter whose value lives elsewhere (e.g. EmbeddingCache.hits), read at scrape time"""
+    kind = 'counter'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric; registering a name again replaces it (e.g. gauges bound on server start)"""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(m.render() for m in self._metrics.values()) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'rag_search_stage_seconds',
+    'Time spent in each search stage (encode, faiss_search, filter, rerank, enrich, group, verification)',
+    ['stage']
+))
+LLM_SECONDS = REGISTRY.register(Histogram(
+    'rag_llm_call_seconds', 'Latency of each Gemini call', ['agent']
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'rag_http_request_seconds', 'End-to-end request latency', ['endpoint', 'status']
+))
+FALLBACKS = REGISTRY.register(Counter(
+    'rag_fallbacks_total', 'Times a component fell back to its degraded path', ['component']
+))
+FILTERED = REGISTRY.register(Counter(
+    'rag_filtered_candidates_total', 'Search candidates dropped by each filter', ['reason']
+))
+LLM_ERRORS = REGISTRY.register(Counter(
+    'rag_llm_errors_total', 'Failed Gemini calls', ['agent', 'code']
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    'rag_llm_tokens_total', 'Gemini tokens used', ['agent', 'kind']
+))
+
+
+@contextmanager
+def stage(name: str, **attrs):
+    """Time one search stage into the histogram and, when tracing, the request's timing tree"""
+    start = time.perf_counter()
+    with span(name, **attrs) as node:
+        try:
+            yield node
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
@@ -0,0 +1,191 @@
+"""Online embedding-model migration - build a shadow index in the background, then switch"""
+from typing import Callable, List, Optional
+import threading
+import time
+import numpy as np
+
+from embeddings import load_backend
+from embedding_cache import EmbeddingCache
+from page_index import PageIndex
+from sharded_index import ShardedIndex
+from columns import normalize_timestamp
+from logs import get_logger
+
+log = get_logger('migration')
+
+
+class ShadowMigration:
+    """
+    Re-embeds every stored chunk's text with the target model into a new
+    ShardedIndex and PageIndex that reuse the live vector ids, so metadata,
+    BM25, columns and highlights carry over untouched.
+
+    The build runs on one background thread with a duty cycle: after each
+    batch it sleeps long enough that it is busy only `duty` of the time.
+    Chunks added while it runs are picked up in catch-up passes; when the
+    backlog is below one batch, on_ready() is called so the server can
+    finalize() under its write lock and swap indexes in one step.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: str,
+        metadata_store: dict,
+        on_ready: Callable[['ShadowMigration'], None],
+        segment_days: int = 7,
+        retention_days: Optional[int] = None,
+        duty: float = 0.25,
+        batch_size: int = 64,
+        cache_dir: str = None,
+        dual_search: bool = False
+    ):
+        self.model_name = model_name
+        self.backend = backend
+        self.metadata_store = metadata_store
+        self.on_ready = on_ready
+        self.segment_days = segment_days
+        self.retention_days = retention_days
+        self.duty = min(max(duty, 0.01), 1.0)
+        self.batch_size = batch_size
+        self.cache_dir = cache_dir
+        self.dual_search = dual_search
+
+        self.model = None
+        self.cache = None
+        self.index: Optional[ShardedIndex] = None
+        self.page_index: Optional[PageIndex] = None
+        self.state = 'pending'
+        self.error = None
+        self.done = 0
+        self.watermark = 0  # every id below this has been considered
+        self.started_at = None
+        self.rate = 0.0  # chunks/sec, smoothed
+        self.comparisons = 0
+        self.overlap_sum = 0.0
+        # Dual-search reads must not overlap FAISS adds
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name='shadow-migration', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.state = 'loading_model'
+            self.model = load_backend(self.backend, self.model_name)
+            dimension = self.model.get_sentence_embedding_dimension()
+            if self.cache_dir:
+                self.cache = EmbeddingCache(self.cache_dir, f"{self.model_name}:{self.backend}", dimension)
+            self.index = ShardedIndex(dimension, segment_days=self.segment_days, retention_days=self.retention_days)
+            self.page_index = PageIndex(dimension)
+
+            self.state = 'building'
+            while True:
+                pending = self.pending_ids()
+                if len(pending) < self.batch_size and self.done > 0 or not pending:
+                    break
+                for start in range(0, len(pending), self.batch_size):
+                    self._embed_batch(pending[start:start + self.batch_size], throttle=True)
+                self.state = 'catching_up'
+
+            self.state = 'ready'
+            self.on_ready(self)
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            log.exception("⚠️ Model migration failed: %s", e)
+
+    def pending_ids(self) -> List[int]:
+        """Live ids the shadow has not embedded yet (ids only ever grow)"""
+        return sorted(i for i in list(self.metadata_store) if i >= self.watermark)
+
+    def _embed_batch(self, ids: List[int], throttle: bool = False):
+        began = time.perf_counter()
+        ids = [i for i in ids if i in self.metadata_store]
+        metas = [self.metadata_store.get(i, {}) for i in ids]
+        if ids:
+            texts = [meta.get('chunk', '') for meta in metas]
+            if self.cache is not None:
+                embeddings = self.cache.encode(texts, self.model)
+            else:
+                embeddings = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+            with self._lock:
+                self.index.add_with_ids(
+                    embeddings,
+                    np.array(ids, dtype=np.int64),
+                    [meta.get('category') for meta in metas],
+                    [normalize_timestamp(meta.get('timestamp')) or None for meta in metas]
+                )
+                self.page_index.add(ids, embeddings, metas)
+            self.done += len(ids)
+
+        busy = time.perf_counter() - began
+        if ids and busy > 0:
+            rate = len(ids) / busy * self.duty
+            self.rate = rate if self.rate == 0 else 0.8 * self.rate + 0.2 * rate
+        if ids:
+            self.watermark = max(self.watermark, ids[-1] + 1)
+        if throttle and self.duty < 1.0:
+            time.sleep(busy * (1.0 / self.duty - 1.0))
+
+    def finalize(self, next_id: int):
+        """Embed the last stragglers and drop deleted ids; call with writers blocked"""
+        self.state = 'switching'
+        pending = self.pending_ids()
+        for start in range(0, len(pending), self.batch_size):
+            self._embed_batch(pending[start:start + self.batch_size])
+
+        # Ids evicted or expired while the shadow was being built
+        live = np.flatnonzero(self.index.segment_of[:self.index.next_id] >= 0)
+        stale = [int(i) for i in live if int(i) not in self.metadata_store]
+        if stale:
+            vectors = self.index.reconstruct_batch(stale)
+            self.index.remove_ids(stale)
+            self.page_index.remove_chunks(stale, vectors, [{'url': url} for url in self._urls_of(stale)])
+        self.index.next_id = max(self.index.next_id, next_id)
+        self.index.publish()
+
+    def _urls_of(self, ids: List[int]) -> List[str]:
+        """Page URL of chunks that are gone from metadata_store, from the page index itself"""
+        owner = {}
+        for page, chunk_ids in enumerate(self.page_index.chunk_ids):
+            for idx in chunk_ids:
+                owner[idx] = self.page_index.urls[page]
+        return [owner.get(i, '') for i in ids]
+
+    def compare(self, query: str, k: int, live_ids: List[int]) -> Optional[float]:
+        """Dual search: overlap@k between the live results and the shadow's, over chunks the shadow has"""
+        if self.index is None or self.model is None or self.index.ntotal == 0:
+            return None
+        query_embedding = self.model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
+        with self._lock:
+            _, shadow = self.index.search(np.asarray(query_embedding, dtype=np.float32), min(k, self.index.ntotal))
+        covered = [i for i in live_ids[:k] if i < self.watermark]
+        if not covered:
+            return None
+        overlap = len(set(covered) & set(shadow[0].tolist())) / len(covered)
+        self.comparisons += 1
+        self.overlap_sum += overlap
+        return overlap
+
+    def status(self) -> dict:
+        # Approximate: ids evicted after being embedded still count as done
+        remaining = max(len(self.metadata_store) - self.done, 0)
+        total = self.done + remaining
+        return {
+            'target_model': self.model_name,
+            'backend': self.backend,
+            'state': self.state,
+            'error': self.error,
+            'embedded': self.done,
+            'total': total,
+            'progress': round(self.done / total, 4) if total else 1.0,
+            'chunks_per_sec': round(self.rate, 1),
+            'eta_seconds': round(remaining / self.rate) if self.rate > 0 else None,
+            'elapsed_seconds': round(time.time() - self.started_at) if self.started_at else 0,
+            'dual_search_overlap': round(self.overlap_sum / self.comparisons, 3) if self.comparisons else None
+        }
@@ -65,6 +65,8 @@ class EnrichedResult(BaseModel):
     context_match: float
     explanation: str  # Why this result is relevant
     highlight_suggestions: List[str] = Field(default_factory=list)
+    # Exact character spans into the chunk text: start/end, match_start/match_end, text
+    highlight_spans: List[Dict[str, Any]] = Field(default_factory=list)
 
 class SearchResponse(BaseModel):
     """Final search response"""
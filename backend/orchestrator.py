@@ -6,8 +6,14 @@ from decision import DecisionAgent
 from actions import ActionsAgent
 from answer_verification import AnswerVerifier
 from datetime import datetime
+from metrics import stage
+from tracing import span
+from logs import get_logger
+from typing import FrozenSet
 import os
 
+log = get_logger('orchestrator')
+
 class CognitiveOrchestrator:
     """
     Main orchestrator that coordinates:
@@ -17,14 +23,35 @@ class CognitiveOrchestrator:
     4. Actions - Execute search
     """
     
-    def __init__(self, index, metadata_store, embedding_model, api_key: str = None):
+    def __init__(
+        self,
+        index,
+        metadata_store,
+        embedding_model,
+        api_key: str = None,
+        columns=None,
+        highlighter=None,
+        lexical=None,
+        multi_query: str = None,
+        page_index=None,
+        memory: MemoryAgent = None
+    ):
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
         
         # Initialize agents
         self.perception = PerceptionAgent(api_key=self.api_key)
-        self.memory = MemoryAgent()
+        # The server shares its MemoryAgent, which records page visits from /add
+        self.memory = memory or MemoryAgent()
         self.decision = DecisionAgent(api_key=self.api_key)
-        self.actions = ActionsAgent(index, metadata_store, embedding_model)
+        self.actions = ActionsAgent(
+            index, metadata_store, embedding_model,
+            columns=columns,
+            memory=self.memory,
+            highlighter=highlighter,
+            lexical=lexical,
+            multi_query=multi_query,
+            page_index=page_index
+        )
         self.verifier = AnswerVerifier(api_key=self.api_key)
         
         print("✅ Cognitive AI Orchestrator initialized")
@@ -33,7 +60,13 @@ class CognitiveOrchestrator:
         print(f"   - Decision: Strategy planner ready")
         print(f"   - Actions: FAISS executor ready")
     
-    def search(self, query: str, category: str = None) -> SearchResponse:
+    def search(
+        self,
+        query: str,
+        category: str = None,
+        fields: FrozenSet[str] = None,
+        snippet_length: int = None
+    ) -> SearchResponse:
         """
         Execute cognitive search pipeline:
         1. Understand query (Perception)
@@ -41,59 +74,66 @@ class CognitiveOrchestrator:
         3. Decide strategy (Decision)
         4. Execute search (Actions)
         5. Record feedback (Memory)
+        
+        `fields` limits enrichment to the result fields the caller will return.
         """
         start_time = datetime.now().timestamp()
         
-        print(f"\n{'='*60}")
-        print(f"🧠 COGNITIVE SEARCH PIPELINE")
-        print(f"{'='*60}")
+        log.debug("🧠 Cognitive search: %r (category=%s)", query, category)
         
         # Step 1: Perception - Understand query
-        print(f"\n1️⃣ PERCEPTION: Understanding query...")
         user_query = UserQuery(query=query, category=category)
-        enhanced_query = self.perception.understand_query(user_query)
+        with span('perception'):
+            enhanced_query = self.perception.understand_query(user_query)
         
-        print(f"   Original: {enhanced_query.original_query}")
-        print(f"   Intent: {enhanced_query.intent}")
-        print(f"   Expanded: {enhanced_query.expanded_terms[:3]}")
-        print(f"   Confidence: {enhanced_query.confidence:.2f}")
-        print(f"   Reasoning: {enhanced_query.reasoning[:80]}...")
-        print(f"   Will verify: {enhanced_query.intent in ['search', 'recall']}")
+        log.debug(
+            "1️⃣ Perception: intent=%s expanded=%s confidence=%.2f reasoning=%.80s",
+            enhanced_query.intent, enhanced_query.expanded_terms[:3],
+            enhanced_query.confidence, enhanced_query.reasoning
+        )
         
         # Step 2: Memory - Get context
-        print(f"\n2️⃣ MEMORY: Loading user context...")
-        browsing_context = self.memory.get_browsing_context()
-        search_history = self.memory.get_search_history()
+        with span('memory'):
+            browsing_context = self.memory.get_browsing_context()
+            search_history = self.memory.get_search_history()
         
-        print(f"   Recent categories: {browsing_context.recent_categories[:3]}")
-        print(f"   Time of day: {browsing_context.time_of_day}")
-        print(f"   Recent queries: {len(search_history.queries)}")
+        log.debug(
+            "2️⃣ Memory: recent categories=%s time of day=%s recent queries=%d",
+            browsing_context.recent_categories[:3], browsing_context.time_of_day, len(search_history.queries)
+        )
         
         # Step 3: Decision - Determine strategy
-        print(f"\n3️⃣ DECISION: Planning search strategy...")
-        search_decision = self.decision.decide_strategy(
-            enhanced_query,
-            browsing_context,
-            search_history
-        )
+        with span('decision') as node:
+            search_decision = self.decision.decide_strategy(
+                enhanced_query,
+                browsing_context,
+                search_history
+            )
+            node.set(strategy=search_decision.strategy)
         
         # IMPORTANT: Use original query, not expanded version
         # The expanded query dilutes search results
         search_decision.search_params['query_text'] = enhanced_query.original_query
-        
-        print(f"   Strategy: {search_decision.strategy}")
-        print(f"   Query text: {search_decision.search_params.get('query_text', '')[:50]}")
-        print(f"   Results: {search_decision.search_params.get('k', 50)}")
-        print(f"   Confidence: {search_decision.confidence:.2f}")
-        print(f"   Reasoning: {search_decision.reasoning[:80]}...")
+        # Expanded terms feed highlighting and multi-query retrieval, where each is
+        # searched separately and fused rather than mixed into one query
+        search_decision.search_params['expanded_terms'] = enhanced_query.expanded_terms
+        search_decision.search_params['fields'] = fields
+        search_decision.search_params['snippet_length'] = snippet_length
+        
+        log.debug(
+            "3️⃣ Decision: strategy=%s k=%s confidence=%.2f reasoning=%.80s",
+            search_decision.strategy, search_decision.search_params.get('k', 50),
+            search_decision.confidence, search_decision.reasoning
+        )
         
         # Step 4: Actions - Execute search
-        print(f"\n4️⃣ ACTIONS: Executing search...")
-        search_response = self.actions.execute_search(search_decision, start_time)
+        with span('actions'):
+            search_response = self.actions.execute_search(search_decision, start_time)
         
-        print(f"   Found: {search_response.total_found} results")
-        print(f"   Processing time: {search_response.processing_time:.3f}s")
-        print(f"   Suggestions: {search_response.suggestions}")
+        log.debug(
+            "4️⃣ Actions: %d results in %.3fs, suggestions=%s",
+            search_response.total_found, search_response.processing_time, search_response.suggestions
+        )
         
         # Step 4.5: Verify if results actually answer the question
         # Check if it's a factual question
@@ -102,17 +142,18 @@ class CognitiveOrchestrator:
         
         try:
             if search_response.results and is_specific_question and enhanced_query.intent in ['search', 'recall']:
-                print(f"\n4️⃣.5 VERIFICATION: Checking if results answer the question...")
-                verification = self.verifier.verify_results(query, search_response.results)
+                with stage('verification'):
+                    verification = self.verifier.verify_results(query, search_response.results)
                 
-                print(f"   Has answer: {verification['has_answer']}")
-                print(f"   Confidence: {verification['confidence']:.2f}")
-                print(f"   Reasoning: {verification['reasoning'][:80]}...")
+                log.debug(
+                    "4️⃣.5 Verification: has_answer=%s confidence=%.2f reasoning=%.80s",
+                    verification['has_answer'], verification['confidence'], verification['reasoning']
+                )
                 
                 # Filter out if no answer (even with low confidence for specific questions)
                 if not verification['has_answer']:
                     if verification['confidence'] > 0.5 or is_specific_question:
-                        print(f"   ⚠️ Results don't answer the question - returning empty")
+                        log.debug("⚠️ Results don't answer the question - returning empty")
                         search_response.results = []
                         search_response.total_found = 0
                         search_response.suggestions = [
@@ -121,62 +162,72 @@ class CognitiveOrchestrator:
                             "The information might not be in your browsing history"
                         ]
                     else:
-                        print(f"   ⚠️ Very low confidence no answer - keeping results anyway")
+                        log.debug("⚠️ Very low confidence no answer - keeping results anyway")
                 elif verification['relevant_results']:
                     # Only return results that actually answer
                     original_count = len(search_response.results)
                     search_response.results = verification['relevant_results']
                     search_response.total_found = len(verification['relevant_results'])
                     if len(verification['relevant_results']) < original_count:
-                        print(f"   Filtered: {original_count} → {len(verification['relevant_results'])} relevant results")
+                        log.debug("Filtered: %d → %d relevant results", original_count, len(verification['relevant_results']))
         except Exception as e:
-            print(f"   ⚠️ Verification error: {e}")
-            print(f"   Continuing with unverified results")
+            log.warning("⚠️ Verification error, continuing with unverified results: %s", e)
         
         # Step 5: Memory - Record search
-        print(f"\n5️⃣ MEMORY: Recording search...")
-        self.memory.record_search(
-            query=query,
-            category=category,
-            results_count=search_response.total_found
-        )
+        with span('record'):
+            self.memory.record_search(
+                query=query,
+                category=category,
+                results_count=search_response.total_found
+            )
         
-        print(f"\n{'='*60}")
-        print(f"✅ SEARCH COMPLETE")
-        print(f"{'='*60}\n")
+        log.debug("✅ Search complete: %d results", search_response.total_found)
         
         return search_response
     
-    def compare_products(self, query: str) -> SearchResponse:
+    def compare_products(
+        self,
+        query: str,
+        fields: FrozenSet[str] = None,
+        snippet_length: int = None
+    ) -> SearchResponse:
         """
         Specialized product comparison flow
         """
         # Force comparative strategy
         user_query = UserQuery(query=query, category='ecommerce')
-        enhanced_query = self.perception.understand_query(user_query)
+        with span('perception'):
+            enhanced_query = self.perception.understand_query(user_query)
         enhanced_query.intent = 'compare'
         
-        browsing_context = self.memory.get_browsing_context()
-        search_history = self.memory.get_search_history()
+        with span('memory'):
+            browsing_context = self.memory.get_browsing_context()
+            search_history = self.memory.get_search_history()
         
-        search_decision = self.decision.decide_strategy(
-            enhanced_query,
-            browsing_context,
-            search_history
-        )
+        with span('decision'):
+            search_decision = self.decision.decide_strategy(
+                enhanced_query,
+                browsing_context,
+                search_history
+            )
         
         # Override to comparative strategy
         search_decision.strategy = 'comparative'
         search_decision.search_params['category_filter'] = 'ecommerce'
+        search_decision.search_params['expanded_terms'] = enhanced_query.expanded_terms
+        search_decision.search_params['fields'] = fields
+        search_decision.search_params['snippet_length'] = snippet_length
         
         start_time = datetime.now().timestamp()
-        search_response = self.actions.execute_search(search_decision, start_time)
-        
-        self.memory.record_search(
-            query=query,
-            category='ecommerce',
-            results_count=search_response.total_found
-        )
+        with span('actions'):
+            search_response = self.actions.execute_search(search_decision, start_time)
+        
+        with span('record'):
+            self.memory.record_search(
+                query=query,
+                category='ecommerce',
+                results_count=search_response.total_found
+            )
         
         return search_response
     
@@ -0,0 +1,160 @@
+"""Page-level vector index - one mean-pooled embedding per URL"""
+from typing import Dict, List, Tuple
+import threading
+import numpy as np
+
+
+class PageIndex:
+    """
+    Keeps the running sum of chunk embeddings for every URL, so the page
+    vector (normalized mean) is updated in O(dim) per added chunk. URL-level
+    queries search pages first and then score only the winning pages' chunks.
+    """
+
+    def __init__(self, dimension: int, capacity: int = 1024):
+        self.dimension = dimension
+        self.size = 0
+        self.url_ids: Dict[str, int] = {}
+        self.urls: List[str] = []
+        # Per page, its chunk ids as an insertion-ordered dict (values unused) for O(1) removal
+        self.chunk_ids: List[Dict[int, None]] = []
+        self.sums = np.zeros((capacity, dimension), dtype=np.float32)
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.counts = np.zeros(capacity, dtype=np.int32)
+        self.category_codes: Dict[str, int] = {}
+        self.category = np.full(capacity, -1, dtype=np.int16)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_index(cls, index, metadata_store: dict) -> 'PageIndex':
+        """Build page vectors from an existing chunk index"""
+        pages = cls(index.d)
+        bound = getattr(index, 'next_id', index.ntotal)
+        ids = np.array(sorted(i for i in metadata_store if i < bound), dtype=np.int64)
+        for start in range(0, len(ids), 10000):
+            batch = ids[start:start + 10000]
+            pages.add(batch, index.reconstruct_batch(batch), [metadata_store[int(i)] for i in batch])
+        return pages
+
+    def add(self, ids, embeddings: np.ndarray, metadata_list: List[dict]):
+        """Fold newly added chunk embeddings into their pages"""
+        with self._lock:
+            touched = set()
+            for idx, vector, meta in zip(ids, embeddings, metadata_list):
+                url = meta.get('url', '')
+                page = self.url_ids.get(url)
+                if page is None:
+                    page = self._new_page(url, meta.get('category', 'other'))
+                self.sums[page] += vector
+                self.chunk_ids[page][int(idx)] = None
+                self.counts[page] += 1
+                touched.add(page)
+
+            rows = np.fromiter(touched, dtype=np.int64, count=len(touched))
+            norms = np.linalg.norm(self.sums[rows], axis=1, keepdims=True)
+            self.vectors[rows] = self.sums[rows] / np.maximum(norms, 1e-12)
+
+    def remove_chunks(self, ids, embeddings: np.ndarray, metadata_list: List[dict]):
+        """Subtract deleted chunks from their pages"""
+        with self._lock:
+            for idx, vector, meta in zip(ids, embeddings, metadata_list):
+                page = self.url_ids.get(meta.get('url', ''))
+                chunk_ids = self.chunk_ids[page] if page is not None else {}
+                # Ids removed before (an eviction retry) must not be subtracted twice
+                if int(idx) not in chunk_ids:
+                    continue
+                del chunk_ids[int(idx)]
+                self.sums[page] -= vector
+                self.counts[page] -= 1
+                if not chunk_ids:
+                    self.sums[page] = 0
+                norm = np.linalg.norm(self.sums[page])
+                self.vectors[page] = self.sums[page] / norm if norm > 1e-12 else 0
+
+    def search(self, query_embedding: np.ndarray, k: int, category: str = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, page ids) for one query vector"""
+        n = self.size
+        if n == 0 or k <= 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+
+        scores = self.vectors[:n] @ query_embedding.reshape(-1)
+        # Empty (fully removed) pages never win
+        mask = self.counts[:n] > 0
+        if category:
+            mask &= self.category[:n] == self.category_codes.get(category, -2)
+        scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        top = top[np.isfinite(scores[top])]
+        return scores[top], top
+
+    def best_chunks(
+        self,
+        index,
+        query_embedding: np.ndarray,
+        pages: np.ndarray,
+        per_page: int = 3
+    ) -> List[Tuple[int, np.ndarray, np.ndarray]]:
+        """For each page: (page id, chunk similarities, chunk ids), best chunks first"""
+        groups = [np.fromiter(self.chunk_ids[p], dtype=np.int64, count=len(self.chunk_ids[p])) for p in pages]
+        if hasattr(index, 'contains'):
+            # Only chunks in the reader's index generation
+            groups = [ids[index.contains(ids)] for ids in groups]
+        if not groups:
+            return []
+        all_ids = np.concatenate(groups)
+        similarities = index.reconstruct_batch(all_ids) @ query_embedding.reshape(-1)
+
+        results = []
+        offset = 0
+        for page, ids in zip(pages, groups):
+            sims = similarities[offset:offset + len(ids)]
+            offset += len(ids)
+            order = np.argsort(-sims, kind='stable')[:per_page]
+            results.append((int(page), sims[order], ids[order]))
+        return results
+
+    def search_chunks(
+        self,
+        index,
+        query_embedding: np.ndarray,
+        k: int,
+        category: str = None,
+        per_page: int = 3
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Page search, then the best chunks of the winning pages, in FAISS (D, I) shape"""
+        _, pages = self.search(query_embedding, k, category)
+        groups = self.best_chunks(index, query_embedding, pages, per_page)
+        if not groups:
+            return np.zeros((1, 0), dtype=np.float32), np.zeros((1, 0), dtype=np.int64)
+        sims = np.concatenate([g[1] for g in groups])
+        ids = np.concatenate([g[2] for g in groups])
+        return sims[None, :], ids[None, :]
+
+    def _new_page(self, url: str, category: str) -> int:
+        page = self.size
+        if page >= len(self.sums):
+            # Grow geometrically; readers holding the old arrays stay valid
+            capacity = len(self.sums)
+            self.sums = np.vstack([self.sums, np.zeros_like(self.sums)])
+            self.vectors = np.vstack([self.vectors, np.zeros_like(self.vectors)])
+            self.counts = np.concatenate([self.counts, np.zeros(capacity, dtype=np.int32)])
+            self.category = np.concatenate([self.category, np.full(capacity, -1, dtype=np.int16)])
+        code = self.category_codes.setdefault(category, len(self.category_codes))
+        self.url_ids[url] = page
+        self.urls.append(url)
+        self.chunk_ids.append({})
+        self.category[page] = code
+        self.size += 1
+        return page
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -1,9 +1,13 @@
 """Perception Layer - Understanding user queries with Gemini"""
-import google.generativeai as genai
+from llm import json_model
+from metrics import FALLBACKS
+from logs import get_logger
 from models import UserQuery, EnhancedQuery
 import json
 import os
 
+log = get_logger('perception')
+
 class PerceptionAgent:
     """Understands and enhances user search queries"""
     
@@ -12,13 +16,7 @@ class PerceptionAgent:
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not found in environment")
         
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(
-            'gemini-2.0-flash-exp',
-            generation_config={
-                "response_mime_type": "application/json"
-            }
-        )
+        self.model = json_model(self.api_key, agent='perception')
     
     def understand_query(self, user_query: UserQuery) -> EnhancedQuery:
         """
@@ -69,13 +67,14 @@ Now analyze the query above."""
             )
         except Exception as e:
             error_msg = str(e)
-            print(f"⚠️ Perception error: {error_msg[:100]}...")
+            log.warning("⚠️ Perception error: %.100s", error_msg)
+            FALLBACKS.inc(component='perception')
             
             # Check for quota/auth errors
             if "429" in error_msg or "quota" in error_msg.lower():
-                print("💡 Tip: Get a free API key at https://makersuite.google.com/app/apikey")
+                log.info("💡 Tip: Get a free API key at https://makersuite.google.com/app/apikey")
             elif "401" in error_msg or "API key" in error_msg:
-                print("💡 Tip: Set GEMINI_API_KEY environment variable")
+                log.info("💡 Tip: Set GEMINI_API_KEY environment variable")
             
             # Fallback to basic understanding
             return EnhancedQuery(
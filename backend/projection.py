@@ -0,0 +1,74 @@
+"""Field projection and compact JSON encoding for search result lists"""
+from typing import FrozenSet, Iterable, Optional, Union
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_SNIPPET_LENGTH = 200
+
+# Flat keys a client may ask /search for; a field the serving path does not
+# have (e.g. `explanation` on basic search, `favicon` on cognitive) is left out
+RESULT_FIELDS = frozenset({
+    'url', 'title', 'snippet', 'category', 'favicon', 'timestamp', 'index',
+    'similarity', 'relevance_score', 'temporal_relevance', 'context_match',
+    'explanation', 'highlight_suggestions', 'highlight_spans'
+})
+PRODUCT_FIELDS = frozenset({'url', 'title', 'favicon', 'chunks', 'avg_similarity', 'explanation'})
+
+
+def parse_fields(value: Union[str, Iterable[str], None], allowed: FrozenSet[str] = RESULT_FIELDS) -> Optional[FrozenSet[str]]:
+    """`fields` as a list or comma-separated string; None keeps the full legacy shape"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    fields = frozenset(f.strip() for f in value if f and f.strip())
+    unknown = fields - allowed
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def parse_snippet_length(value) -> Optional[int]:
+    """None keeps each shape's default: 200-char snippets, full legacy `chunk` text"""
+    if value is None:
+        return None
+    length = int(value)
+    if length < 0:
+        raise ValueError("snippet_length must be >= 0")
+    return length
+
+
+def clip(text: str, length: Optional[int]) -> str:
+    return text if length is None else text[:length]
+
+
+def project_hit(meta: dict, similarity: float, idx: int, fields: FrozenSet[str], snippet_length: Optional[int]) -> dict:
+    """Basic-search hit straight from stored metadata, copying only what was asked for"""
+    out = {}
+    for field in fields:
+        if field == 'snippet':
+            out['snippet'] = clip(meta.get('chunk', ''), DEFAULT_SNIPPET_LENGTH if snippet_length is None else snippet_length)
+        elif field == 'similarity':
+            out['similarity'] = similarity
+        elif field == 'index':
+            out['index'] = idx
+        elif field in meta:
+            out[field] = meta[field]
+    return out
+
+
+def project_result(result, fields: FrozenSet[str]) -> dict:
+    """Cognitive result (EnrichedResult) as a flat dict of the requested fields"""
+    values = result.__dict__
+    return {field: values[field] for field in fields if field in values}
+
+
+def dumps(payload) -> bytes:
+    """orjson when installed (several times faster on long result lists), else compact stdlib json"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
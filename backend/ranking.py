@@ -0,0 +1,108 @@
+"""Vectorized multi-signal reranker over precomputed feature columns"""
+from models import SearchDecision
+from columns import MetadataColumns
+from typing import List, Dict
+from datetime import datetime
+import numpy as np
+
+
+class Reranker:
+    """
+    Scores a whole candidate pool with one NumPy expression:
+
+        semantic * w_s + temporal * w_t + category * w_c + frequency * w_f
+
+    Temporal, category and frequency features are looked up from
+    MetadataColumns by vector id; per-URL frequency comes from MemoryAgent
+    and is cached until memory changes.
+    """
+
+    def __init__(self, columns: MetadataColumns, memory=None):
+        self.columns = columns
+        self.memory = memory
+        # (cache key, table), replaced in one assignment so readers never pair a key with another table
+        self._frequency = (None, np.zeros(0, dtype=np.float32))
+
+    def url_frequency(self) -> np.ndarray:
+        """Per-URL-code frequency score in [0, 1]; 0.5 everywhere without memory data"""
+        n_urls = len(self.columns.urls)
+        key = (getattr(self.memory, 'url_revision', None), n_urls)
+        cached_key, cached = self._frequency
+        if key == cached_key:
+            return cached
+
+        frequency = np.full(n_urls, 0.5, dtype=np.float32)
+        counts = self.memory.get_url_frequencies() if self.memory else {}
+        if counts:
+            # Log scale so a handful of heavy sites don't flatten everyone else
+            frequency[:] = 0.0
+            scale = np.log1p(max(counts.values()))
+            for url, n in counts.items():
+                code = self.columns.url_codes.get(url)
+                if code is not None:
+                    frequency[code] = np.log1p(n) / scale
+
+        self._frequency = (key, frequency)
+        return frequency
+
+    def score(self, ids: np.ndarray, similarities: np.ndarray, decision: SearchDecision) -> Dict[str, np.ndarray]:
+        """Compute every signal and the combined score for all candidates"""
+        weights = decision.ranking_weights
+        columns = self.columns
+
+        # Temporal relevance (decay over time); no timestamp gets a neutral score
+        timestamps = columns.timestamp[ids]
+        age_days = np.clip((datetime.now().timestamp() - timestamps) / 86400, 0, 100)
+        temporal = np.where(timestamps > 0, np.exp(-age_days / 7), 0.5)
+
+        # Category match score
+        hints = decision.search_params.get('category_hints', [])
+        hint_codes = [columns.category_codes[c] for c in hints if c in columns.category_codes]
+        category = np.where(np.isin(columns.category[ids], hint_codes), 1.0, 0.5)
+
+        # Frequency score from visit/click history of each URL
+        # (the table is rebuilt whenever new URLs appear, so every code is in range)
+        frequency = self.url_frequency()[columns.url[ids]]
+
+        combined = (
+            weights.get('semantic_similarity', 1.0) * similarities +
+            weights.get('temporal_relevance', 0.0) * temporal +
+            weights.get('category_match', 0.0) * category +
+            weights.get('frequency', 0.0) * frequency
+        )
+
+        return {
+            'relevance_score': combined,
+            'temporal_relevance': temporal,
+            'context_match': category,
+            'frequency': frequency
+        }
+
+    def rerank(self, results: List[Dict], decision: SearchDecision, top_k: int = None) -> List[Dict]:
+        """Annotate results with scores and return the best `top_k` in order"""
+        if not results:
+            return results
+
+        ids = np.fromiter((r['index'] for r in results), dtype=np.int64, count=len(results))
+        # Hybrid results carry a normalized RRF score that stands in for similarity
+        similarities = np.fromiter(
+            (r.get('fused_score', r['similarity']) for r in results), dtype=np.float64, count=len(results)
+        )
+        scores = self.score(ids, similarities, decision)
+        combined = scores['relevance_score']
+
+        # Partial selection first, then sort only the winners
+        if top_k is not None and top_k < len(results):
+            order = np.argpartition(-combined, top_k - 1)[:top_k]
+            order = order[np.argsort(-combined[order], kind='stable')]
+        else:
+            order = np.argsort(-combined, kind='stable')
+
+        reranked = []
+        for i in order:
+            result = results[i]
+            result['relevance_score'] = float(combined[i])
+            result['temporal_relevance'] = float(scores['temporal_relevance'][i])
+            result['context_match'] = float(scores['context_match'][i])
+            reranked.append(result)
+        return reranked
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Replay recorded searches from user_memory.json against an index snapshot
+`run` sends every query MemoryAgent recorded (snapshot + event log) to /search,
+keeping the original gaps between them (scaled by --speed) or as fast as
+possible, and records each query's latency and results. `diff` compares two
+runs, e.g. before and after a change, query by query.
+
+Run: python replay.py run --index-dir ~/backup --speed 10 --output before.json
+     python replay.py run --index-dir ~/backup --speed 10 --output after.json
+     python replay.py diff before.json after.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from memory_log import EventLog
+
+
+def load_queries(memory_path: str, since: str = None, limit: int = None) -> list:
+    """Recorded searches, oldest first: [{'query', 'category', 'timestamp'}]"""
+    snapshot, events = EventLog(
+        log_path=os.path.splitext(memory_path)[0] + '.log',
+        snapshot_path=memory_path
+    ).load()
+    entries = list((snapshot or {}).get('search_history', []))
+    entries += [{k: v for k, v in e.items() if k != 'type'} for e in events if e.get('type') == 'search']
+
+    # The snapshot and the log can overlap after a crash mid-compaction
+    seen, queries = set(), []
+    for entry in sorted(entries, key=lambda e: e['timestamp']):
+        key = (entry['timestamp'], entry['query'])
+        if key in seen or (since and entry['timestamp'] < since):
+            continue
+        seen.add(key)
+        queries.append({'query': entry['query'], 'category': entry.get('category'), 'timestamp': entry['timestamp']})
+    return queries[-limit:] if limit else queries
+
+
+def schedule(queries: list, speed: float, max_gap: float) -> list:
+    """Send offset in seconds for each query; idle gaps are capped at max_gap before scaling"""
+    if speed <= 0:
+        return [0.0] * len(queries)
+    offsets, t, previous = [], 0.0, None
+    for q in queries:
+        now = datetime.fromisoformat(q['timestamp'])
+        if previous is not None:
+            t += min((now - previous).total_seconds(), max_gap) / speed
+        offsets.append(t)
+        previous = now
+    return offsets
+
+
+def result_key(result: dict) -> str:
+    """Stable identity of one search hit across builds"""
+    meta = result.get('metadata', {})
+    if 'chunkIndex' in meta:
+        return f"{meta.get('url')}#{meta['chunkIndex']}"
+    return f"{meta.get('url')}#{meta.get('chunk', '')[:60]}"
+
+
+def make_sender(args):
+    """(send(body) -> (status, json), cleanup) for --url or a private copy of --index-dir"""
+    if args.url:
+        base_url = args.url.rstrip('/')
+
+        def send(body):
+            request = urllib.request.Request(
+                base_url + '/search', data=json.dumps(body).encode(), headers={'Content-Type': 'application/json'}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=120) as response:
+                    return response.status, json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                return e.code, {}
+        return send, lambda: None
+
+    # Searches touch recency columns and record history; keep the snapshot pristine
+    workdir = tempfile.mkdtemp(prefix='replay-')
+    shutil.copytree(args.index_dir, workdir, dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns('embedding_cache', 'onnx_models', '*.tmp'))
+    home = os.getcwd()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from bench_server import load_server
+    client = load_server(workdir).app.test_client()
+
+    def send(body):
+        response = client.post('/search', json=body)
+        return response.status_code, response.get_json(silent=True) or {}
+
+    def cleanup():
+        os.chdir(home)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return send, cleanup
+
+
+def run(args):
+    memory_path = args.memory or os.path.join(args.index_dir or '.', 'user_memory.json')
+    queries = load_queries(memory_path, args.since, args.limit)
+    if not queries:
+        sys.exit(f"❌ No recorded searches in {memory_path}")
+    offsets = schedule(queries, args.speed, args.max_gap)
+    print(f"🔁 Replaying {len(queries)} searches from {memory_path} "
+          f"({'as fast as possible' if args.speed <= 0 else f'{args.speed:g}x, ~{offsets[-1]:.0f}s'})")
+
+    send, cleanup = make_sender(args)
+    records = [None] * len(queries)
+    quiet = open(os.devnull, 'w')
+    stdout_lock = threading.Lock()
+
+    def one(i, scheduled):
+        q = queries[i]
+        body = {'query': q['query'], 'k': args.k, 'use_cognitive': args.cognitive}
+        if args.with_category and q['category']:
+            body['category'] = q['category']
+        start = time.perf_counter()
+        try:
+            status, data = send(body)
+        except Exception as e:
+            status, data = 599, {'error': str(e)}
+        latency = time.perf_counter() - start
+        results = data.get('results', [])
+        records[i] = {
+            'query': q['query'],
+            'recorded_at': q['timestamp'],
+            'status': status,
+            'latency_ms': round(latency * 1000, 3),
+            'lag_ms': round((start - scheduled) * 1000, 3),
+            'results': [result_key(r) for r in results],
+            'scores': [round(r.get('relevance_score', r.get('similarity', 0.0)), 5) for r in results]
+        }
+        if args.verbose:
+            with stdout_lock:
+                sys.__stdout__.write(f"   {latency * 1000:8.1f} ms  {len(results):3d} hits  {q['query'][:60]}\n")
+
+    real_stdout = sys.stdout
+    sys.stdout = quiet  # server and agents print per request
+    began = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for i, offset in enumerate(offsets):
+                scheduled = began + offset
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(one, i, scheduled)
+    finally:
+        sys.stdout = real_stdout
+        quiet.close()
+    elapsed = time.perf_counter() - began
+    cleanup()
+
+    latencies = np.array([r['latency_ms'] for r in records])
+    summary = {
+        'queries': len(records),
+        'errors': sum(1 for r in records if r['status'] >= 400),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_qps': round(len(records) / elapsed, 2),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'max_lag_ms': round(max(r['lag_ms'] for r in records), 3)
+    }
+    output = {
+        'meta': {
+            'label': args.label or os.path.splitext(os.path.basename(args.output))[0],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'source': memory_path,
+            'target': args.url or os.path.abspath(args.index_dir),
+            'speed': args.speed,
+            'max_gap': args.max_gap,
+            'k': args.k,
+            'cognitive': args.cognitive
+        },
+        'summary': summary,
+        'queries': records
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"   {summary['throughput_qps']:.1f} q/s  p50 {summary['p50_ms']:.1f}  p95 {summary['p95_ms']:.1f}  "
+          f"p99 {summary['p99_ms']:.1f} ms  ({summary['errors']} errors, max lag {summary['max_lag_ms']:.0f} ms)")
+    print(f"✅ Results written to {args.output}")
+
+
+def diff(args):
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if len(before['queries']) != len(after['queries']):
+        print(f"⚠️ Runs replayed different query counts ({len(before['queries'])} vs {len(after['queries'])}); "
+              f"comparing the common prefix")
+
+    k = args.k
+    rows = []
+    for a, b in zip(before['queries'], after['queries']):
+        if a['query'] != b['query']:
+            sys.exit("❌ Runs replayed different query sequences")
+        top_a, top_b = a['results'][:k], b['results'][:k]
+        overlap = len(set(top_a) & set(top_b)) / max(len(top_a), len(top_b)) if (top_a or top_b) else 1.0
+        rows.append({
+            'query': a['query'],
+            'overlap': overlap,
+            'top1_changed': (top_a[:1] != top_b[:1]),
+            'latency_delta_ms': b['latency_ms'] - a['latency_ms'],
+            'hits': (len(a['results']), len(b['results']))
+        })
+
+    overlaps = np.array([r['overlap'] for r in rows])
+    deltas = np.array([r['latency_delta_ms'] for r in rows])
+    print(f"🔍 {before['meta']['label']} → {after['meta']['label']}: {len(rows)} queries\n")
+    print(f"   overlap@{k}:      mean {overlaps.mean():.3f}, {np.sum(overlaps < 1.0)} queries changed")
+    print(f"   top-1 changed:   {sum(r['top1_changed'] for r in rows)}")
+    for stat in ('p50_ms', 'p95_ms', 'p99_ms'):
+        old, new = before['summary'][stat], after['summary'][stat]
+        change = f" ({(new - old) / old:+.1%})" if old else ''
+        print(f"   {stat[:3]} latency:     {old:8.1f} → {new:8.1f} ms{change}")
+    print(f"   per-query delta: median {np.median(deltas):+.1f} ms")
+
+    changed = sorted((r for r in rows if r['overlap'] < 1.0), key=lambda r: r['overlap'])[:args.show]
+    if changed:
+        print(f"\n   Most changed queries:")
+        for r in changed:
+            print(f"   {r['overlap']:5.0%}  {r['hits'][0]:3d}→{r['hits'][1]:<3d} hits  {r['query'][:60]}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'before': before['meta'], 'after': after['meta'], 'k': k,
+                'mean_overlap': round(float(overlaps.mean()), 4),
+                'top1_changed': sum(r['top1_changed'] for r in rows),
+                'latency': {s: [before['summary'][s], after['summary'][s]] for s in ('p50_ms', 'p95_ms', 'p99_ms')},
+                'queries': rows
+            }, f, indent=2)
+        print(f"\n✅ Diff written to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    replay = commands.add_parser('run', help='replay recorded searches')
+    target = replay.add_mutually_exclusive_group(required=True)
+    target.add_argument('--index-dir', help='directory with the index files to load (copied, never modified)')
+    target.add_argument('--url', help='replay against a running server instead')
+    replay.add_argument('--memory', help='user_memory.json to read (default: the one in --index-dir)')
+    replay.add_argument('--speed', type=float, default=1.0, help='time compression; 0 = no waiting')
+    replay.add_argument('--max-gap', type=float, default=30.0, help='cap idle gaps to this many seconds')
+    replay.add_argument('--concurrency', type=int, default=16, help='max queries in flight')
+    replay.add_argument('--since', help='only searches recorded at or after this ISO timestamp')
+    replay.add_argument('--limit', type=int, help='only the most recent N searches')
+    replay.add_argument('--k', type=int, default=50)
+    replay.add_argument('--with-category', action='store_true', help='send the recorded category filter')
+    replay.add_argument('--cognitive', action='store_true', help='use the cognitive pipeline')
+    replay.add_argument('--label', help='name for this run in diffs')
+    replay.add_argument('--output', default='replay.json')
+    replay.add_argument('--verbose', action='store_true')
+
+    compare = commands.add_parser('diff', help='compare two replay runs')
+    compare.add_argument('before')
+    compare.add_argument('after')
+    compare.add_argument('--k', type=int, default=10, help='results compared per query')
+    compare.add_argument('--show', type=int, default=10, help='most changed queries to list')
+    compare.add_argument('--output', help='write the per-query diff as JSON')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        diff(args)
+
+
+if __name__ == '__main__':
+    main()
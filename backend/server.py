@@ -1,45 +1,134 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import pickle
+import functools
 import os
+import threading
+import time
 from datetime import datetime
+from columns import MetadataColumns, normalize_timestamp
+from highlights import HighlightEngine
+from storage import INDEX_FILE, load_index, load_bm25, load_page_index, save_all, load_model_config, save_model_config
+from eviction import IndexEvictor, POLICIES
+from memory import MemoryAgent
+from embeddings import load_backend
+from embedding_cache import EmbeddingCache
+from migration import ShadowMigration
+from metrics import REGISTRY, CONTENT_TYPE, FALLBACKS, REQUEST_SECONDS, CounterFunc, Gauge, stage
+from tracing import SamplingProfiler, current as current_trace, span, trace
+from cursors import CursorCache, parse_page_size
+from ingest_queue import IngestQueue, QueueFull, validate_page
+from projection import PRODUCT_FIELDS, clip, dumps, parse_fields, parse_snippet_length, project_hit, project_result
+import logs
 
 app = Flask(__name__)
 CORS(app)
+# LOG_LEVEL=DEBUG brings back per-query pipeline diagnostics; LOG_FORMAT=json for structured lines
+logs.setup()
+log = logs.get_logger('server')
 
 # Configuration
-INDEX_FILE = 'faiss_index.pkl'
-METADATA_FILE = 'metadata.pkl'
-
 # Use all-MiniLM-L6-v2 (lighter, faster, more stable)
-# To use Nomic, change MODEL_NAME to 'nomic-ai/nomic-embed-text-v1.5' and DIMENSION to 768
+# To use Nomic on an existing index, start with MIGRATE_TO_MODEL=nomic-ai/nomic-embed-text-v1.5:
+# stored chunks are re-embedded into a shadow index in the background and swapped in when done
 MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
 DIMENSION = 384
+# Query/chunk encoder: 'torch' (SentenceTransformer), 'onnx' (ONNX Runtime) or 'int8' (quantized ONNX);
+# when unset, the backend recorded in model.json
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+# Chunk embeddings are cached on disk by content; empty disables the cache
+EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', 'embedding_cache')
+# Online model migration: shadow-build for MIGRATE_TO_MODEL using at most MIGRATION_DUTY of one
+# core, optionally comparing live and shadow results on every basic search
+MIGRATE_TO_MODEL = os.getenv('MIGRATE_TO_MODEL')
+MIGRATE_TO_BACKEND = os.getenv('MIGRATE_TO_BACKEND')
+MIGRATION_DUTY = float(os.getenv('MIGRATION_DUTY', '0.25'))
+MIGRATION_DUAL_SEARCH = os.getenv('MIGRATION_DUAL_SEARCH', 'false').lower() == 'true'
 
 # Cognitive AI flag - DISABLED BY DEFAULT until you want to enable it
 USE_COGNITIVE_AI = os.getenv('USE_COGNITIVE_AI', 'false').lower() == 'true'
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+# Search perception's expanded terms alongside the query: 'max', 'weighted' or 'off'
+MULTI_QUERY_FUSION = os.getenv('MULTI_QUERY_FUSION', 'max').lower()
+# Vectors are stored in per-category time segments; segments older than
+# RETENTION_DAYS are dropped whole (0 keeps everything)
+SEGMENT_DAYS = int(os.getenv('SEGMENT_DAYS', '7'))
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '0'))
+# Capacity limit (0 = unlimited) and which vectors to evict first:
+# 'oldest', 'lru' (least recently returned in results) or 'low_value' (least visited sites)
+MAX_VECTORS = int(os.getenv('MAX_VECTORS', '0'))
+MAX_INDEX_MB = float(os.getenv('MAX_INDEX_MB', '0'))
+EVICTION_POLICY = os.getenv('EVICTION_POLICY', 'oldest').lower()
+# Run every Nth /search or /compare under cProfile, dumping to PROFILE_DIR (0 = off)
+PROFILE_EVERY_N = int(os.getenv('PROFILE_EVERY_N', '0'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+# /add queues pages for a background committer that coalesces them into one index add of
+# up to INGEST_BATCH_CHUNKS, waiting INGEST_LINGER_MS for company; beyond INGEST_QUEUE_PAGES
+# pages or INGEST_QUEUE_CHUNKS chunks waiting, /add answers 429
+INGEST_QUEUE_PAGES = int(os.getenv('INGEST_QUEUE_PAGES', '256'))
+INGEST_QUEUE_CHUNKS = int(os.getenv('INGEST_QUEUE_CHUNKS', '20000'))
+INGEST_BATCH_CHUNKS = int(os.getenv('INGEST_BATCH_CHUNKS', '2048'))
+INGEST_LINGER_MS = float(os.getenv('INGEST_LINGER_MS', '50'))
+# Paginated result lists stay cached this long for their follow-up pages
+CURSOR_TTL_SECONDS = float(os.getenv('CURSOR_TTL_SECONDS', '120'))
+CURSOR_CACHE_SIZE = int(os.getenv('CURSOR_CACHE_SIZE', '256'))
+
+# The model the stored vectors were built with wins over the constants above
+active_model = load_model_config()
+if active_model:
+    if active_model['model'] != MODEL_NAME:
+        print(f"ℹ️ Index was built with {active_model['model']}; set MIGRATE_TO_MODEL={MODEL_NAME} to switch")
+    MODEL_NAME, DIMENSION = active_model['model'], active_model['dimension']
+    if not os.getenv('EMBEDDING_BACKEND'):
+        EMBEDDING_BACKEND = active_model.get('backend', EMBEDDING_BACKEND)
 
 # Initialize
-print(f"Loading embedding model: {MODEL_NAME}...")
-model = SentenceTransformer(MODEL_NAME)
+print(f"Loading embedding model: {MODEL_NAME} ({EMBEDDING_BACKEND})...")
+try:
+    model = load_backend(EMBEDDING_BACKEND, MODEL_NAME)
+except Exception as e:
+    if EMBEDDING_BACKEND == 'torch':
+        raise
+    print(f"⚠️ {EMBEDDING_BACKEND} backend unavailable ({e}), falling back to torch")
+    FALLBACKS.inc(component='embedding_backend')
+    EMBEDDING_BACKEND = 'torch'
+    model = load_backend('torch', MODEL_NAME)
 print("✅ Model loaded successfully!")
 
+# Re-indexed pages and rebuilds reuse chunk embeddings instead of re-running the model
+embedding_cache = None
+if EMBEDDING_CACHE_DIR:
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, f"{MODEL_NAME}:{EMBEDDING_BACKEND}", DIMENSION)
+    print(f"🗃️ Embedding cache: {embedding_cache.size} chunks")
+
 # Load or create FAISS index
-if os.path.exists(INDEX_FILE) and os.path.exists(METADATA_FILE):
-    print("Loading existing index...")
-    with open(INDEX_FILE, 'rb') as f:
-        index = pickle.load(f)
-    with open(METADATA_FILE, 'rb') as f:
-        metadata_store = pickle.load(f)
-    print(f"Loaded index with {index.ntotal} vectors")
-else:
-    print("Creating new index...")
-    index = faiss.IndexFlatIP(DIMENSION)  # Inner product for cosine similarity
-    metadata_store = {}
+index, metadata_store = load_index(DIMENSION, SEGMENT_DAYS, RETENTION_DAYS or None)
+# Requests read a pinned generation while /add and eviction publish new ones
+index.copy_on_write = True
+if not active_model:
+    if index.ntotal and index.d != DIMENSION:
+        # Constants were edited on an existing index and the model that built it is unknown:
+        # re-embed it, and answer searches with 503 until the new index is switched in
+        print(f"⚠️ Stored vectors are {index.d}-d but {MODEL_NAME} is {DIMENSION}-d; "
+              f"migrating in the background, searches are unavailable until it finishes")
+        MIGRATE_TO_MODEL = MODEL_NAME
+    else:
+        save_model_config(MODEL_NAME, EMBEDDING_BACKEND, DIMENSION)
+
+# Columnar mirror of metadata_store used by vectorized filters
+columns = MetadataColumns.from_metadata(metadata_store, index.next_id)
+# Token offsets for highlight spans; filled at /add, lazily for older chunks
+highlighter = HighlightEngine()
+
+# Keyword index for hybrid search
+bm25 = load_bm25(metadata_store)
+
+# One mean-pooled vector per URL for page-level search and /compare
+page_index = load_page_index(index, metadata_store)
+
+# Visit and click history: feeds the frequency rerank signal and 'low_value' eviction
+memory = MemoryAgent()
 
 # Initialize Cognitive AI Orchestrator
 orchestrator = None
@@ -50,23 +139,327 @@ if USE_COGNITIVE_AI and GEMINI_API_KEY:
             index=index,
             metadata_store=metadata_store,
             embedding_model=model,
-            api_key=GEMINI_API_KEY
+            api_key=GEMINI_API_KEY,
+            columns=columns,
+            highlighter=highlighter,
+            lexical=bm25,
+            multi_query=None if MULTI_QUERY_FUSION == 'off' else MULTI_QUERY_FUSION,
+            page_index=page_index,
+            memory=memory
         )
         print("✅ Cognitive AI layer enabled")
     except Exception as e:
         print(f"⚠️ Cognitive AI initialization failed: {e}")
         print("   Falling back to basic search")
+        FALLBACKS.inc(component='cognitive_init')
         USE_COGNITIVE_AI = False
 else:
     print("ℹ️ Cognitive AI disabled (set GEMINI_API_KEY to enable)")
 
+# Serializes writers: /add, retention expiry and eviction batches. Readers never take it:
+# they pin an index generation, and every id in it has its metadata written
+write_lock = threading.Lock()
+
+def read_generation():
+    """What the current request sees; changes with every publish and on a model switch"""
+    return id(index), index.view().number
+
+def drop_vectors(ids, vectors):
+    """Remove deleted vectors from metadata and every derived index"""
+    ids = [int(i) for i in ids]
+    # Right away, so eviction never picks these ids again and its byte count stays exact
+    columns.remove(ids)
+    
+    def cleanup():
+        page_index.remove_chunks(ids, vectors, [metadata_store.get(i, {}) for i in ids])
+        bm25.remove(ids)
+        highlighter.remove(ids)
+        for i in ids:
+            metadata_store.pop(i, None)
+    
+    # Searches pinned to a generation that still holds these ids keep their metadata
+    index.retire(cleanup)
+
+def expire_segments():
+    """Apply the retention policy: drop whole expired segments"""
+    for segment in index.expire():
+        drop_vectors(segment.ids(), segment.vectors())
+        log.info("🗑️ Expired %s segment from %s (%d vectors)",
+                 segment.shard, datetime.fromtimestamp(segment.start).date(), segment.ntotal)
+
+expire_segments()
+
+if EVICTION_POLICY not in POLICIES:
+    print(f"⚠️ Unknown EVICTION_POLICY '{EVICTION_POLICY}', using 'oldest'")
+    EVICTION_POLICY = 'oldest'
+evictor = IndexEvictor(
+    index,
+    columns,
+    drop_vectors,
+    POLICIES[EVICTION_POLICY](memory),
+    max_vectors=MAX_VECTORS or None,
+    max_bytes=int(MAX_INDEX_MB * 1024 * 1024) or None,
+    lock=write_lock
+)
+if evictor.enabled:
+    print(f"📦 Index capacity: {MAX_VECTORS or '-'} vectors / {MAX_INDEX_MB or '-'} MB, "
+          f"evicting '{EVICTION_POLICY}' first")
+    evictor.start()
+    evictor.notify()
+
+# Wall time of the last successful save, for the save-age gauge
+last_save = os.path.getmtime(INDEX_FILE) if os.path.exists(INDEX_FILE) else None
+
 def save_index():
     """Save index and metadata to disk"""
-    with open(INDEX_FILE, 'wb') as f:
-        pickle.dump(index, f)
-    with open(METADATA_FILE, 'wb') as f:
-        pickle.dump(metadata_store, f)
-    print(f"Index saved with {index.ntotal} vectors")
+    global last_save
+    save_all(index, metadata_store, bm25, page_index)
+    last_save = time.time()
+    log.info("Index saved with %d vectors", index.ntotal)
+
+def embed_chunks(texts):
+    """Chunk embeddings, served from the on-disk cache where possible"""
+    if embedding_cache is not None:
+        return embedding_cache.encode(texts, model)
+    return model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+
+def commit_pages(pages):
+    """Write queued /add pages as one batch: one FAISS add, one published generation"""
+    with write_lock:
+        batch = []
+        for embeddings, metadata_list, embedded_with in pages:
+            if embedded_with != MODEL_NAME or embeddings.shape[1] != index.d:
+                # Embedded by the previous model just before a switch: redo it from the text,
+                # even when both models have the same width
+                if DIMENSION != index.d:
+                    raise RuntimeError('Index is being migrated to a new embedding model')
+                embeddings = np.array(embed_chunks([meta.get('chunk', '') for meta in metadata_list]), dtype='float32')
+            batch.append(embeddings)
+        embeddings = np.concatenate(batch)
+        metadata_list = [meta for _, metas, _ in pages for meta in metas]
+        saved_hundreds = index.ntotal // 100
+        
+        # New ids become visible to searches in one step, after their metadata is in place
+        with index.writing():
+            # Add to index, routed to each chunk's category shard
+            start_id = index.reserve_ids(len(embeddings))
+            index.add_with_ids(
+                embeddings,
+                np.arange(start_id, start_id + len(embeddings)),
+                [meta.get('category') for meta in metadata_list],
+                [normalize_timestamp(meta.get('timestamp')) or None for meta in metadata_list]
+            )
+            
+            # Store metadata
+            added_at = datetime.now().isoformat()
+            for i, meta in enumerate(metadata_list):
+                metadata_store[start_id + i] = {
+                    **meta,
+                    'added_at': added_at
+                }
+            columns.append(start_id, metadata_list)
+            highlighter.index_batch(start_id, metadata_list)
+            bm25.add_batch(start_id, metadata_list)
+            page_index.add(range(start_id, start_id + len(embeddings)), embeddings, metadata_list)
+        expire_segments()
+        
+        # Save periodically: whenever the index passes another hundred vectors
+        if index.ntotal // 100 != saved_hundreds:
+            save_index()
+    # Each captured page is one visit to its URL
+    for _, metas, _ in pages:
+        for url in dict.fromkeys(meta.get('url') for meta in metas):
+            if url:
+                memory.update_frequent_sites(url)
+    evictor.notify()
+
+migration = None
+
+def switch_model(shadow):
+    """Swap the finished shadow index and its model in for the live ones"""
+    global model, index, page_index, embedding_cache, MODEL_NAME, EMBEDDING_BACKEND, DIMENSION
+    with write_lock:
+        shadow.finalize(index.next_id)
+        model, index, page_index = shadow.model, shadow.index, shadow.page_index
+        embedding_cache = shadow.cache
+        index.copy_on_write = True
+        index.publish()
+        MODEL_NAME, EMBEDDING_BACKEND, DIMENSION = shadow.model_name, shadow.backend, shadow.index.d
+        evictor.index = index
+        if orchestrator:
+            orchestrator.actions.index = index
+            orchestrator.actions.model = model
+            orchestrator.actions.page_index = page_index
+        save_model_config(MODEL_NAME, EMBEDDING_BACKEND, DIMENSION)
+        save_index()
+        shadow.state = 'done'
+    log.info("✅ Switched to %s (%d-d, %d vectors)", MODEL_NAME, DIMENSION, index.ntotal)
+
+def start_migration(model_name, backend=None, dual_search=MIGRATION_DUAL_SEARCH):
+    """Begin re-embedding every stored chunk with another model"""
+    global migration
+    if migration and migration.state not in ('done', 'failed'):
+        raise RuntimeError('A model migration is already running')
+    migration = ShadowMigration(
+        model_name,
+        backend or EMBEDDING_BACKEND,
+        metadata_store,
+        switch_model,
+        segment_days=SEGMENT_DAYS,
+        retention_days=RETENTION_DAYS or None,
+        duty=MIGRATION_DUTY,
+        cache_dir=EMBEDDING_CACHE_DIR or None,
+        dual_search=dual_search
+    )
+    migration.start()
+    log.info("🔁 Migrating index to %s in the background", model_name)
+
+if MIGRATE_TO_MODEL and (MIGRATE_TO_MODEL != MODEL_NAME or index.d != DIMENSION):
+    start_migration(MIGRATE_TO_MODEL, MIGRATE_TO_BACKEND)
+
+# Read at scrape time, so they follow a model switch
+REGISTRY.register(Gauge('rag_index_vectors', 'Vectors in the index', lambda: index.ntotal))
+REGISTRY.register(Gauge('rag_index_urls', 'Pages in the page-level index', lambda: len(page_index.urls)))
+REGISTRY.register(Gauge('rag_metadata_bytes', 'Approximate bytes of chunk metadata', lambda: columns.total_bytes))
+REGISTRY.register(Gauge(
+    'rag_index_save_age_seconds', 'Seconds since the index was last saved',
+    lambda: time.time() - last_save if last_save else None
+))
+REGISTRY.register(CounterFunc(
+    'rag_embedding_cache_hits_total', 'Chunk embeddings served from the cache',
+    lambda: embedding_cache.hits if embedding_cache else None
+))
+REGISTRY.register(CounterFunc(
+    'rag_embedding_cache_misses_total', 'Chunk embeddings computed by the model',
+    lambda: embedding_cache.misses if embedding_cache else None
+))
+
+profiler = SamplingProfiler(PROFILE_EVERY_N, PROFILE_DIR)
+cursor_cache = CursorCache(CURSOR_TTL_SECONDS, CURSOR_CACHE_SIZE)
+ingest_queue = IngestQueue(
+    commit_pages,
+    max_pages=INGEST_QUEUE_PAGES,
+    max_chunks=INGEST_QUEUE_CHUNKS,
+    max_batch_chunks=INGEST_BATCH_CHUNKS,
+    linger=INGEST_LINGER_MS / 1000
+)
+ingest_queue.start()
+REGISTRY.register(Gauge('rag_ingest_queued_chunks', 'Chunks waiting for the ingest committer', lambda: ingest_queue.queued_chunks))
+REGISTRY.register(CounterFunc('rag_ingest_commits_total', 'Coalesced index commits', lambda: ingest_queue.commits))
+REGISTRY.register(CounterFunc('rag_ingest_rejected_total', '/add requests refused with 429', lambda: ingest_queue.rejected))
+REGISTRY.register(CounterFunc(
+    'rag_cursor_hits_total', 'Follow-up pages served from the cursor cache', lambda: cursor_cache.hits
+))
+REGISTRY.register(CounterFunc(
+    'rag_cursor_misses_total', 'Cursors that had expired or were invalidated by a write', lambda: cursor_cache.misses
+))
+
+def pinned(view):
+    """Serve the whole request from one index generation, unaffected by concurrent writes"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with index.pinned():
+            response = view(*args, **kwargs)
+        # This may have been the last reader of an older generation; clean up only if no writer is busy
+        if index.pending_cleanups and write_lock.acquire(blocking=False):
+            try:
+                index.reclaim()
+            finally:
+                write_lock.release()
+        return response
+    return wrapper
+
+def live_model(view):
+    """503 while the query encoder doesn't match the stored vectors (only during a forced migration)"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if index.d != DIMENSION:
+            response = jsonify({
+                'error': 'Index is being migrated to a new embedding model',
+                'migration': migration.status() if migration else None
+            })
+            response.headers['Retry-After'] = '30'
+            return response, 503
+        return view(*args, **kwargs)
+    return wrapper
+
+def traced(view):
+    """Opt-in timing tree ({"debug": true} in the body) and sampled profiling for a search endpoint"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        data = request.get_json(silent=True) or {}
+        with profiler.maybe(request.endpoint) as profile_path:
+            if not data.get('debug'):
+                return view(*args, **kwargs)
+            with trace(request.endpoint) as t:
+                t.root.set(request_id=g.request_id)
+                if profile_path:
+                    t.root.set(profile=profile_path)
+                return view(*args, **kwargs)
+    return wrapper
+
+def respond(payload: dict):
+    """Compact JSON (orjson when installed), attaching the request's timing tree when debug output was asked for"""
+    t = current_trace()
+    if t is not None:
+        # Timed on a throwaway pass, since the tree has to be complete before the real one
+        with span('serialize'):
+            dumps(payload)
+        payload['debug'] = t.finish()
+    return Response(dumps(payload), mimetype='application/json')
+
+def first_page(key: str, items: list, page_size, base: dict) -> dict:
+    """The whole list when unpaginated; otherwise its first page, caching the rest behind `next_cursor`"""
+    if page_size is None:
+        return {**base, key: items}
+    page, next_cursor = items[:page_size], None
+    if len(items) > page_size:
+        entry_id = cursor_cache.put(read_generation(), items, page_size, base)
+        page, next_cursor = cursor_cache.page(entry_id, items, 0, page_size)
+    return {**base, key: page, 'total_results': len(items), 'next_cursor': next_cursor}
+
+def next_page(key: str, cursor: str, page_size):
+    """A follow-up page straight from the cursor cache: no embedding, search or LLM calls"""
+    with span('cursor'):
+        entry = cursor_cache.get(cursor, read_generation())
+    if entry is None:
+        return jsonify({'error': 'Cursor expired or the index changed; repeat the search'}), 410
+    entry_id, items, offset, default_size, base = entry
+    page, next_cursor = cursor_cache.page(entry_id, items, offset, page_size or default_size)
+    return respond({**base, key: page, 'total_results': len(items), 'next_cursor': next_cursor})
+
+def project_products(products: list, fields) -> list:
+    if fields is None:
+        return products
+    return [{f: p[f] for f in fields if f in p} for p in products]
+
+@app.before_request
+def start_request():
+    g.request_start = time.perf_counter()
+    # Correlation id for every log line of this request; clients may supply their own
+    g.request_id = request.headers.get('X-Request-ID') or logs.new_request_id()
+    g.request_id_token = logs.REQUEST_ID.set(g.request_id)
+
+@app.after_request
+def finish_request(response):
+    if request.endpoint and request.endpoint != 'prometheus_metrics':
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - g.request_start,
+            endpoint=request.endpoint, status=response.status_code
+        )
+    response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.teardown_request
+def reset_request_id(exc):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        logs.REQUEST_ID.reset(token)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition of latency histograms, counters and index gauges"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -74,8 +467,10 @@ def health():
     return jsonify({
         'status': 'healthy',
         'model': MODEL_NAME,
+        'embedding_backend': EMBEDDING_BACKEND,
         'total_vectors': index.ntotal,
-        'dimension': DIMENSION
+        'dimension': DIMENSION,
+        'migration': migration.status() if migration else None
     })
 
 @app.route('/embed', methods=['POST'])
@@ -85,55 +480,86 @@ def embed_texts():
         data = request.json
         texts = data['texts']
         
-        # Generate embeddings
-        embeddings = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        # Generate embeddings; chunks seen before come from the cache
+        model_name = MODEL_NAME
+        embeddings = embed_chunks(texts)
         
         return jsonify({
             'embeddings': embeddings.tolist(),
-            'dimension': embeddings.shape[1]
+            'dimension': embeddings.shape[1],
+            'model': model_name
         })
     except Exception as e:
+        log.exception("%s failed", request.endpoint)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/add', methods=['POST'])
 def add_to_index():
-    """Add embeddings to FAISS index"""
+    """Validate a page of embeddings and queue it for the ingest committer"""
     try:
         data = request.json
         embeddings = np.array(data['embeddings'], dtype='float32')
         metadata_list = data['metadata']
+        problem = validate_page(embeddings, metadata_list)
+        if problem:
+            return jsonify({'error': problem}), 400
+        if embeddings.shape[1] != index.d and DIMENSION != index.d:
+            return jsonify({'error': 'Index is being migrated to a new embedding model'}), 409
         
         # Normalize for cosine similarity
         faiss.normalize_L2(embeddings)
         
-        # Add to index
-        start_id = index.ntotal
-        index.add(embeddings)
+        try:
+            # Clients pass back the model /embed reported; pages queued across a model
+            # switch are re-embedded at commit rather than mixed into the new index
+            ticket = ingest_queue.submit(embeddings, metadata_list, data.get('model') or MODEL_NAME)
+        except QueueFull as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = '1'
+            return response, 429
         
-        # Store metadata
-        for i, meta in enumerate(metadata_list):
-            metadata_store[start_id + i] = {
-                **meta,
-                'added_at': datetime.now().isoformat()
-            }
-        
-        # Save periodically
-        if index.ntotal % 100 == 0:
-            save_index()
+        # {"wait": true} returns once the page is searchable
+        status = ingest_queue.wait(ticket) if data.get('wait') else ingest_queue.status(ticket)
+        if status['state'] == 'failed':
+            return jsonify({'error': status.get('error'), 'ticket': ticket}), 500
         
         return jsonify({
             'success': True,
+            'ticket': ticket,
+            'state': status['state'],
             'total_vectors': index.ntotal,
             'added': len(embeddings)
-        })
+        }), 200 if status['state'] == 'committed' else 202
     except Exception as e:
+        log.exception("%s failed", request.endpoint)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/add/<ticket>', methods=['GET'])
+def add_status(ticket):
+    """State of a queued /add: queued, committing, committed or failed"""
+    status = ingest_queue.status(ticket)
+    if status is None:
+        return jsonify({'error': 'Unknown ticket'}), 404
+    return jsonify(status)
+
 @app.route('/search', methods=['POST'])
+@live_model
+@traced
+@pinned
 def search():
     """Search for similar content with optional cognitive AI enhancement"""
     try:
         data = request.json
+        # Optional projection: flat results with only these keys, snippets clipped to snippet_length
+        try:
+            fields = parse_fields(data.get('fields'))
+            snippet_length = parse_snippet_length(data.get('snippet_length'))
+            page_size = parse_page_size(data.get('page_size'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if data.get('cursor'):
+            return next_page('results', data['cursor'], page_size)
+        
         query = data['query']
         k = data.get('k', 50)
         category_filter = data.get('category')
@@ -141,12 +567,15 @@ def search():
         
         # Use Cognitive AI if available and enabled
         if use_cognitive and orchestrator:
-            print(f"🧠 Using Cognitive AI for query: {query}")
-            response = orchestrator.search(query, category_filter)
+            log.debug("🧠 Using Cognitive AI for query: %r", query)
+            response = orchestrator.search(query, category_filter, fields, snippet_length)
             
             # Convert to legacy format for compatibility
             results = []
             for result in response.results:
+                if fields is not None:
+                    results.append(project_result(result, fields))
+                    continue
                 results.append({
                     'metadata': {
                         'url': result.url,
@@ -157,88 +586,125 @@ def search():
                     'similarity': result.similarity,
                     'relevance_score': result.relevance_score,
                     'explanation': result.explanation,
-                    'highlight_suggestions': result.highlight_suggestions
+                    'highlight_suggestions': result.highlight_suggestions,
+                    'highlight_spans': result.highlight_spans
                 })
             
-            return jsonify({
-                'results': results,
+            return respond(first_page('results', results, page_size, {
                 'total_searched': index.ntotal,
                 'cognitive_enhanced': True,
                 'query_understanding': response.query_understanding,
                 'search_strategy': response.search_strategy,
                 'processing_time': response.processing_time,
                 'suggestions': response.suggestions
-            })
+            }))
         
         # Fallback to basic search
-        print(f"🔍 Using basic search for query: {query}")
+        log.debug("🔍 Using basic search for query: %r", query)
         
         # Generate query embedding
-        query_embedding = model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
+        with stage('encode'):
+            query_embedding = model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
         
-        # Search (get more results for filtering)
-        search_k = k * 5 if category_filter else k
-        distances, indices = index.search(query_embedding, min(search_k, index.ntotal))
+        # A category filter searches only that category's shard
+        with stage('faiss_search'):
+            distances, indices = index.search(query_embedding, min(k, index.ntotal), category=category_filter)
         
         # Collect results
         results = []
-        for i, idx in enumerate(indices[0]):
-            if idx != -1 and int(idx) in metadata_store:
-                meta = metadata_store[int(idx)]
-                
-                # Apply category filter
-                if category_filter and meta.get('category') != category_filter:
-                    continue
-                
-                results.append({
-                    'metadata': meta,
-                    'similarity': float(distances[0][i]),
-                    'index': int(idx)
-                })
-                
-                if len(results) >= k:
-                    break
+        hit_ids = []
+        with span('collect') as node:
+            for i, idx in enumerate(indices[0]):
+                if idx != -1 and int(idx) in metadata_store:
+                    meta = metadata_store[int(idx)]
+                    
+                    # Apply category filter
+                    if category_filter and meta.get('category') != category_filter:
+                        continue
+                    
+                    similarity = float(distances[0][i])
+                    hit_ids.append(int(idx))
+                    if fields is not None:
+                        results.append(project_hit(meta, similarity, int(idx), fields, snippet_length))
+                    else:
+                        if snippet_length is not None:
+                            meta = {**meta, 'chunk': clip(meta.get('chunk', ''), snippet_length)}
+                        results.append({
+                            'metadata': meta,
+                            'similarity': similarity,
+                            'index': int(idx)
+                        })
+                    
+                    if len(results) >= k:
+                        break
+            node.set(candidates=len(indices[0]), returned=len(results))
+        columns.touch(hit_ids)
         
-        return jsonify({
-            'results': results,
+        response = {
             'total_searched': index.ntotal,
             'cognitive_enhanced': False
-        })
+        }
+        # Optional dual search while a migration runs: how well the new model agrees
+        if migration and migration.dual_search and migration.state in ('building', 'catching_up'):
+            response['shadow_overlap'] = migration.compare(query, k, hit_ids)
+        return respond(first_page('results', results, page_size, response))
     except Exception as e:
+        log.exception("%s failed", request.endpoint)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/stats', methods=['GET'])
+@pinned
 def get_stats():
     """Get index statistics"""
     try:
-        categories = {}
-        urls = set()
-        
-        for meta in metadata_store.values():
-            cat = meta.get('category', 'unknown')
-            categories[cat] = categories.get(cat, 0) + 1
-            urls.add(meta.get('url'))
+        # Counted from the columns over this generation's ids, never by iterating
+        # metadata_store while /add may be inserting into it
+        ids = np.flatnonzero(index.contains(np.arange(index.id_bound)))
         
         return jsonify({
             'total_vectors': index.ntotal,
-            'total_urls': len(urls),
-            'categories': categories
+            'total_urls': columns.distinct_urls(ids),
+            'categories': columns.category_counts(ids),
+            'shards': index.shard_sizes(),
+            'segments': len(index.view().segments),
+            'retention_days': index.retention_days,
+            'capacity': evictor.stats(),
+            'ingest': ingest_queue.stats(),
+            'embedding_cache': embedding_cache.stats() if embedding_cache else None
         })
     except Exception as e:
+        log.exception("%s failed", request.endpoint)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/compare', methods=['POST'])
+@live_model
+@traced
+@pinned
 def compare_products():
     """Compare products from ecommerce sites with cognitive AI"""
     try:
         data = request.json
+        # Optional projection of product keys; snippet_length clips chunk texts
+        try:
+            fields = parse_fields(data.get('fields'), PRODUCT_FIELDS)
+            snippet_length = parse_snippet_length(data.get('snippet_length'))
+            page_size = parse_page_size(data.get('page_size'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if data.get('cursor'):
+            return next_page('products', data['cursor'], page_size)
+        
         query = data['query']
+        # Products to rank; worth raising when paging through them
+        k = data.get('k', 10)
         use_cognitive = data.get('use_cognitive', USE_COGNITIVE_AI)
         
         # Use Cognitive AI if available
         if use_cognitive and orchestrator:
-            print(f"🧠 Using Cognitive AI for product comparison: {query}")
-            response = orchestrator.compare_products(query)
+            log.debug("🧠 Using Cognitive AI for product comparison: %r", query)
+            # Products never carry highlights, so only the explanation may be worth computing
+            wanted = frozenset({'explanation'}) if fields is None or 'explanation' in fields else frozenset()
+            response = orchestrator.compare_products(query, wanted, snippet_length)
             
             # Convert to product comparison format
             products = {}
@@ -261,68 +727,79 @@ def compare_products():
             
             sorted_products = sorted(products.values(), key=lambda x: x['avg_similarity'], reverse=True)
             
-            return jsonify({
-                'products': sorted_products[:10],
+            return respond(first_page('products', project_products(sorted_products[:k], fields), page_size, {
                 'total_found': len(products),
                 'cognitive_enhanced': True,
                 'query_understanding': response.query_understanding,
                 'suggestions': response.suggestions
-            })
+            }))
         
         # Fallback to basic comparison
-        print(f"🔍 Using basic comparison for: {query}")
+        log.debug("🔍 Using basic comparison for: %r", query)
         
-        # Search only in ecommerce category
-        query_embedding = model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
-        distances, indices = index.search(query_embedding, min(100, index.ntotal))
+        # Search ecommerce pages first, then fetch the best chunks of the winners
+        with stage('encode'):
+            query_embedding = model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
+        with stage('faiss_search'):
+            _, pages = page_index.search(query_embedding, k, category='ecommerce')
         
-        # Group by URL
         products = {}
-        for i, idx in enumerate(indices[0]):
-            if idx != -1 and int(idx) in metadata_store:
-                meta = metadata_store[int(idx)]
-                
-                # Only ecommerce
-                if meta.get('category') != 'ecommerce':
-                    continue
-                
-                url = meta.get('url')
-                if url not in products:
-                    products[url] = {
-                        'url': url,
-                        'title': meta.get('title'),
-                        'favicon': meta.get('favicon'),
-                        'chunks': [],
-                        'avg_similarity': 0
-                    }
-                
-                products[url]['chunks'].append({
-                    'text': meta.get('chunk'),
-                    'similarity': float(distances[0][i])
-                })
+        for page, sims, ids in page_index.best_chunks(index, query_embedding, pages):
+            url = page_index.urls[page]
+            meta = metadata_store.get(int(ids[0]), {}) if len(ids) else {}
+            columns.touch(ids)
+            products[url] = {
+                'url': url,
+                'title': meta.get('title'),
+                'favicon': meta.get('favicon'),
+                'chunks': [
+                    {'text': clip(metadata_store[int(idx)].get('chunk', ''), snippet_length), 'similarity': float(sim)}
+                    for sim, idx in zip(sims, ids) if int(idx) in metadata_store
+                ],
+                'avg_similarity': 0
+            }
         
         # Calculate average similarity
         for product in products.values():
-            product['avg_similarity'] = sum(c['similarity'] for c in product['chunks']) / len(product['chunks'])
+            product['avg_similarity'] = sum(c['similarity'] for c in product['chunks']) / max(len(product['chunks']), 1)
         
         # Sort by similarity
         sorted_products = sorted(products.values(), key=lambda x: x['avg_similarity'], reverse=True)
         
-        return jsonify({
-            'products': sorted_products[:10],
+        return respond(first_page('products', project_products(sorted_products[:k], fields), page_size, {
             'total_found': len(products),
             'cognitive_enhanced': False
-        })
+        }))
     except Exception as e:
+        log.exception("%s failed", request.endpoint)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/migrate', methods=['POST'])
+def migrate():
+    """Start an online migration to another embedding model"""
+    try:
+        data = request.json or {}
+        start_migration(
+            data['model'],
+            data.get('backend'),
+            data.get('dual_search', MIGRATION_DUAL_SEARCH)
+        )
+        return jsonify({'success': True, 'migration': migration.status()}), 202
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        log.exception("%s failed", request.endpoint)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/save', methods=['POST'])
 def manual_save():
     """Manually trigger save"""
     try:
-        save_index()
+        with write_lock:
+            save_index()
         return jsonify({'success': True, 'message': 'Index saved'})
     except Exception as e:
+        log.exception("%s failed", request.endpoint)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/debug', methods=['GET'])
@@ -353,6 +830,7 @@ def debug_index():
             'sample_chunks': sample_chunks[:5]
         })
     except Exception as e:
+        log.exception("%s failed", request.endpoint)
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
@@ -367,5 +845,6 @@ if __name__ == '__main__':
         app.run(host='0.0.0.0', port=8000, debug=True)
     finally:
         print("\nShutting down... Saving index...")
+        ingest_queue.close()
         save_index()
         print("Index saved. Goodbye!")
@@ -0,0 +1,548 @@
+"""Category-sharded, time-segmented FAISS index searched in parallel"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+import contextvars
+import os
+import threading
+import numpy as np
+import faiss
+
+from columns import CATEGORIES, normalize_timestamp
+
+DAY = 86400
+# Segment bucket for vectors with no known time (legacy data): always searched, never expired
+UNDATED = -1
+
+# Generations pinned by the current request, keyed by id(index)
+_PINNED = contextvars.ContextVar('pinned_generations', default=None)
+
+
+def shard_for(category: Optional[str], shard_names: Iterable[str] = CATEGORIES) -> str:
+    """Shard name for a page category; categories without a shard of their own share 'other'"""
+    return category if category in shard_names else 'other'
+
+
+def merge_topk(distances: List[np.ndarray], indices: List[np.ndarray], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge per-segment (nq, k_i) results into global (nq, k), best first"""
+    D = np.concatenate(distances, axis=1)
+    I = np.concatenate(indices, axis=1)
+    D = np.where(I >= 0, D, -np.inf)
+    k = min(k, D.shape[1])
+    if k <= 0:
+        return D[:, :0], I[:, :0]
+
+    top = np.argpartition(-D, k - 1, axis=1)[:, :k]
+    rows = np.arange(D.shape[0])[:, None]
+    order = np.argsort(-D[rows, top], axis=1, kind='stable')
+    top = top[rows, order]
+    D, I = D[rows, top], I[rows, top]
+    # Keep FAISS's convention for missing results
+    I = np.where(np.isfinite(D), I, -1)
+    D = np.where(np.isfinite(D), D, -np.inf).astype(np.float32)
+    return D, I
+
+
+class Part:
+    """
+    Vectors added between two publishes. A part reachable from a published
+    generation is frozen: writers copy it before a delete and never append
+    to it, so readers can search it without locks.
+    """
+
+    def __init__(self, dimension: int, index: faiss.Index = None):
+        self.index = index if index is not None else faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        self.frozen = False
+        self._sorted = None
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def ids(self) -> np.ndarray:
+        return faiss.vector_to_array(self.index.id_map).astype(np.int64)
+
+    def vectors(self) -> np.ndarray:
+        return faiss.downcast_index(self.index.index).reconstruct_n(0, self.index.ntotal)
+
+    def holds(self, ids: np.ndarray) -> np.ndarray:
+        """Mask of ids stored in this part"""
+        if self._sorted is None:
+            self._sorted = np.sort(self.ids())
+        pos = np.minimum(np.searchsorted(self._sorted, ids), max(len(self._sorted) - 1, 0))
+        return (self._sorted[pos] == ids) if len(self._sorted) else np.zeros(len(ids), dtype=bool)
+
+    def add(self, embeddings: np.ndarray, ids: np.ndarray):
+        self.index.add_with_ids(embeddings, ids)
+        self._sorted = None
+
+    def remove(self, ids: np.ndarray) -> int:
+        self._sorted = None
+        return self.index.remove_ids(ids)
+
+    def copy(self) -> 'Part':
+        return Part(self.index.d, faiss.clone_index(self.index))
+
+    @classmethod
+    def merge(cls, parts: List['Part']) -> 'Part':
+        merged = cls(parts[0].index.d)
+        merged.add(np.concatenate([p.vectors() for p in parts]), np.concatenate([p.ids() for p in parts]))
+        return merged
+
+
+class Segment:
+    """
+    One (category, time bucket) sub-index, stored as a few parts: one per
+    commit since the last publish, folded together while neighbours are of
+    similar size so a segment keeps O(log n) parts. Appending therefore
+    copies only small parts instead of the whole segment.
+    """
+
+    def __init__(self, serial: int, shard: str, bucket: int, dimension: int, segment_seconds: int):
+        self.serial = serial
+        self.shard = shard
+        self.bucket = bucket
+        self.d = dimension
+        self.parts: List[Part] = []
+        if bucket == UNDATED:
+            self.start, self.end = float('-inf'), float('inf')
+        else:
+            self.start = bucket * segment_seconds
+            self.end = self.start + segment_seconds
+
+    @property
+    def ntotal(self) -> int:
+        return sum(part.ntotal for part in self.parts)
+
+    def ids(self) -> np.ndarray:
+        """Global ids stored in this segment"""
+        if not self.parts:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([part.ids() for part in self.parts])
+
+    def vectors(self) -> np.ndarray:
+        """Stored vectors, in the same order as ids()"""
+        if not self.parts:
+            return np.zeros((0, self.d), dtype=np.float32)
+        return np.concatenate([part.vectors() for part in self.parts])
+
+    def reconstruct_batch(self, ids: np.ndarray) -> np.ndarray:
+        out = np.zeros((len(ids), self.d), dtype=np.float32)
+        for part in self.parts:
+            rows = part.holds(ids)
+            if rows.any():
+                out[rows] = part.index.reconstruct_batch(ids[rows])
+        return out
+
+    def add(self, embeddings: np.ndarray, ids: np.ndarray):
+        """Append to the unpublished head part, starting one if the last part is frozen"""
+        if not self.parts or self.parts[-1].frozen:
+            self.parts.append(Part(self.d))
+        self.parts[-1].add(embeddings, ids)
+        while len(self.parts) > 1 and self.parts[-2].ntotal <= 2 * self.parts[-1].ntotal:
+            self.parts[-2:] = [Part.merge(self.parts[-2:])]
+
+    def remove(self, ids: np.ndarray) -> int:
+        """Delete ids, copying a frozen part before changing it"""
+        removed = 0
+        for i, part in enumerate(self.parts):
+            hits = ids[part.holds(ids)]
+            if len(hits) == 0:
+                continue
+            if part.frozen:
+                part = self.parts[i] = part.copy()
+            removed += part.remove(hits)
+        self.parts = [part for part in self.parts if part.ntotal > 0]
+        return removed
+
+    def copy(self) -> 'Segment':
+        """Private copy for a writer; the parts are shared with readers from here on"""
+        for part in self.parts:
+            part.frozen = True
+        clone = object.__new__(Segment)
+        clone.__dict__.update(self.__dict__)
+        clone.parts = list(self.parts)
+        return clone
+
+
+class Generation:
+    """
+    One published state of the index: the segments, id-to-segment map and id
+    bound readers see. Nothing reachable from a published generation is
+    modified afterwards when the index is copy-on-write.
+    """
+    __slots__ = ('number', 'segments', 'by_serial', 'segment_of', 'next_id')
+
+    def __init__(self, number: int, segments: dict, by_serial: dict, segment_of: np.ndarray, next_id: int):
+        self.number = number
+        self.segments = segments
+        self.by_serial = by_serial
+        self.segment_of = segment_of
+        self.next_id = next_id
+
+    @property
+    def ntotal(self) -> int:
+        return sum(seg.ntotal for seg in self.segments.values())
+
+
+class ShardedIndex:
+    """
+    Drop-in for the single IndexFlatIP: exposes d, ntotal, search and
+    reconstruct_batch with global vector ids, but stores vectors in
+    IndexIDMap2 parts grouped by (category, time bucket) segment.
+
+    A category-filtered search touches only that category's segments, a
+    time-windowed search only segments overlapping the window, and the
+    selected segments are searched on a thread pool (FAISS releases the
+    GIL) with per-segment top-k merged. Expired segments are dropped whole.
+
+    Reads go through a published Generation; writes change private state
+    and publish a new generation when they finish (or when a writing()
+    block exits). With copy_on_write set, a segment's part list is copied
+    before its first change after a publish and its published parts are
+    frozen: adds go to a new head part and only a delete clones a part. A
+    reader pinned to an older generation therefore never sees a half-applied
+    add or remove and never waits for a writer. Writers must still be
+    serialized by the caller.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        shards: Iterable[str] = CATEGORIES,
+        segment_days: int = 7,
+        retention_days: Optional[int] = None
+    ):
+        self.d = dimension
+        self.shard_names = list(shards)
+        self.segment_seconds = segment_days * DAY
+        self.retention_days = retention_days
+        self.segments: Dict[Tuple[str, int], Segment] = {}
+        self.by_serial: Dict[int, Segment] = {}
+        self._next_serial = 0
+        # Segment serial per global id (-1 = never added or removed)
+        self.segment_of = np.full(1024, -1, dtype=np.int32)
+        self.next_id = 0
+        self._pool = None
+        # Off for offline builds, which have no concurrent readers to protect
+        self.copy_on_write = False
+        self._init_generations()
+
+    def _init_generations(self, number: int = 0):
+        self._pins: Dict[int, int] = {}
+        self._pin_lock = threading.Lock()
+        self._retired: List[Tuple[int, Callable[[], None]]] = []
+        self._write_depth = 0
+        self._dirty = False
+        self._publish(number)
+
+    @property
+    def ntotal(self) -> int:
+        return self.view().ntotal
+
+    @property
+    def id_bound(self) -> int:
+        """One past the highest id visible to the current reader"""
+        return self.view().next_id
+
+    def view(self) -> Generation:
+        """The generation this request pinned, else the latest published one"""
+        pinned = _PINNED.get()
+        if pinned:
+            generation = pinned.get(id(self))
+            if generation is not None:
+                return generation
+        return self.generation
+
+    @contextmanager
+    def pinned(self):
+        """Read one consistent generation for the whole block, whatever writers publish meanwhile"""
+        with self._pin_lock:
+            generation = self.generation
+            self._pins[generation.number] = self._pins.get(generation.number, 0) + 1
+        token = _PINNED.set({**(_PINNED.get() or {}), id(self): generation})
+        try:
+            yield generation
+        finally:
+            _PINNED.reset(token)
+            with self._pin_lock:
+                remaining = self._pins[generation.number] - 1
+                if remaining:
+                    self._pins[generation.number] = remaining
+                else:
+                    del self._pins[generation.number]
+
+    @contextmanager
+    def writing(self):
+        """Group several changes (and the caller's metadata writes) into one published generation"""
+        self._write_depth += 1
+        try:
+            yield
+        finally:
+            self._write_depth -= 1
+            if self._write_depth == 0 and self._dirty:
+                self.publish()
+
+    def retire(self, fn: Callable[[], None]):
+        """
+        Run `fn` once no reader is pinned to a generation older than the
+        latest, e.g. to drop metadata of removed vectors that an in-flight
+        search may still return. Runs on a later write or reclaim() call.
+        """
+        # Inside a writing() block the removal only becomes visible at the next publish
+        self._retired.append((self.generation.number + self._dirty, fn))
+        self.reclaim()
+
+    @property
+    def pending_cleanups(self) -> int:
+        return len(self._retired)
+
+    def reclaim(self):
+        """Run retired cleanups no pinned reader can observe any more; call with writers serialized"""
+        if not self._retired:
+            return
+        with self._pin_lock:
+            oldest = min(self._pins, default=None)
+        ready, waiting = [], []
+        for number, fn in self._retired:
+            if oldest is None or oldest >= number:
+                ready.append(fn)
+            else:
+                waiting.append((number, fn))
+        self._retired = waiting
+        for fn in ready:
+            fn()
+
+    def contains(self, ids) -> np.ndarray:
+        """Mask of ids present in the reader's generation"""
+        generation = self.view()
+        ids = np.asarray(ids, dtype=np.int64)
+        inside = (ids >= 0) & (ids < min(generation.next_id, len(generation.segment_of)))
+        mask = np.zeros(len(ids), dtype=bool)
+        mask[inside] = generation.segment_of[ids[inside]] >= 0
+        return mask
+
+    def publish(self):
+        """Make direct changes (e.g. to next_id) visible to readers"""
+        self._publish(self.generation.number + 1)
+
+    def _changed(self):
+        self._dirty = True
+        if self._write_depth == 0:
+            self.publish()
+
+    def _publish(self, number: int):
+        self.generation = Generation(
+            number, dict(self.segments), dict(self.by_serial), self.segment_of, self.next_id
+        )
+        # Everything reachable from the new generation is now shared with readers
+        self._shared = set(self.by_serial)
+        self._segment_of_shared = True
+        self._dirty = False
+        self.reclaim()
+
+    def _writable(self, serial: int) -> Segment:
+        """The segment with this serial, copied first if a published generation holds it"""
+        segment = self.by_serial[serial]
+        if self.copy_on_write and serial in self._shared:
+            segment = segment.copy()
+            self.segments[(segment.shard, segment.bucket)] = segment
+            self.by_serial[serial] = segment
+            self._shared.discard(serial)
+        return segment
+
+    def _writable_segment_of(self):
+        if self.copy_on_write and self._segment_of_shared:
+            self.segment_of = self.segment_of.copy()
+        self._segment_of_shared = False
+
+    @classmethod
+    def from_flat(cls, flat_index: faiss.Index, metadata_store: dict, **kwargs) -> 'ShardedIndex':
+        """Split a legacy single index into segments, keeping vector ids"""
+        sharded = cls(flat_index.d, **kwargs)
+        n = flat_index.ntotal
+        for start in range(0, n, 10000):
+            stop = min(start + 10000, n)
+            metas = [metadata_store.get(i, {}) for i in range(start, stop)]
+            sharded.add_with_ids(
+                flat_index.reconstruct_n(start, stop - start),
+                np.arange(start, stop, dtype=np.int64),
+                [m.get('category') for m in metas],
+                [normalize_timestamp(m.get('timestamp')) or None for m in metas]
+            )
+        sharded.next_id = max(sharded.next_id, n)
+        sharded.publish()
+        return sharded
+
+    def reserve_ids(self, n: int) -> int:
+        """Allocate n consecutive ids, returning the first"""
+        start = self.next_id
+        self.next_id += n
+        return start
+
+    def add_with_ids(
+        self,
+        embeddings: np.ndarray,
+        ids: np.ndarray,
+        categories: List[Optional[str]],
+        timestamps: List[Optional[float]] = None
+    ):
+        """Route each vector to its (category, time bucket) segment"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        now = datetime.now().timestamp()
+        if timestamps is None:
+            timestamps = [now] * len(ids)
+        self._reserve(int(ids.max()) + 1)
+
+        serials = np.empty(len(ids), dtype=np.int32)
+        for i, (category, ts) in enumerate(zip(categories, timestamps)):
+            bucket = int((ts or now) // self.segment_seconds)
+            serials[i] = self._segment(shard_for(category, self.shard_names), bucket).serial
+
+        for serial in np.unique(serials):
+            rows = serials == serial
+            self._writable(int(serial)).add(
+                np.ascontiguousarray(embeddings[rows], dtype=np.float32), ids[rows]
+            )
+        self._writable_segment_of()
+        self.segment_of[ids] = serials
+        self.next_id = max(self.next_id, int(ids.max()) + 1)
+        self._changed()
+
+    def remove_ids(self, ids) -> int:
+        """Delete vectors by global id; returns how many were removed"""
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < len(self.segment_of))]
+        serials = self.segment_of[ids]
+        removed = 0
+        for serial in np.unique(serials[serials >= 0]):
+            if int(serial) in self.by_serial:
+                removed += self._writable(int(serial)).remove(ids[serials == serial])
+        self._writable_segment_of()
+        self.segment_of[ids] = -1
+        self._changed()
+        return removed
+
+    def expire(self, now: float = None) -> List[Segment]:
+        """
+        Drop every segment that ended before the retention cutoff.
+        Each drop releases a whole sub-index - nothing is rebuilt. Returns the
+        dropped segments so callers can clean up their ids.
+        """
+        if not self.retention_days:
+            return []
+        now = now or datetime.now().timestamp()
+        cutoff = now - self.retention_days * DAY
+        expired = [seg for seg in self.segments.values() if seg.end <= cutoff]
+        if not expired:
+            return []
+        self._writable_segment_of()
+        for segment in expired:
+            del self.segments[(segment.shard, segment.bucket)]
+            del self.by_serial[segment.serial]
+            ids = segment.ids()
+            self.segment_of[ids[ids < len(self.segment_of)]] = -1
+        self._changed()
+        return expired
+
+    def search(
+        self,
+        x: np.ndarray,
+        k: int,
+        category: str = None,
+        since: float = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        FAISS-style search, optionally restricted to a category and/or a start
+        time. A category without its own shard (e.g. 'documentation' in an index
+        saved with an older shard set) searches 'other', where its vectors were
+        stored; callers filter those hits on the category column.
+        """
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        if category:
+            category = shard_for(category, self.shard_names)
+
+        active = [
+            part
+            for seg in self.view().segments.values()
+            if (not category or seg.shard == category)
+            and (since is None or seg.end > since)
+            for part in seg.parts
+            if part.ntotal > 0
+        ]
+        if not active:
+            return self._empty(len(x))
+        if len(active) == 1:
+            return active[0].index.search(x, min(k, active[0].ntotal))
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=min(len(self.shard_names), os.cpu_count() or 1) * 2,
+                thread_name_prefix='segment'
+            )
+        results = list(self._pool.map(lambda part: part.index.search(x, min(k, part.ntotal)), active))
+        return merge_topk([r[0] for r in results], [r[1] for r in results], k)
+
+    def reconstruct_batch(self, ids) -> np.ndarray:
+        """Stored vectors for global ids, in the given order"""
+        generation = self.view()
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.zeros((len(ids), self.d), dtype=np.float32)
+        serials = np.full(len(ids), -1, dtype=np.int32)
+        known = ids < len(generation.segment_of)
+        serials[known] = generation.segment_of[ids[known]]
+        for serial in np.unique(serials[serials >= 0]):
+            rows = serials == serial
+            out[rows] = generation.by_serial[int(serial)].reconstruct_batch(ids[rows])
+        return out
+
+    def shard_sizes(self) -> Dict[str, int]:
+        sizes = {name: 0 for name in self.shard_names}
+        for segment in self.view().segments.values():
+            sizes[segment.shard] += segment.ntotal
+        return sizes
+
+    def segment_stats(self) -> List[dict]:
+        return [
+            {
+                'shard': seg.shard,
+                'start': None if seg.bucket == UNDATED else datetime.fromtimestamp(seg.start).isoformat(),
+                'vectors': seg.ntotal
+            }
+            for seg in sorted(self.view().segments.values(), key=lambda s: (s.shard, s.bucket))
+        ]
+
+    def _segment(self, shard: str, bucket: int) -> Segment:
+        segment = self.segments.get((shard, bucket))
+        if segment is None:
+            segment = Segment(self._next_serial, shard, bucket, self.d, self.segment_seconds)
+            self._next_serial += 1
+            self.segments[(shard, bucket)] = segment
+            self.by_serial[segment.serial] = segment
+        return segment
+
+    def _empty(self, nq: int) -> Tuple[np.ndarray, np.ndarray]:
+        return np.zeros((nq, 0), dtype=np.float32), np.zeros((nq, 0), dtype=np.int64)
+
+    def _reserve(self, n: int):
+        if n > len(self.segment_of):
+            grown = np.full(max(n, len(self.segment_of) * 2), -1, dtype=np.int32)
+            grown[:len(self.segment_of)] = self.segment_of
+            self.segment_of = grown
+            self._segment_of_shared = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        # Readers, pins and pending cleanups belong to the running process
+        for name in ('generation', '_pins', '_pin_lock', '_retired', '_write_depth',
+                     '_dirty', '_shared', '_segment_of_shared'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_generations()
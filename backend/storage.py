@@ -0,0 +1,91 @@
+"""On-disk index store shared by the server and offline tools"""
+from typing import Optional, Tuple
+import json
+import os
+import pickle
+
+from bm25 import BM25Index
+from page_index import PageIndex
+from sharded_index import ShardedIndex
+
+INDEX_FILE = 'faiss_index.pkl'
+METADATA_FILE = 'metadata.pkl'
+BM25_FILE = 'bm25_index.pkl'
+PAGE_INDEX_FILE = 'page_index.pkl'
+# Which embedding model the stored vectors belong to
+MODEL_FILE = 'model.json'
+
+
+def _load(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _dump(obj, path: str):
+    """Write to a temp file and rename, so a crash never leaves a torn pickle"""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_index(dimension: int, segment_days: int = 7, retention_days: int = None) -> Tuple[ShardedIndex, dict]:
+    """Load the vector index and metadata, or create empty ones"""
+    if os.path.exists(INDEX_FILE) and os.path.exists(METADATA_FILE):
+        print("Loading existing index...")
+        index = _load(INDEX_FILE)
+        metadata_store = _load(METADATA_FILE)
+        if not isinstance(index, ShardedIndex):
+            print("Splitting legacy index into category/time segments...")
+            index = ShardedIndex.from_flat(index, metadata_store, segment_days=segment_days)
+        index.retention_days = retention_days
+        print(f"Loaded index with {index.ntotal} vectors")
+    else:
+        print("Creating new index...")
+        # One inner-product (cosine) sub-index per category and time segment
+        index = ShardedIndex(dimension, segment_days=segment_days, retention_days=retention_days)
+        metadata_store = {}
+    return index, metadata_store
+
+
+def load_bm25(metadata_store: dict) -> BM25Index:
+    """Keyword index for hybrid search; rebuilt if it is missing or out of date"""
+    bm25 = _load(BM25_FILE)
+    if bm25 is None or bm25.n_docs != len(metadata_store):
+        print("Building BM25 keyword index...")
+        bm25 = BM25Index.from_metadata(metadata_store)
+    return bm25
+
+
+def load_page_index(index, metadata_store: dict) -> PageIndex:
+    """One mean-pooled vector per URL; rebuilt if it is missing or out of date"""
+    page_index = _load(PAGE_INDEX_FILE)
+    if page_index is None or int(page_index.counts.sum()) != len(metadata_store):
+        print("Building page-level index...")
+        page_index = PageIndex.from_index(index, metadata_store)
+    return page_index
+
+
+def save_all(index, metadata_store: dict, bm25: BM25Index, page_index: PageIndex):
+    """Persist the index, metadata and derived indexes"""
+    _dump(index, INDEX_FILE)
+    _dump(metadata_store, METADATA_FILE)
+    _dump(bm25, BM25_FILE)
+    _dump(page_index, PAGE_INDEX_FILE)
+
+
+def load_model_config() -> Optional[dict]:
+    """{'model', 'backend', 'dimension'} recorded for the stored vectors, if any"""
+    if not os.path.exists(MODEL_FILE):
+        return None
+    with open(MODEL_FILE) as f:
+        return json.load(f)
+
+
+def save_model_config(model_name: str, backend: str, dimension: int):
+    tmp = MODEL_FILE + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'model': model_name, 'backend': backend, 'dimension': dimension}, f)
+    os.replace(tmp, MODEL_FILE)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Category-filtered search with the extension's category names"""
+
+import time
+import numpy as np
+
+from columns import CATEGORIES
+from sharded_index import ShardedIndex
+
+# categorizeWebsite() in background.js returns one of these
+EXTENSION_CATEGORIES = ['ecommerce', 'social', 'news', 'documentation', 'video', 'general']
+DIMENSION = 32
+
+
+def build(shards=CATEGORIES, per_category=20):
+    rng = np.random.default_rng(0)
+    index = ShardedIndex(DIMENSION, shards=shards)
+    categories = [c for c in EXTENSION_CATEGORIES for _ in range(per_category)]
+    vectors = rng.standard_normal((len(categories), DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index.add_with_ids(vectors, np.arange(len(categories)), categories, [time.time()] * len(categories))
+    return index, vectors, categories
+
+
+def filtered(index, query, categories, category, k=10):
+    """Hits for a category filter, post-filtered on the stored category like server.py does"""
+    _, ids = index.search(query[None, :], k, category=category)
+    return [int(i) for i in ids[0] if i != -1 and categories[int(i)] == category]
+
+
+def test_every_extension_category_has_a_shard():
+    for category in EXTENSION_CATEGORIES:
+        assert category in CATEGORIES, category
+
+
+def test_filtered_search_returns_each_category():
+    index, vectors, categories = build()
+    for category in EXTENSION_CATEGORIES:
+        query = vectors[categories.index(category)]
+        hits = filtered(index, query, categories, category)
+        assert hits, f"no results for category={category}"
+        assert categories[hits[0]] == category
+
+
+def test_category_without_shard_searches_other():
+    # Index saved with the old shard set: documentation/video/general pages live in 'other'
+    index, vectors, categories = build(shards=['ecommerce', 'news', 'docs', 'social', 'other'])
+    assert index.shard_sizes()['other'] == 60
+    for category in ('documentation', 'video', 'general'):
+        query = vectors[categories.index(category)]
+        hits = filtered(index, query, categories, category, k=60)
+        assert hits and categories[hits[0]] == category, category
+
+
+if __name__ == '__main__':
+    print("🧪 Testing category-filtered search...")
+    test_every_extension_category_has_a_shard()
+    test_filtered_search_returns_each_category()
+    test_category_without_shard_searches_other()
+    print("✅ Test complete - every extension category is searchable!")
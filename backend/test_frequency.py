@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Visit frequency: visited URLs rank higher in results and are evicted last"""
+
+import os
+import tempfile
+import time
+import numpy as np
+
+from columns import MetadataColumns
+from eviction import LowestValueSites, OldestFirst
+from memory import MemoryAgent
+from models import SearchDecision
+from ranking import Reranker
+
+VISITED = 'https://shop.example/visited'
+UNVISITED = 'https://shop.example/unvisited'
+
+
+def make_memory() -> MemoryAgent:
+    return MemoryAgent(os.path.join(tempfile.mkdtemp(), 'user_memory.json'))
+
+
+def make_columns(urls, now):
+    columns = MetadataColumns()
+    columns.append(0, [{'url': url, 'category': 'ecommerce', 'timestamp': now} for url in urls])
+    return columns
+
+
+def decision() -> SearchDecision:
+    return SearchDecision(
+        strategy='hybrid',
+        search_params={'query_text': 'laptop', 'k': 10},
+        filters={},
+        ranking_weights={'semantic_similarity': 1.0, 'frequency': 0.2},
+        reasoning='test',
+        confidence=1.0
+    )
+
+
+def test_visited_url_outranks_unvisited():
+    now = time.time()
+    memory = make_memory()
+    for _ in range(3):
+        memory.update_frequent_sites(VISITED)
+    columns = make_columns([UNVISITED, VISITED], now)
+
+    # Unvisited page listed first with the same similarity
+    results = [{'index': 0, 'similarity': 0.8}, {'index': 1, 'similarity': 0.8}]
+    ranked = Reranker(columns, memory).rerank(results, decision())
+    assert [r['index'] for r in ranked] == [1, 0]
+    assert ranked[0]['relevance_score'] > ranked[1]['relevance_score']
+
+
+def test_frequency_follows_new_visits():
+    now = time.time()
+    memory = make_memory()
+    columns = make_columns([VISITED, UNVISITED], now)
+    reranker = Reranker(columns, memory)
+    assert np.allclose(reranker.url_frequency(), 0.5)
+
+    memory.update_frequent_sites(UNVISITED)
+    frequency = reranker.url_frequency()
+    assert frequency[columns.url_codes[UNVISITED]] > frequency[columns.url_codes[VISITED]]
+
+
+def test_searches_keep_cached_frequency():
+    memory = make_memory()
+    memory.update_frequent_sites(VISITED)
+    reranker = Reranker(make_columns([VISITED, UNVISITED], time.time()), memory)
+    frequency = reranker.url_frequency()
+
+    # Every query records a search event; only visits and clicks change the table
+    memory.record_search('laptop', category='ecommerce')
+    assert reranker.url_frequency() is frequency
+    memory.update_frequent_sites(UNVISITED)
+    assert reranker.url_frequency() is not frequency
+
+
+def test_low_value_evicts_unvisited_site_first():
+    now = time.time()
+    memory = make_memory()
+    memory.update_frequent_sites(VISITED)
+    # The visited page is the older one, so 'oldest' would evict it first
+    columns = MetadataColumns()
+    columns.append(0, [{'url': VISITED, 'timestamp': now - 86400}, {'url': UNVISITED, 'timestamp': now}])
+
+    assert list(OldestFirst(memory).select(columns, 1)) == [0]
+    assert list(LowestValueSites(memory).select(columns, 1)) == [1]
+
+
+if __name__ == '__main__':
+    print("🧪 Testing visit-frequency ranking...")
+    test_visited_url_outranks_unvisited()
+    test_frequency_follows_new_visits()
+    test_searches_keep_cached_frequency()
+    test_low_value_evicts_unvisited_site_first()
+    print("✅ Test complete - visited sites rank first and are kept longest!")
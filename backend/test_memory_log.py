@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Memory event log: crash recovery and retention at compaction"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from memory import MemoryAgent
+from models import UserFeedback
+
+
+def make_path() -> str:
+    return os.path.join(tempfile.mkdtemp(), 'user_memory.json')
+
+
+def record_some(memory: MemoryAgent):
+    memory.record_search('laptop deals', category='ecommerce')
+    memory.update_frequent_sites('https://shop.example/laptops')
+    memory.record_feedback(UserFeedback(
+        query='laptop deals',
+        result_clicked='https://shop.example/laptops',
+        was_helpful=True,
+        time_to_click=1.5,
+        timestamp=datetime.now()
+    ))
+
+
+def test_crash_between_snapshot_and_truncate():
+    path = make_path()
+    memory = MemoryAgent(path)
+    record_some(memory)
+    memory.flush()
+
+    # Crash after os.replace installed the snapshot but before the log was truncated
+    log_path = memory.event_log.log_path
+    with open(log_path, 'rb') as f:
+        logged = f.read()
+    memory.event_log.flush(compact=True)
+    with open(log_path, 'wb') as f:
+        f.write(logged)
+
+    restored = MemoryAgent(path)
+    assert len(restored.memory['search_history']) == 1
+    assert len(restored.memory['feedback']) == 1
+    assert restored.get_url_frequencies()['https://shop.example/laptops'] == 2
+    assert restored.aggregates.category_counts(7, datetime.now().timestamp())['ecommerce'] == 1
+
+
+def test_events_after_snapshot_are_replayed():
+    path = make_path()
+    memory = MemoryAgent(path)
+    record_some(memory)
+    memory.event_log.flush(compact=True)
+    memory.record_search('laptop reviews', category='ecommerce')
+    memory.flush()
+
+    restored = MemoryAgent(path)
+    assert [s['query'] for s in restored.memory['search_history']] == ['laptop deals', 'laptop reviews']
+
+    # Sequence numbers keep counting after a reload
+    restored.record_search('laptop bags', category='ecommerce')
+    restored.flush()
+    assert len(MemoryAgent(path).memory['search_history']) == 3
+
+
+def test_compaction_expires_out_of_order_buckets():
+    path = make_path()
+    memory = MemoryAgent(path, retention_days=30)
+    now = datetime.now()
+    # The second click is older than retention but arrives after a newer one
+    for when in (now, now - timedelta(days=60)):
+        memory.record_feedback(UserFeedback(
+            query='laptop deals',
+            result_clicked='https://shop.example/laptops',
+            was_helpful=True,
+            timestamp=when
+        ))
+    memory.event_log.flush(compact=True)
+
+    restored = MemoryAgent(path, retention_days=30)
+    assert list(restored.aggregates.daily_clicks.buckets) == [int(now.timestamp() // 86400)]
+
+
+if __name__ == '__main__':
+    print("🧪 Testing memory log recovery...")
+    test_crash_between_snapshot_and_truncate()
+    test_events_after_snapshot_are_replayed()
+    test_compaction_expires_out_of_order_buckets()
+    print("✅ Test complete - compaction neither duplicates events nor keeps expired ones!")
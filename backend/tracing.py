@@ -0,0 +1,130 @@
+"""Per-request timing trees for debug responses, and sampled cProfile dumps"""
+from contextlib import contextmanager
+from typing import Optional
+import cProfile
+import os
+import threading
+import time
+
+_local = threading.local()
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'children', 'ms')
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.children = []
+        self.ms = 0.0
+
+    def set(self, **attrs):
+        """Attach counts or other details, e.g. candidates kept by a filter"""
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        node = {'name': self.name, 'ms': round(self.ms, 3), **self.attrs}
+        if self.children:
+            node['children'] = [child.to_dict() for child in self.children]
+        return node
+
+
+class _NullSpan:
+    """Stand-in when the request is not traced, so callers never branch"""
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.root = Span(name, {})
+        self.stack = [self.root]
+        self.start = time.perf_counter()
+
+    def finish(self) -> dict:
+        self.root.ms = (time.perf_counter() - self.start) * 1000
+        return self.root.to_dict()
+
+
+def current() -> Optional[Trace]:
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def trace(name: str):
+    """Collect spans opened on this thread until the block exits"""
+    _local.trace = t = Trace(name)
+    try:
+        yield t
+    finally:
+        _local.trace = None
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block as a child of the innermost open span; free when not tracing"""
+    t = current()
+    if t is None:
+        yield NULL_SPAN
+        return
+    node = Span(name, attrs)
+    t.stack[-1].children.append(node)
+    t.stack.append(node)
+    start = time.perf_counter()
+    try:
+        yield node
+    finally:
+        node.ms = (time.perf_counter() - start) * 1000
+        t.stack.pop()
+
+
+class SamplingProfiler:
+    """
+    Runs every Nth request under cProfile and dumps the stats to
+    <directory>/<time>-<name>-<n>.prof (open with pstats or snakeviz).
+    Only one request is profiled at a time; a sample that would overlap is skipped.
+    """
+
+    def __init__(self, every: int = 0, directory: str = 'profiles'):
+        self.every = every
+        self.directory = directory
+        self.requests = 0
+        self.dumps = 0
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+
+    @contextmanager
+    def maybe(self, name: str):
+        """Yields the dump path when this request is sampled, else None"""
+        if not self.every:
+            yield None
+            return
+        with self._lock:
+            self.requests += 1
+            n = self.requests
+        if n % self.every or not self._busy.acquire(blocking=False):
+            yield None
+            return
+
+        try:
+            profile = cProfile.Profile()
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) already owns the interpreter hook
+            self._busy.release()
+            yield None
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{n}.prof")
+        try:
+            yield path
+        finally:
+            profile.disable()
+            profile.dump_stats(path)
+            self.dumps += 1
+            self._busy.release()